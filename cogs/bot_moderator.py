@@ -1,5 +1,6 @@
 from __future__ import annotations
 from typing import Final, Optional
+import io
 
 import discord
 from discord.ext import commands, vbu
@@ -27,6 +28,151 @@ class BotModerator(vbu.Cog[utils.types.Bot]):
             await self.bot.startup()
         await ctx.send("Done.")
 
+    async def reload_family_graph(self, guild_id: int):
+        """
+        Reload a guild's family tree from the database on every cluster.
+        """
+
+        if vbu.RedisConnection.enabled:
+            async with vbu.Redis() as re:
+                await re.publish("FamilyGraphReload", {"guild_id": guild_id})
+        else:
+            self.bot.dispatch("reload_family_graph", guild_id)
+
+    @commands.command(
+        application_command_meta=commands.ApplicationCommandMeta(
+            guild_ids=[
+                208895639164026880,
+            ],
+            options=[
+                discord.ApplicationCommandOption(
+                    name="guild_id",
+                    description="The guild ID to check (0 for the global tree).",
+                    required=True,
+                    type=discord.ApplicationCommandOptionType.string,
+                ),
+                discord.ApplicationCommandOption(
+                    name="repair",
+                    description="Whether to fix whatever's found.",
+                    required=False,
+                    type=discord.ApplicationCommandOptionType.boolean,
+                ),
+            ],
+        ),
+    )
+    @vbu.checks.is_bot_support()
+    @commands.bot_has_permissions(send_messages=True)
+    async def checkfamilyintegrity(
+            self,
+            ctx: vbu.SlashContext,
+            guild_id: str,
+            repair: bool = False):
+        """
+        Scans a guild's family tree for inconsistencies, optionally fixing them.
+        """
+
+        if not guild_id.isdigit():
+            return await ctx.interaction.response.send_message("That is not a valid guild ID.")
+        graph = utils.FamilyGraph.graphs.get(int(guild_id))
+        if graph is None:
+            return await ctx.interaction.response.send_message("There's no family tree cached for that guild.")
+        await ctx.interaction.response.defer()
+
+        # Copy the graph out here, and scan it in the worker pool
+        arrays = utils.export_graph_arrays(graph)
+        report = await utils.FamilyWorkerPool.run(
+            utils.FamilyIntegrityReport.scan_arrays,
+            graph.guild_id,
+            arrays,
+        )
+        text = report.to_text()
+        plan = report.repair_plan()
+
+        # Fix it - removing the bad rows from the database all at once, and
+        # then reloading the tree to fix everything else
+        if report and repair:
+            async with vbu.Database() as db:
+                async with db.transaction() as trans:
+                    for table, columns in (("parents", "child_id, parent_id"), ("marriages", "user_id, partner_id")):
+                        rows = [(user_id, other_id) for i, user_id, other_id in plan if i == table]
+                        if not rows:
+                            continue
+                        await trans.call(
+                            f"""
+                            DELETE FROM
+                                {table}
+                            WHERE
+                                ({columns}) IN (SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[]))
+                                AND guild_id = $3
+                            """,
+                            [i[0] for i in rows], [i[1] for i in rows], graph.guild_id,
+                        )
+            await self.reload_family_graph(graph.guild_id)
+            text += f"\nDeleted {len(plan)} rows and reloaded the family tree."
+        elif report:
+            text += (
+                f"\nRunning this again with `repair` will delete {len(plan)} rows "
+                f"and reload the family tree."
+            )
+
+        # Send it as a file if it's too long for a message
+        if len(text) > 2_000:
+            file = discord.File(io.BytesIO(text.encode()), filename="integrity.txt")
+            return await ctx.send(f"Found {report.issue_count} issues.", file=file)
+        await ctx.send(text)
+
+    @commands.command(
+        application_command_meta=commands.ApplicationCommandMeta(
+            guild_ids=[
+                208895639164026880,
+            ],
+            options=[
+                discord.ApplicationCommandOption(
+                    name="guild_id",
+                    description="The guild ID to look at (0 for the global tree).",
+                    required=True,
+                    type=discord.ApplicationCommandOptionType.string,
+                ),
+            ],
+        ),
+    )
+    @vbu.checks.is_bot_support()
+    @commands.bot_has_permissions(send_messages=True)
+    async def familyanalytics(
+            self,
+            ctx: vbu.SlashContext,
+            guild_id: str):
+        """
+        Gives the sizes, depths, and leaderboards of a guild's families.
+        """
+
+        if not guild_id.isdigit():
+            return await ctx.interaction.response.send_message("That is not a valid guild ID.")
+        graph = utils.FamilyGraph.graphs.get(int(guild_id))
+        if graph is None:
+            return await ctx.interaction.response.send_message("There's no family tree cached for that guild.")
+        await ctx.interaction.response.defer()
+
+        # Copy the graph out here, and work it out in the worker pool
+        if graph.guild_id == 0:
+            max_family_members = self.bot.config['max_family_members']
+        else:
+            max_family_members = self.bot.guild_settings[graph.guild_id]['max_family_members']
+        arrays = utils.export_graph_arrays(graph)
+        analytics = await utils.FamilyWorkerPool.run(
+            utils.FamilyAnalytics.compute_arrays,
+            graph.guild_id,
+            arrays,
+            max_family_members,
+        )
+        text = analytics.to_text()
+
+        # Send it as a file if it's too long for a message
+        if len(text) > 2_000:
+            file = discord.File(io.BytesIO(text.encode()), filename="analytics.txt")
+            return await ctx.send(f"Analytics for guild {graph.guild_id}.", file=file)
+        await ctx.send(text)
+
     @commands.command(
         application_command_meta=commands.ApplicationCommandMeta(
             guild_ids=[
@@ -184,10 +330,8 @@ class BotModerator(vbu.Cog[utils.types.Bot]):
 
         # Send to user
         await db.disconnect()
-        await ctx.send((
-            f"Copied over `{len(users)}` users. "
-            "Be sure to run the `runstartupmethod` command"
-        ))
+        await self.reload_family_graph(guild_id)
+        await ctx.send(f"Copied over `{len(users)}` users.")
 
     @commands.command(
         application_command_meta=commands.ApplicationCommandMeta(
@@ -462,7 +606,8 @@ class BotModerator(vbu.Cog[utils.types.Bot]):
             await db("DELETE FROM parents WHERE guild_id = $1", guild_id)
             await db("DELETE FROM marriages WHERE guild_id = $1", guild_id)
 
-        await ctx.send("Reset tree. Run the `runstartupmethod` command.")
+        await self.reload_family_graph(guild_id)
+        await ctx.send("Reset tree.")
 
 
 def setup(bot: utils.types.Bot):
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from collections import defaultdict
+from datetime import datetime as dt, timedelta
 import asyncio
+import os
+import time
 
 import discord
-from discord.ext import vbu
+from discord.ext import tasks, vbu
 
 from cogs import utils
 from cogs.utils import types
@@ -18,6 +22,49 @@ async def aiterator(iterable):
 
 class CacheHandler(vbu.Cog[types.Bot]):
 
+    # How far before a snapshot was taken we catch up from, to cover any
+    # rows that were written while it was being taken
+    SNAPSHOT_CATCH_UP_MARGIN = timedelta(minutes=5)
+
+    def __init__(self, bot):
+        super().__init__(bot)
+        self.family_cache_ready: bool = False
+        utils.FamilyGraph.store_class = utils.FamilyStore.get_backend(
+            self.bot.config.get('family_store_backend') or "compact",
+        )
+        utils.FamilyWorkerPool.start(
+            self.bot.config.get('family_worker_processes') or 0,
+            self.bot.config.get('family_worker_threshold') or None,
+        )
+        if self.snapshot_location or self.image_location:
+            self.write_family_snapshot.start()
+        self.sweep_family_graphs.start()
+        self.post_family_analytics.start()
+
+    def cog_unload(self):
+        self.write_family_snapshot.cancel()
+        self.sweep_family_graphs.cancel()
+        self.post_family_analytics.cancel()
+        utils.FamilyWorkerPool.stop()
+
+    @property
+    def snapshot_location(self) -> Optional[str]:
+        """
+        The file that family graph snapshots are kept in, if they're
+        enabled.
+        """
+
+        return self.bot.config.get('family_snapshot_location') or None
+
+    @property
+    def image_location(self) -> Optional[str]:
+        """
+        The file that the shared family graph image is kept in, if it's
+        enabled.
+        """
+
+        return self.bot.config.get('family_image_location') or None
+
     async def recache_user(
             self,
             ftm: utils.FamilyTreeMember,
@@ -92,7 +139,7 @@ class CacheHandler(vbu.Cog[types.Bot]):
 
         # Add parent
         if parents:
-            ftm._parent = parents[0]['parent_id']
+            ftm.parent = parents[0]['parent_id']
 
     @vbu.Cog.listener("on_recache_user")
     async def _recache_user(
@@ -104,26 +151,86 @@ class CacheHandler(vbu.Cog[types.Bot]):
             user.id, guild_id,
         )
         ftm = utils.FamilyTreeMember.get(user.id, guild_id)
-        changed_users: list[utils.FamilyTreeMember] = []
+
+        # Send everyone whether they changed or not, so that any cluster
+        # that's out of sync gets fixed too
         async with vbu.Database() as db:
             for uf in ftm.span():
-                changed_users.append(uf)
                 await self.recache_user(uf, db)
+                utils.FamilyGraph.get(guild_id).dirty.add(uf.id)
         async with vbu.Redis() as re:
-            for uf in changed_users:
-                await re.publish("TreeMemberUpdate", uf.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, guild_id)
 
     @staticmethod
-    def handle_partner(row: types.MarriagesDB):
-        user = utils.FamilyTreeMember.get(row['user_id'], row['guild_id'])
-        partner = user.add_partner(row['partner_id'], return_added=True)
-        partner.add_partner(user)
+    async def build_family_graphs(
+            partnerships: List[types.MarriagesDB],
+            parents: List[types.ParentageDB]) -> List[utils.FamilyGraph]:
+        """
+        Build a family graph for each guild that appears in the given rows.
+        """
+
+        # Group the family data by guild
+        parent_edges: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        partner_edges: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        async for i in aiterator(partnerships):
+            partner_edges[i['guild_id']].append((i['user_id'], i['partner_id'],))
+        async for i in aiterator(parents):
+            parent_edges[i['guild_id']].append((i['child_id'], i['parent_id'],))
+
+        # And build
+        graphs = []
+        for guild_id in set(parent_edges) | set(partner_edges):
+            graphs.append(utils.FamilyGraph.from_edges(
+                guild_id,
+                parent_edges[guild_id],
+                partner_edges[guild_id],
+            ))
+            await asyncio.sleep(0)
+        await CacheHandler.load_family_timestamps(graphs, partnerships, parents)
+        return graphs
 
     @staticmethod
-    def handle_parent(row: types.ParentageDB):
-        parent = utils.FamilyTreeMember.get(row['parent_id'], row['guild_id'])
-        child = parent.add_child(row['child_id'], return_added=True)
-        child.parent = row['parent_id']
+    async def load_family_timestamps(
+            graphs: Iterable[utils.FamilyGraph],
+            partnerships: List[types.MarriagesDB],
+            parents: List[types.ParentageDB]) -> None:
+        """
+        Load the times that relations were made into the given graphs from
+        the database rows for them.
+        """
+
+        partner_rows: Dict[int, List[types.MarriagesDB]] = defaultdict(list)
+        parent_rows: Dict[int, List[types.ParentageDB]] = defaultdict(list)
+        async for i in aiterator(partnerships):
+            partner_rows[i['guild_id']].append(i)
+        async for i in aiterator(parents):
+            parent_rows[i['guild_id']].append(i)
+        for graph in graphs:
+            graph.timestamps.load(partner_rows[graph.guild_id], parent_rows[graph.guild_id])
+            await asyncio.sleep(0)
+
+    async def reload_family_timestamps(self, where: str):
+        """
+        Load the times that relations were made into every cached graph,
+        for when the graphs were built from a snapshot (which doesn't have
+        them).
+        """
+
+        try:
+            async with vbu.Database() as db:
+                partnerships: List[types.MarriagesDB] = await db(
+                    """SELECT * FROM marriages WHERE {0} AND timestamp IS NOT NULL""".format(where),
+                )
+                parents: List[types.ParentageDB] = await db(
+                    """SELECT * FROM parents WHERE {0} AND timestamp IS NOT NULL""".format(where),
+                )
+        except Exception as e:
+            self.logger.error(f"Couldn't load family relation timestamps: {e}", exc_info=e)
+            return
+        await self.load_family_timestamps(list(utils.FamilyGraph.graphs.values()), partnerships, parents)
+        self.logger.info(
+            f"Loaded timestamps for {len(partnerships)} partnerships and {len(parents)} parents"
+        )
 
     async def cache_setup(self, db: vbu.Database):
         """
@@ -136,6 +243,14 @@ class CacheHandler(vbu.Cog[types.Bot]):
             where = "guild_id <> 0"
         else:
             where = "guild_id = 0"
+
+        # See if we can start from a snapshot instead
+        if await self.load_family_snapshot(db, where):
+            self.family_cache_ready = True
+            self.logger.info("Family tree member caching complete")
+            return True
+
+        # Otherwise read everything
         try:
             partnerships: List[types.MarriagesDB] = await db(
                 """
@@ -168,24 +283,302 @@ class CacheHandler(vbu.Cog[types.Bot]):
             )
             exit(1)
 
-        # Clear the current cache
-        self.logger.info("Clearing the cache of all family tree members")
-        utils.FamilyTreeMember.all_users.clear()
-
-        # Cache the family data - partners
+        # Cache the family data
         self.logger.info(f"Caching {len(partnerships)} partnerships from partnerships")
-        async for i in aiterator(partnerships):
-            self.handle_partner(i)
-
-        # - children
         self.logger.info(f"Caching {len(parents)} parents/children from parents")
-        async for i in aiterator(parents):
-            self.handle_parent(i)
+        graphs = await self.build_family_graphs(partnerships, parents)
+
+        # Swap them all in at once
+        self.logger.info("Replacing the cache of all family tree members")
+        utils.FamilyGraph.replace_all(graphs)
 
         # And done
+        self.family_cache_ready = True
         self.logger.info("Family tree member caching complete")
         return True
 
+    async def load_family_snapshot(self, db: vbu.Database, where: str) -> bool:
+        """
+        Load the family graphs from the shared image or the last snapshot,
+        and then catch up from the database with anything added since. Any
+        guild whose relation counts don't match the database afterwards (ie
+        something was removed since the snapshot) is reloaded in full.
+
+        Returns
+        -------
+        bool
+            Whether the cache was loaded. If not, nothing's been changed.
+        """
+
+        # Map the image if we can, since that's shared with every other
+        # cluster on this host; otherwise read the snapshot
+        snapshot: utils.FamilyGraphImage | utils.FamilyGraphSnapshot | None = None
+        if self.image_location and utils.FamilyGraph.store_class is utils.CompactFamilyStore:
+            try:
+                snapshot = utils.FamilyGraphImage.open(self.image_location)
+            except FileNotFoundError:
+                self.logger.info(f"No family graph image at {self.image_location}")
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Couldn't map family graph image: {e}")
+        if snapshot is None and self.snapshot_location:
+            try:
+                snapshot = await self.bot.loop.run_in_executor(
+                    None,
+                    utils.FamilyGraphSnapshot.read,
+                    self.snapshot_location,
+                )
+            except FileNotFoundError:
+                self.logger.info(f"No family graph snapshot at {self.snapshot_location}")
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Couldn't read family graph snapshot: {e}")
+        if snapshot is None:
+            return False
+        self.logger.info(f"Loading family graphs from {snapshot!r}")
+
+        # Get everything added since then
+        since = snapshot.created_at - self.SNAPSHOT_CATCH_UP_MARGIN
+        try:
+            partnerships: List[types.MarriagesDB] = await db(
+                """SELECT * FROM marriages WHERE {0} AND timestamp > $1""".format(where),
+                since,
+            )
+            parents: List[types.ParentageDB] = await db(
+                """SELECT * FROM parents WHERE {0} AND timestamp > $1""".format(where),
+                since,
+            )
+            partner_counts = await db(
+                """
+                SELECT
+                    guild_id,
+                    COUNT(DISTINCT (LEAST(user_id, partner_id), GREATEST(user_id, partner_id))) AS count
+                FROM
+                    marriages
+                WHERE
+                    {0}
+                    AND user_id <> partner_id
+                GROUP BY
+                    guild_id
+                """.format(where),
+            )
+            parent_counts = await db(
+                """
+                SELECT
+                    guild_id,
+                    COUNT(*) AS count
+                FROM
+                    parents
+                WHERE
+                    {0}
+                    AND child_id <> parent_id
+                GROUP BY
+                    guild_id
+                """.format(where),
+            )
+        except Exception as e:
+            self.logger.error(f"Couldn't catch up from family graph snapshot: {e}", exc_info=e)
+            return False
+
+        # Build the graphs for the guilds that this bot looks after
+        is_server_specific = self.bot.config.get('is_server_specific', False)
+        graphs = []
+        for graph in snapshot.to_graphs():
+            if (graph.guild_id != 0) == is_server_specific:
+                graphs.append(graph)
+            await asyncio.sleep(0)
+        utils.FamilyGraph.replace_all(graphs)
+
+        # Catch up
+        self.logger.info(
+            f"Catching up {len(partnerships)} partnerships and {len(parents)} parents "
+            f"since {since}"
+        )
+        async for i in aiterator(parents):
+            parent, child = utils.FamilyTreeMember.get_multiple(i['parent_id'], i['child_id'], guild_id=i['guild_id'])
+            old_parent = child.parent
+            if old_parent is not None and old_parent != parent:
+                old_parent.remove_child(child)
+            parent.add_child(child)
+            child.parent = parent
+        async for i in aiterator(partnerships):
+            if i['user_id'] == i['partner_id']:
+                continue
+            user, partner = utils.FamilyTreeMember.get_multiple(i['user_id'], i['partner_id'], guild_id=i['guild_id'])
+            user.add_partner(partner)
+            partner.add_partner(user)
+
+        # Every cluster catches up for itself, so there's nothing to send
+        for graph in utils.FamilyGraph.graphs.values():
+            graph.take_dirty()
+
+        # Anything removed since the snapshot will have left the counts off
+        stale = await self.find_stale_family_graphs(
+            {i['guild_id']: i['count'] for i in partner_counts},
+            {i['guild_id']: i['count'] for i in parent_counts},
+        )
+        for guild_id in stale:
+            await self.reload_family_graph(guild_id)
+        if stale:
+            self.logger.info(f"Reloaded {len(stale)} family graphs that changed since the snapshot")
+
+        # The snapshot doesn't have the times that relations were made, so
+        # get those in the background
+        self.bot.loop.create_task(self.reload_family_timestamps(where))
+        return True
+
+    @staticmethod
+    async def find_stale_family_graphs(
+            partner_counts: Dict[int, int],
+            parent_counts: Dict[int, int]) -> Set[int]:
+        """
+        Get the IDs of the guilds whose cached graphs don't have the same
+        number of partnerships and parents as the given counts.
+        """
+
+        stale: Set[int] = set()
+        for guild_id in set(partner_counts) | set(parent_counts) | set(utils.FamilyGraph.graphs):
+            graph = utils.FamilyGraph.graphs.get(guild_id)
+            if graph is None:
+                stale.add(guild_id)
+                continue
+            parent_edges, partner_edges = graph.store.to_edges()
+            if (
+                    len(parent_edges) // 2 != parent_counts.get(guild_id, 0)
+                    or len(partner_edges) // 2 != partner_counts.get(guild_id, 0)):
+                stale.add(guild_id)
+            await asyncio.sleep(0)
+        return stale
+
+    @tasks.loop(hours=1)
+    async def sweep_family_graphs(self):
+        """
+        Drop anyone who has no relations left from the cached family
+        graphs.
+        """
+
+        if not self.family_cache_ready:
+            return
+        reclaimed = utils.FamilyGraph.sweep()
+        if reclaimed:
+            self.logger.info(f"Swept {reclaimed} empty family tree members from the cache")
+
+    @tasks.loop(minutes=15)
+    async def post_family_analytics(self):
+        """
+        Post the shape of the cached family graphs to Statsd.
+        """
+
+        # Every cluster has the same graphs, so only one of them posts
+        if not self.family_cache_ready:
+            return
+        if 0 not in (self.bot.shard_ids or [0]):
+            return
+
+        # Copy the graphs out here, and work them out in the worker pool
+        exports = []
+        for graph in list(utils.FamilyGraph.graphs.values()):
+            exports.append(utils.export_graph_arrays(graph))
+            await asyncio.sleep(0)
+        arrays = await self.bot.loop.run_in_executor(None, utils.merge_graph_arrays, exports)
+        analytics = await utils.FamilyWorkerPool.run(
+            utils.FamilyAnalytics.compute_arrays,
+            0,
+            arrays,
+            self.bot.config['max_family_members'],
+        )
+
+        # And post them
+        async with self.bot.stats() as stats:
+            stats.gauge("marriagebot.families.users", value=analytics.member_count)
+            stats.gauge("marriagebot.families.related_users", value=analytics.related_count)
+            stats.gauge("marriagebot.families.count", value=analytics.family_count)
+            stats.gauge("marriagebot.families.near_limit", value=analytics.near_limit_count)
+            stats.gauge("marriagebot.families.largest", value=analytics.largest_family_size)
+            stats.gauge("marriagebot.families.most_generations", value=analytics.most_generations)
+            for name, counts in (
+                    ("size", analytics.family_sizes,),
+                    ("generations", analytics.generation_counts,),
+                    ("children", analytics.child_counts,),
+                    ("partners", analytics.partner_counts,)):
+                for bucket, count in utils.FamilyAnalytics.bucket(counts).items():
+                    stats.gauge(f"marriagebot.families.{name}", value=count, tags={"bucket": bucket})
+
+    @post_family_analytics.before_loop
+    async def before_post_family_analytics(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=30)
+    async def write_family_snapshot(self):
+        """
+        Save a snapshot and/or shared image of every cached family graph,
+        so that the next startup can skip reading everything from the
+        database.
+        """
+
+        if not self.family_cache_ready:
+            return
+
+        # Every cluster runs this, so skip files that another cluster has
+        # just written. This only saves work - each writer uses its own
+        # temporary file, so two clusters writing at once is still safe
+        interval = self.write_family_snapshot.minutes * 60
+        writers = []
+        for location, writer in (
+                (self.snapshot_location, utils.FamilyGraphSnapshot.write,),
+                (self.image_location, utils.FamilyGraphImage.write,)):
+            if not location:
+                continue
+            try:
+                if os.path.getmtime(location) > time.time() - (interval / 2):
+                    continue
+            except OSError:
+                pass
+            writers.append((location, writer,))
+        if not writers:
+            return
+
+        # Take the snapshot here, but do the writing in a thread
+        snapshot = utils.FamilyGraphSnapshot.from_graphs(list(utils.FamilyGraph.graphs.values()), dt.utcnow())
+        for location, writer in writers:
+            try:
+                await self.bot.loop.run_in_executor(None, writer, snapshot, location)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Couldn't write family graph snapshot to {location}: {e}", exc_info=e)
+                continue
+            self.logger.info(f"Wrote family graph snapshot to {location} ({snapshot.edge_count} edges)")
+
+    @vbu.Cog.listener("on_reload_family_graph")
+    async def reload_family_graph(self, guild_id: int):
+        """
+        Reload a single guild's family tree from the database, leaving every
+        other guild alone.
+        """
+
+        self.logger.info("Asked to reload family graph for guild ID %s", guild_id)
+        try:
+            async with vbu.Database() as db:
+                partnerships: List[types.MarriagesDB] = await db(
+                    """SELECT * FROM marriages WHERE guild_id = $1""",
+                    guild_id,
+                )
+                parents: List[types.ParentageDB] = await db(
+                    """SELECT * FROM parents WHERE guild_id = $1""",
+                    guild_id,
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Ran into an error reloading the family graph for guild ID {guild_id}: {e}",
+                exc_info=e,
+            )
+            return
+
+        # Swap in the new graph, or drop it if the guild has no family data
+        graphs = await self.build_family_graphs(partnerships, parents)
+        if graphs:
+            utils.FamilyGraph.swap(graphs[0])
+        else:
+            utils.FamilyGraph.drop(guild_id)
+        self.logger.info("Reloaded family graph for guild ID %s", guild_id)
+
 
 def setup(bot: types.Bot):
     x = CacheHandler(bot)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from datetime import timezone
 from typing import Optional
 import asyncio
 import collections
+import itertools
 from uuid import uuid4
 
 import discord
@@ -23,6 +25,10 @@ class TreeCommandCooldown:
 
 class Information(vbu.Cog[utils.types.Bot]):
 
+    # The most people that /family find and /family relatives list
+    FAMILY_FIND_LIMIT = 20
+    FAMILY_RELATIVES_LIMIT = 20
+
     def __init__(self, bot):
         super().__init__(bot)
         TreeCommandCooldown.bot = bot
@@ -351,19 +357,104 @@ class Information(vbu.Cog[utils.types.Bot]):
 
         # Get size
         size = user_info.family_member_count
+        generations = ""
+        if size > 1:
+            generation_count = user_info.generation_count
+            generations = f" across {generation_count} generation{'s' if generation_count > 1 else ''}"
 
         # Output
         output = (
-            f"There {'are' if size > 1 else 'is'} {size} {'people' if size > 1 else 'person'} "
+            f"There {'are' if size > 1 else 'is'} {size} {'people' if size > 1 else 'person'}{generations} "
             f"in **{utils.escape_markdown(user_name)}**'s family tree."
         )
         if user_id == ctx.author.id:
             output = (
                 f"There {'are' if size > 1 else 'is'} {size} "
-                f"{'people' if size > 1 else 'person'} in your family tree."
+                f"{'people' if size > 1 else 'person'}{generations} in your family tree."
             )
         await vbu.embeddify(ctx, output, allowed_mentions=discord.AllowedMentions.none())
 
+    @commands.command(
+        aliases=['treestats', 'fstats'],
+        application_command_meta=commands.ApplicationCommandMeta(
+            options=[
+                discord.ApplicationCommandOption(
+                    name="user",
+                    description="The user who you want to see the family statistics of.",
+                    type=discord.ApplicationCommandOptionType.user,
+                    required=False,
+                ),
+            ],
+        ),
+    )
+    @commands.defer()
+    @commands.cooldown(1, 3, commands.BucketType.user)
+    @vbu.checks.bot_is_ready()
+    @commands.bot_has_permissions(send_messages=True)
+    async def familystats(
+            self,
+            ctx: vbu.Context,
+            user: Optional[vbu.converters.UserID] = None):
+        """
+        Gives you some statistics about your family tree.
+        """
+
+        # Get the user's info
+        user_id = user or ctx.author.id
+        user_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, user_id)
+        user_info = utils.FamilyTreeMember.get(user_id, utils.get_family_guild_id(ctx))
+
+        # Make sure they have a family
+        if user_info.is_empty:
+            if user_id == ctx.author.id:
+                return await ctx.send("You have no family to get statistics for .-.")
+            return await ctx.send(
+                f"**{utils.escape_markdown(user_name)}** has no family to get statistics for .-.",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
+        stats = user_info.statistics
+
+        # Output
+        if user_id == ctx.author.id:
+            output = ["**Your family tree:**"]
+        else:
+            output = [f"**{utils.escape_markdown(user_name)}'s family tree:**"]
+        output.extend([
+            (
+                f"\N{BULLET} **{stats.member_count}** {'people' if stats.member_count > 1 else 'person'} "
+                f"across **{stats.generation_count}** generation{'s' if stats.generation_count > 1 else ''}"
+            ),
+            (
+                f"\N{BULLET} The biggest generation has **{stats.widest_generation}** "
+                f"{'people' if stats.widest_generation > 1 else 'person'} in it"
+            ),
+            (
+                f"\N{BULLET} **{stats.marriage_count}** marriage{'s' if stats.marriage_count != 1 else ''} "
+                f"and **{stats.adoption_count}** {'child' if stats.adoption_count == 1 else 'children'}"
+            ),
+        ])
+        if stats.oldest_marriage:
+            timestamp, partner_a, partner_b = stats.oldest_marriage
+            names = [
+                utils.escape_markdown(await utils.DiscordNameManager.fetch_name_by_id(self.bot, i))
+                for i in (partner_a, partner_b)
+            ]
+            output.append(
+                f"\N{BULLET} The oldest marriage is between **{names[0]}** and **{names[1]}**, "
+                f"since {discord.utils.format_dt(timestamp.replace(tzinfo=timezone.utc), 'D')}"
+            )
+        if stats.oldest_adoption:
+            timestamp, child, parent = stats.oldest_adoption
+            names = [
+                utils.escape_markdown(await utils.DiscordNameManager.fetch_name_by_id(self.bot, i))
+                for i in (parent, child)
+            ]
+            output.append(
+                f"\N{BULLET} The oldest adoption is **{names[0]}** adopting **{names[1]}**, on "
+                f"{discord.utils.format_dt(timestamp.replace(tzinfo=timezone.utc), 'D')}"
+            )
+        await vbu.embeddify(ctx, "\n".join(output), allowed_mentions=discord.AllowedMentions.none())
+
     @commands.command(
         aliases=['relation'],
         application_command_meta=commands.ApplicationCommandMeta(
@@ -420,6 +511,14 @@ class Information(vbu.Cog[utils.types.Bot]):
         )
         relation = user_info.get_relation(other_info)
 
+        # If the closest relation goes through a marriage, say how they're
+        # related by blood too
+        blood_relation = None
+        if relation is not None:
+            blood_relation = user_info.get_blood_relation(other_info)
+            if blood_relation == relation:
+                blood_relation = None
+
         # Get names
         user_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, user_id)
         other_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, other_id)
@@ -439,8 +538,126 @@ class Information(vbu.Cog[utils.types.Bot]):
             )
             if user_id == ctx.author.id:
                 output = f"**{utils.escape_markdown(other_name)}** is your {relation}."
+            if blood_relation is not None:
+                output = output[:-1] + vbu.format(
+                    ", and {0:pronoun,your,their} {1} by blood.",
+                    user_id == ctx.author.id,
+                    blood_relation,
+                )
         await vbu.embeddify(ctx, output, allowed_mentions=discord.AllowedMentions.none())
 
+    @commands.group(
+        application_command_meta=commands.ApplicationCommandMeta(),
+    )
+    @commands.cooldown(1, 3, commands.BucketType.user)
+    @commands.bot_has_permissions(send_messages=True)
+    async def family(
+            self,
+            ctx: vbu.Context):
+        """
+        Look through the people in your family.
+        """
+
+        if ctx.invoked_subcommand is None:
+            return await ctx.send_help(ctx.command)
+
+    @family.command(
+        name="find",
+        aliases=['search'],
+        application_command_meta=commands.ApplicationCommandMeta(
+            options=[
+                discord.ApplicationCommandOption(
+                    name="name",
+                    description="The start of the name of the person you're looking for.",
+                    type=discord.ApplicationCommandOptionType.string,
+                ),
+            ],
+        ),
+    )
+    @commands.defer()
+    @commands.cooldown(1, 3, commands.BucketType.user)
+    @vbu.checks.bot_is_ready()
+    @commands.bot_has_permissions(send_messages=True)
+    async def family_find(
+            self,
+            ctx: vbu.Context,
+            *,
+            name: str):
+        """
+        Find the people in your family whose names start with the given text.
+        """
+
+        # Search their family
+        user_info = utils.FamilyTreeMember.get(ctx.author.id, utils.get_family_guild_id(ctx))
+        found = user_info.freeze().name_index.find(name, limit=self.FAMILY_FIND_LIMIT + 1)
+        if not found:
+            return await ctx.send(
+                f"There's nobody called **{utils.escape_markdown(name)}** in your family tree.",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
+
+        # And tell them who we found
+        output = "\n".join([
+            f"\N{BULLET} **{utils.escape_markdown(utils.DiscordNameManager.cached_name(i) or str(i))}** (`{i}`)"
+            for i in found[:self.FAMILY_FIND_LIMIT]
+        ])
+        if len(found) > self.FAMILY_FIND_LIMIT:
+            output += "\n...and more - try a longer name to narrow it down."
+        await vbu.embeddify(ctx, output, allowed_mentions=discord.AllowedMentions.none())
+
+    @family.command(
+        name="relatives",
+        aliases=['closest'],
+        application_command_meta=commands.ApplicationCommandMeta(
+            options=[
+                discord.ApplicationCommandOption(
+                    name="user",
+                    description="The user who you want to see the closest relatives of.",
+                    type=discord.ApplicationCommandOptionType.user,
+                    required=False,
+                ),
+            ],
+        ),
+    )
+    @commands.defer()
+    @commands.cooldown(1, 3, commands.BucketType.user)
+    @vbu.checks.bot_is_ready()
+    @commands.bot_has_permissions(send_messages=True)
+    async def family_relatives(
+            self,
+            ctx: vbu.Context,
+            user: Optional[vbu.converters.UserID] = None):
+        """
+        Lists the people closest to you in your family tree, and how you're related to them.
+        """
+
+        # Get everyone they're related to, closest first
+        user_id = user or ctx.author.id
+        user_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, user_id)
+        user_info = utils.FamilyTreeMember.get(user_id, utils.get_family_guild_id(ctx))
+        relations = user_info.get_all_relations()
+        if not relations:
+            if user_id == ctx.author.id:
+                return await ctx.send("You have no family to list .-.")
+            return await ctx.send(
+                f"**{utils.escape_markdown(user_name)}** has no family to list .-.",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
+
+        # And list the closest ones
+        if user_id == ctx.author.id:
+            output = ["**Your closest relatives:**"]
+            whose = "your"
+        else:
+            output = [f"**{utils.escape_markdown(user_name)}'s closest relatives:**"]
+            whose = f"{utils.escape_markdown(user_name)}'s"
+        for i, relation in itertools.islice(relations.items(), self.FAMILY_RELATIVES_LIMIT):
+            name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, i)
+            output.append(f"\N{BULLET} **{utils.escape_markdown(name)}**, {whose} {relation}")
+        if len(relations) > self.FAMILY_RELATIVES_LIMIT:
+            output.append(f"...and {len(relations) - self.FAMILY_RELATIVES_LIMIT} more.")
+        await vbu.embeddify(ctx, "\n".join(output), allowed_mentions=discord.AllowedMentions.none())
+
     @commands.command(
         aliases=['familytree', 't', 'wreath'],
         application_command_meta=commands.ApplicationCommandMeta(
@@ -451,6 +668,14 @@ class Information(vbu.Cog[utils.types.Bot]):
                     type=discord.ApplicationCommandOptionType.user,
                     required=False,
                 ),
+                discord.ApplicationCommandOption(
+                    name="depth",
+                    description="How many generations above and below the user to show.",
+                    type=discord.ApplicationCommandOptionType.integer,
+                    required=False,
+                    min_value=1,
+                    max_value=10,
+                ),
             ],
         ),
     )
@@ -462,7 +687,8 @@ class Information(vbu.Cog[utils.types.Bot]):
     async def tree(
             self,
             ctx: vbu.Context,
-            user: Optional[vbu.converters.UserID] = None):
+            user: Optional[vbu.converters.UserID] = None,
+            depth: Optional[int] = None):
         """
         Get the tree of blood-related family members for a user.
         """
@@ -475,6 +701,7 @@ class Information(vbu.Cog[utils.types.Bot]):
                 return await self.treemaker(
                     ctx=ctx,
                     user_id=user or ctx.author.id,
+                    depth=depth,
                 )
             except Exception:
                 raise
@@ -489,6 +716,14 @@ class Information(vbu.Cog[utils.types.Bot]):
                     type=discord.ApplicationCommandOptionType.user,
                     required=False,
                 ),
+                discord.ApplicationCommandOption(
+                    name="depth",
+                    description="How many generations above and below the user to show.",
+                    type=discord.ApplicationCommandOptionType.integer,
+                    required=False,
+                    min_value=1,
+                    max_value=10,
+                ),
             ],
         ),
     )
@@ -500,7 +735,8 @@ class Information(vbu.Cog[utils.types.Bot]):
     async def fulltree(
             self,
             ctx: vbu.Context,
-            user: Optional[vbu.converters.UserID] = None):
+            user: Optional[vbu.converters.UserID] = None,
+            depth: Optional[int] = None):
         """
         Get the entire family of relations for a user.
         """
@@ -514,6 +750,7 @@ class Information(vbu.Cog[utils.types.Bot]):
                     ctx=ctx,
                     user_id=user or ctx.author.id,
                     stupid_tree=True,
+                    depth=depth,
                 )
             except Exception:
                 raise
@@ -562,7 +799,8 @@ class Information(vbu.Cog[utils.types.Bot]):
             user_id: int,
             stupid_tree: bool = False,
             *,
-            send_dot: bool = False):
+            send_dot: bool = False,
+            depth: Optional[int] = None):
         """
         Handles the generation and sending of the tree to the user.
         """
@@ -587,10 +825,12 @@ class Information(vbu.Cog[utils.types.Bot]):
         # Get their dot script
         if not isinstance(ctx, commands.SlashContext):
             await ctx.trigger_typing()
+        if depth is not None:
+            depth = min(max(depth, 1), 10)
         if stupid_tree:
-            dot_code = await user_info.to_full_dot_script(self.bot, customisations)
+            dot_code = await user_info.to_full_dot_script(self.bot, customisations, depth)
         else:
-            dot_code = await user_info.to_dot_script(self.bot, customisations)
+            dot_code = await user_info.to_dot_script(self.bot, customisations, depth)
 
         # Write the dot to a file
         filename_id = str(uuid4())
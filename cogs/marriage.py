@@ -152,19 +152,9 @@ class Marriage(vbu.Cog[types.Bot]):
             )
 
         # Check the size of their trees
-        # TODO I can make this a util because I'm going to use it a couple times
         max_family_members = utils.get_max_family_members(ctx)
-        family_member_count = 0
         if author_tree.id not in self.bot.owner_ids:
-            for _ in author_tree.span(add_parent=True, expand_upwards=True):
-                if family_member_count >= max_family_members:
-                    break
-                family_member_count += 1
-            for _ in target_tree.span(add_parent=True, expand_upwards=True):
-                if family_member_count >= max_family_members:
-                    break
-                family_member_count += 1
-            if family_member_count >= max_family_members:
+            if utils.FamilyTreeMember.would_exceed(author_tree, target_tree, max_family_members):
                 await lock.unlock()
                 return await ctx.send(
                     (
@@ -226,8 +216,9 @@ class Marriage(vbu.Cog[types.Bot]):
         author_tree.add_partner(target.id)
         target_tree.add_partner(ctx.author.id)
         if dispatch_tmu:
-            await re.publish("TreeMemberUpdate", author_tree.to_json())
-            await re.publish("TreeMemberUpdate", target_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
+        else:
+            utils.FamilyGraph.get(family_guild_id).mark_clean(ctx.author.id, target.id)
         await re.disconnect()
         await lock.unlock()
 
@@ -299,7 +290,7 @@ class Marriage(vbu.Cog[types.Bot]):
         partner_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, partner_tree.id)
 
         # Make sure they're actually children
-        if partner_tree.id not in user_tree._partners:
+        if not user_tree.has_partner(partner_tree):
             return await ctx.send(
                 f"It doesn't look like **{utils.escape_markdown(partner_name)}** is one of your partners!",
                 allowed_mentions=discord.AllowedMentions.none(),
@@ -324,8 +315,7 @@ class Marriage(vbu.Cog[types.Bot]):
 
         # Remove from redis
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", user_tree.to_json())
-            await re.publish("TreeMemberUpdate", partner_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
 
         # Remove from database
         async with vbu.Database() as db:
@@ -128,13 +128,22 @@ class Parentage(vbu.Cog[utils.types.Bot]):
             )
 
         # See if we're already married
-        if ctx.author.id in target_tree._children:
+        if target_tree.has_child(ctx.author.id):
             await lock.unlock()
             return await ctx.send(
                 f"Hey isn't {target.mention} already your child? \N{FACE WITH ROLLING EYES}",
                 allowed_mentions=utils.only_mention(ctx.author),
             )
 
+        # See if they're descended from us - this is never allowed, since
+        # it'd make a loop
+        if author_tree.is_ancestor_of(target_tree):
+            await lock.unlock()
+            return await ctx.send(
+                f"Hey, {ctx.author.mention}, {target.mention} is descended from you - they can't be your parent!",
+                allowed_mentions=utils.only_mention(ctx.author),
+            )
+
         # See if they're already related
         relation = author_tree.get_relation(target_tree)
         if relation and utils.guild_allows_incest(ctx) is False:
@@ -154,16 +163,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Check the size of their trees
         max_family_members = utils.get_max_family_members(ctx)
-        family_member_count = 0
-        for _ in author_tree.span(add_parent=True, expand_upwards=True):
-            if family_member_count >= max_family_members:
-                break
-            family_member_count += 1
-        for _ in target_tree.span(add_parent=True, expand_upwards=True):
-            if family_member_count >= max_family_members:
-                break
-            family_member_count += 1
-        if family_member_count >= max_family_members:
+        if utils.FamilyTreeMember.would_exceed(author_tree, target_tree, max_family_members):
             await lock.unlock()
             return await ctx.send(
                 f"If you added {target.mention} to your family, you'd have over {max_family_members} in your family. Sorry!",
@@ -182,6 +182,14 @@ class Parentage(vbu.Cog[utils.types.Bot]):
         if result is None:
             return await lock.unlock()
 
+        # Make sure their trees haven't changed into a loop while we waited
+        if author_tree.is_ancestor_of(target_tree):
+            await lock.unlock()
+            return await vbu.embeddify(
+                result.messageable,
+                f"Sorry, {ctx.author.mention}, {target.mention} is descended from you now - they can't be your parent.",
+            )
+
         # Database it up
         dispatch_tmu: bool = True
         async with vbu.Database() as db:
@@ -200,11 +208,12 @@ class Parentage(vbu.Cog[utils.types.Bot]):
         )
 
         # And we're done
-        target_tree._children.append(author_tree.id)
-        author_tree._parent = target.id
+        target_tree.add_child(author_tree)
+        author_tree.parent = target.id
         if dispatch_tmu:
-            await re.publish("TreeMemberUpdate", author_tree.to_json())
-            await re.publish("TreeMemberUpdate", target_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
+        else:
+            utils.FamilyGraph.get(family_guild_id).mark_clean(ctx.author.id, target.id)
         await re.disconnect()
         await lock.unlock()
 
@@ -264,13 +273,22 @@ class Parentage(vbu.Cog[utils.types.Bot]):
             )
 
         # See if we're already married
-        if target.id in author_tree._children:
+        if author_tree.has_child(target.id):
             await lock.unlock()
             return await ctx.send(
                 f"Hey, {ctx.author.mention}, they're already your child \N{FACE WITH ROLLING EYES}",
                 allowed_mentions=utils.only_mention(ctx.author),
             )
 
+        # See if we're descended from them - this is never allowed, since
+        # it'd make a loop
+        if target_tree.is_ancestor_of(author_tree):
+            await lock.unlock()
+            return await ctx.send(
+                f"Hey, {ctx.author.mention}, you're descended from {target.mention} - you can't adopt them!",
+                allowed_mentions=utils.only_mention(ctx.author),
+            )
+
         # See if they're already related
         relation = author_tree.get_relation(target_tree)
         if relation and utils.guild_allows_incest(ctx) is False:
@@ -290,16 +308,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Check the size of their trees
         max_family_members = utils.get_max_family_members(ctx)
-        family_member_count = 0
-        for _ in author_tree.span(add_parent=True, expand_upwards=True):
-            if family_member_count >= max_family_members:
-                break
-            family_member_count += 1
-        for _ in target_tree.span(add_parent=True, expand_upwards=True):
-            if family_member_count >= max_family_members:
-                break
-            family_member_count += 1
-        if family_member_count >= max_family_members:
+        if utils.FamilyTreeMember.would_exceed(author_tree, target_tree, max_family_members):
             await lock.unlock()
             return await ctx.send(
                 f"If you added {target.mention} to your family, you'd have over {max_family_members} in your family. Sorry!",
@@ -317,6 +326,14 @@ class Parentage(vbu.Cog[utils.types.Bot]):
         if result is None:
             return await lock.unlock()
 
+        # Make sure their trees haven't changed into a loop while we waited
+        if target_tree.is_ancestor_of(author_tree):
+            await lock.unlock()
+            return await vbu.embeddify(
+                result.messageable,
+                f"Sorry, {ctx.author.mention}, you're descended from {target.mention} now - you can't adopt them.",
+            )
+
         # Database it up
         dispatch_tmu: bool = True
         async with vbu.Database() as db:
@@ -351,11 +368,12 @@ class Parentage(vbu.Cog[utils.types.Bot]):
         )
 
         # And we're done
-        author_tree._children.append(target.id)
-        target_tree._parent = author_tree.id
+        author_tree.add_child(target.id)
+        target_tree.parent = author_tree
         if dispatch_tmu:
-            await re.publish('TreeMemberUpdate', author_tree.to_json())
-            await re.publish('TreeMemberUpdate', target_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
+        else:
+            utils.FamilyGraph.get(family_guild_id).mark_clean(ctx.author.id, target.id)
         await re.disconnect()
         await lock.unlock()
 
@@ -428,7 +446,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
         child_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, child_tree.id)
 
         # Make sure they're actually children
-        if child_tree.id not in user_tree._children:
+        if not user_tree.has_child(child_tree):
             return await ctx.send(
                 f"It doesn't look like **{utils.escape_markdown(child_name)}** is one of your children!",
                 allowed_mentions=discord.AllowedMentions.none(),
@@ -453,8 +471,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Remove from redis
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", user_tree.to_json())
-            await re.publish("TreeMemberUpdate", child_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
 
         # Remove from database
         async with vbu.Database() as db:
@@ -518,8 +535,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Ping them off over reids
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", user_tree.to_json())
-            await re.publish("TreeMemberUpdate", parent_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
 
         # Remove their relationship from the database
         async with vbu.Database() as db:
@@ -570,8 +586,8 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Disown em
         for child in child_trees:
-            child._parent = None
-        user_tree._children = []
+            child.parent = None
+        user_tree.children = []
 
         # Save em
         async with vbu.Database() as db:
@@ -589,8 +605,7 @@ class Parentage(vbu.Cog[utils.types.Bot]):
 
         # Redis em
         async with vbu.Redis() as re:
-            for person in child_trees + [user_tree]:
-                await re.publish("TreeMemberUpdate", person.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
 
         # Output to user
         await vbu.embeddify(
@@ -18,6 +18,8 @@ class RedisHandler(vbu.Cog[utils.types.Bot]):
             self.update_gifs_enabled.start()
             self.send_user_message.start()
             self.tree_member_update.start()
+            self.tree_member_updates.start()
+            self.family_graph_reload.start()
 
     def cog_unload(self):
         self.update_guild_prefix.stop()
@@ -27,6 +29,8 @@ class RedisHandler(vbu.Cog[utils.types.Bot]):
         self.update_gifs_enabled.stop()
         self.send_user_message.stop()
         self.tree_member_update.stop()
+        self.tree_member_updates.stop()
+        self.family_graph_reload.stop()
 
     @vbu.redis_channel_handler("UpdateGuildPrefix")
     def update_guild_prefix(self, payload: utils.types.GuildPrefixPayload):
@@ -93,7 +97,22 @@ class RedisHandler(vbu.Cog[utils.types.Bot]):
 
     @vbu.redis_channel_handler("TreeMemberUpdate")
     def tree_member_update(self, payload: utils.types.FamilyTreeMemberPayload):
-        utils.FamilyTreeMember(**payload)
+        utils.FamilyTreeMember.load_published({
+            "guild_id": payload['guild_id'],
+            "members": [payload],
+        })
+
+    @vbu.redis_channel_handler("TreeMemberUpdates")
+    def tree_member_updates(self, payload: utils.types.FamilyTreeMembersPayload):
+        utils.FamilyTreeMember.load_published(payload)
+
+    @vbu.redis_channel_handler("FamilyGraphReload")
+    def family_graph_reload(self, payload: utils.types.FamilyGraphReloadPayload):
+        """
+        Reloads a single guild's family tree from the database.
+        """
+
+        self.bot.dispatch("reload_family_graph", payload['guild_id'])
 
 
 def setup(bot: vbu.Bot):
@@ -380,8 +380,7 @@ class ServerSpecific(vbu.Cog[utils.types.Bot]):
         user_a_tree.add_partner(user_b)
         user_b_tree.add_partner(user_a)
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", user_a_tree.to_json())
-            await re.publish("TreeMemberUpdate", user_b_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
 
     @commands.command(
         application_command_meta=commands.ApplicationCommandMeta(
@@ -434,8 +433,7 @@ class ServerSpecific(vbu.Cog[utils.types.Bot]):
         user_b_tree = user_a_tree.remove_partner(user_b, return_added=True)
         user_b_tree.remove_partner(user_a)
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", user_a_tree.to_json())
-            await re.publish("TreeMemberUpdate", user_b_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
         await ctx.send("Consider it done.")
 
     @commands.command(
@@ -489,6 +487,11 @@ class ServerSpecific(vbu.Cog[utils.types.Bot]):
                 allowed_mentions=discord.AllowedMentions.none(),
             )
         parent_name = await utils.DiscordNameManager.fetch_name_by_id(self.bot, parent_tree.id)
+        if parent_tree == child_tree or child_tree.is_ancestor_of(parent_tree):
+            return await ctx.send(
+                f"**{parent_name}** is descended from **{child_name}**, so they can't be their parent.",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
 
         # Update database
         async with vbu.Database() as db:
@@ -517,11 +520,10 @@ class ServerSpecific(vbu.Cog[utils.types.Bot]):
                 return await ctx.send("I ran into an error saving your family data.")
 
         # Update cache
-        parent_tree._children.append(child.id)
-        child_tree._parent = parent.id
+        parent_tree.add_child(child.id)
+        child_tree.parent = parent.id
         async with vbu.Redis() as re:
-            await re.publish('TreeMemberUpdate', parent_tree.to_json())
-            await re.publish('TreeMemberUpdate', child_tree.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
         await ctx.send(f"Added **{child_name}** to **{parent_name}**'s children list.")
 
     @commands.command(
@@ -572,11 +574,9 @@ class ServerSpecific(vbu.Cog[utils.types.Bot]):
             child_tree.parent.remove_child(child.id)
         except ValueError:
             pass
-        parent = child_tree.parent
         child_tree.parent = None
         async with vbu.Redis() as re:
-            await re.publish("TreeMemberUpdate", child_tree.to_json())
-            await re.publish("TreeMemberUpdate", parent.to_json())
+            await utils.FamilyTreeMember.publish_dirty(re, family_guild_id)
         await ctx.send("Consider it done.")
 
 
@@ -17,7 +17,21 @@ from cogs.utils.proposal_message_checker import (
     escape_markdown,
 )
 from cogs.utils.customised_tree_user import CustomisedTreeUser
+from cogs.utils.family_tree.family_store import FamilyStore
+from cogs.utils.family_tree.compact_family_store import CompactFamilyStore
+from cogs.utils.family_tree.dict_family_store import DictFamilyStore
+from cogs.utils.family_tree.family_analytics import FamilyAnalytics
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_arrays import export_graph_arrays, merge_graph_arrays
+from cogs.utils.family_tree.family_graph_image import FamilyGraphImage
+from cogs.utils.family_tree.family_integrity_report import FamilyIntegrityReport
+from cogs.utils.family_tree.family_name_index import FamilyNameIndex
+from cogs.utils.family_tree.family_graph_snapshot import FamilyGraphSnapshot
+from cogs.utils.family_tree.family_statistics import FamilyStatistics
+from cogs.utils.family_tree.family_timestamps import FamilyTimestamps
 from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+from cogs.utils.family_tree.family_worker_pool import FamilyWorkerPool
+from cogs.utils.family_tree.frozen_family import FrozenFamily
 from cogs.utils.family_tree.relationship_string_simplifier import RelationshipStringSimplifier
 from cogs.utils.discord_name_manager import DiscordNameManager
 from cogs.utils.perks_handler import (
@@ -46,7 +60,22 @@ __all__ = (
     'only_mention',
     'escape_markdown',
     'CustomisedTreeUser',
+    'FamilyStore',
+    'CompactFamilyStore',
+    'DictFamilyStore',
+    'FamilyAnalytics',
+    'FamilyGraph',
+    'export_graph_arrays',
+    'merge_graph_arrays',
+    'FamilyGraphImage',
+    'FamilyIntegrityReport',
+    'FamilyNameIndex',
+    'FamilyGraphSnapshot',
+    'FamilyStatistics',
+    'FamilyTimestamps',
     'FamilyTreeMember',
+    'FamilyWorkerPool',
+    'FrozenFamily',
     'RelationshipStringSimplifier',
     'DiscordNameManager',
     'get_marriagebot_perks',
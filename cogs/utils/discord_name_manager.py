@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+from typing import Deque, Dict, Optional
+import collections
 
 from discord.ext import vbu
 
@@ -14,6 +15,12 @@ class DiscordNameManager:
 
     cached_names: Dict[int, DiscordNameManager] = {}
 
+    # The users whose cached names have changed, oldest first, so that
+    # anything indexing the names can catch up with them - `change_count`
+    # is how many changes there have ever been, so it works as a position
+    changes: Deque[int] = collections.deque(maxlen=10_000)
+    change_count: int = 0
+
     __slots__ = (
         "user_id",
         "_name",
@@ -28,6 +35,13 @@ class DiscordNameManager:
         self._name: Optional[str] = name
         self.age: int = 0 if self._name else 1_000
         self.cached_names[self.user_id] = self
+        if self._name:
+            self._record_change(user_id)
+
+    @classmethod
+    def _record_change(cls, user_id: int) -> None:
+        cls.changes.append(user_id)
+        cls.change_count += 1
 
     @classmethod
     def get(cls, id: int) -> DiscordNameManager:
@@ -46,7 +60,23 @@ class DiscordNameManager:
         if new_name is None:
             return None
         self.age = 0
-        self._name = new_name
+        if new_name != self._name:
+            self._name = new_name
+            self._record_change(self.user_id)
+
+    @classmethod
+    def cached_name(cls, user_id: int) -> Optional[str]:
+        """
+        Get the name that we have cached for a user, without fetching it or
+        counting towards its validity.
+        """
+
+        v = cls.cached_names.get(user_id)
+        if v is None or not v._name:
+            return None
+        if v._name.endswith("#0"):
+            return v._name[:-2]
+        return v._name
 
     @property
     def name_is_valid(self):
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+from array import array
+from typing import (
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+__all__ = (
+    'AncestorIndex',
+)
+
+
+class AncestorIndex:
+    """
+    A binary lifting index over the parent links of a family tree, so that
+    the depth of a member, their nth ancestor, and the lowest common
+    ancestor of two members can all be found in O(log n) without walking
+    the tree.
+
+    Members are identified by their dense index in a
+    :class:`FamilyStore`. For each member we keep their depth below
+    the root of their line, and their 2^k-th ancestor for every level k.
+
+    Parent links should always form a forest, but old data isn't promised
+    to. If a parent link would make a loop, it's left out of the index and
+    that member is treated as the root of their line.
+
+    Parameters
+    ----------
+    parent_of : Callable[[int], int]
+        A function that gives the index of a member's parent, or -1.
+    children_of : Callable[[int], Iterable[int]]
+        A function that gives the indexes of everyone who might have a
+        member as their parent. This needs to include anyone who has the
+        member as a parent without being listed as their child; anyone
+        given whose parent isn't that member is skipped.
+    """
+
+    __slots__ = (
+        '_parent_of',
+        '_children_of',
+        '_depths',
+        '_jumps',
+    )
+
+    def __init__(
+            self,
+            parent_of: Callable[[int], int],
+            children_of: Callable[[int], Iterable[int]]):
+        self._parent_of = parent_of
+        self._children_of = children_of
+        self._depths: array = array('i')
+        self._jumps: List[array] = [array('i')]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by the depth and jump arrays.
+        """
+
+        return sum(i.itemsize * len(i) for i in (self._depths, *self._jumps))
+
+    def clear(self) -> None:
+        """
+        Remove every member from the index.
+        """
+
+        self._depths = array('i')
+        self._jumps = [array('i')]
+
+    def _ensure(self, node: int) -> None:
+        depths = self._depths
+        if node < len(depths):
+            return
+        missing = node + 1 - len(depths)
+        depths.extend([0] * missing)
+        for jumps in self._jumps:
+            jumps.extend([-1] * missing)
+
+    def _add_level(self) -> None:
+        previous = self._jumps[-1]
+        self._jumps.append(array('i', [
+            -1 if i < 0 else previous[i]
+            for i in previous
+        ]))
+
+    def _refresh(self, node: int, parent: int) -> None:
+        """
+        Set a member's parent in the index, and work out their depth and
+        jumps from it. The parent's entry must already be correct.
+        """
+
+        depths, jumps = self._depths, self._jumps
+        depth = depths[parent] + 1 if parent >= 0 else 0
+        depths[node] = depth
+        while depth >= 1 << len(jumps):
+            self._add_level()
+        jumps[0][node] = parent
+        for level in range(1, len(jumps)):
+            below = jumps[level - 1][node]
+            jumps[level][node] = -1 if below < 0 else jumps[level - 1][below]
+
+    # Queries
+
+    def depth(self, node: int) -> int:
+        """
+        Get how many generations below the root of their line a member is.
+        """
+
+        if node < len(self._depths):
+            return self._depths[node]
+        return 0
+
+    def ancestor(self, node: int, generations: int) -> int:
+        """
+        Get a member's ancestor the given number of generations up, or -1 if
+        their line doesn't go up that far.
+        """
+
+        if generations > self.depth(node):
+            return -1
+        level = 0
+        while generations and node >= 0:
+            if generations & 1:
+                node = self._jumps[level][node]
+            generations >>= 1
+            level += 1
+        return node
+
+    def root(self, node: int) -> int:
+        """
+        Get the member at the top of the given member's line.
+        """
+
+        return self.ancestor(node, self.depth(node))
+
+    def is_ancestor(self, ancestor: int, node: int) -> bool:
+        """
+        Whether or not one member is an ancestor of another (or the same
+        member).
+        """
+
+        difference = self.depth(node) - self.depth(ancestor)
+        return difference >= 0 and self.ancestor(node, difference) == ancestor
+
+    def lowest_common_ancestor(self, a: int, b: int) -> int:
+        """
+        Get the closest member that both given members are descended from
+        (which may be one of them), or -1 if they don't share an ancestor.
+        """
+
+        depth_a, depth_b = self.depth(a), self.depth(b)
+        if depth_a > depth_b:
+            a = self.ancestor(a, depth_a - depth_b)
+        elif depth_b > depth_a:
+            b = self.ancestor(b, depth_b - depth_a)
+        if a == b:
+            return a
+        if a >= len(self._depths) or b >= len(self._depths):
+            return -1
+        for jumps in reversed(self._jumps):
+            if jumps[a] != jumps[b]:
+                a, b = jumps[a], jumps[b]
+        parent = self._jumps[0][a]
+        if parent < 0 or parent != self._jumps[0][b]:
+            return -1
+        return parent
+
+    def blood_distance(self, a: int, b: int) -> Optional[Tuple[int, int]]:
+        """
+        Get how many generations up from one member their lowest common
+        ancestor is, and how many generations down from there the other
+        member is.
+
+        Parameters
+        ----------
+        a : int
+            The index of the first member.
+        b : int
+            The index of the second member.
+
+        Returns
+        -------
+        Optional[Tuple[int, int]]
+            The generations up from ``a`` and down to ``b``, or ``None`` if
+            they aren't blood relatives.
+        """
+
+        ancestor = self.lowest_common_ancestor(a, b)
+        if ancestor < 0:
+            return None
+        depth = self.depth(ancestor)
+        return self.depth(a) - depth, self.depth(b) - depth
+
+    # Updates
+
+    def set_parent(self, node: int) -> None:
+        """
+        Update the index after a member's parent has changed. Everyone
+        descended from that member is updated too.
+        """
+
+        parent = self._parent_of(node)
+        self._ensure(node)
+        if parent >= 0:
+            self._ensure(parent)
+            if parent == node or self.is_ancestor(node, parent):
+                parent = -1  # This would make a loop
+        self._refresh(node, parent)
+
+        # Update everyone below them
+        parent_of, children_of = self._parent_of, self._children_of
+        jumps = self._jumps
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for child in children_of(current):
+                if child >= len(self._depths) or parent_of(child) != current:
+                    continue
+                if jumps[0][child] != current:
+
+                    # They were left out to avoid a loop - see if they still
+                    # need to be
+                    if jumps[0][child] >= 0 or self.root(current) == child:
+                        continue
+                self._refresh(child, current)
+                stack.append(child)
+
+    def rebuild_all(self, node_count: int) -> None:
+        """
+        Build the index from scratch.
+
+        Parameters
+        ----------
+        node_count : int
+            The number of members in the store.
+        """
+
+        parent_of = self._parent_of
+        parents = array('i', [parent_of(i) for i in range(node_count)])
+
+        # Work out everyone's depth, walking up until we hit someone whose
+        # depth we already know and breaking any loops that we find
+        unknown, in_progress = -2, -3
+        depths = array('i', [unknown]) * node_count
+        for start in range(node_count):
+            path: List[int] = []
+            node = start
+            while node >= 0 and depths[node] == unknown:
+                depths[node] = in_progress
+                path.append(node)
+                node = parents[node]
+            if node >= 0 and depths[node] == in_progress:
+
+                # Found a loop, so break it at the person we came back to -
+                # everyone else on the loop ends up below them
+                loop_start = path.index(node)
+                parents[node] = -1
+                depths[node] = 0
+                for depth, i in enumerate(reversed(path[loop_start + 1:]), start=1):
+                    depths[i] = depth
+                for depth, i in enumerate(reversed(path[:loop_start]), start=1):
+                    depths[i] = depth
+            else:
+                depth = depths[node] if node >= 0 else -1
+                for i in reversed(path):
+                    depth += 1
+                    depths[i] = depth
+
+        # Build the jump levels
+        self._depths = depths
+        self._jumps = [parents]
+        max_depth = max(depths, default=0)
+        while max_depth >= 1 << len(self._jumps):
+            self._add_level()
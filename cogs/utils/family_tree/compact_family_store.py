@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from cogs.utils.family_tree.family_store import FamilyStore
+
+
+__all__ = (
+    'CompactFamilyStore',
+)
+
+
+class CompactFamilyStore(FamilyStore):
+    """
+    A compact store for the relations of every member of one family tree
+    (ie one guild).
+
+    Each Discord user with any relations is given a dense integer index,
+    which never changes for as long as they're in the store. Their parent
+    is kept in an int32 array, and their children and partners are kept in
+    compressed sparse row blocks - an array of offsets into an array of
+    target indexes. Rows that have been changed since the last compaction
+    live in an overflow area, which is folded back into the row blocks by
+    :meth:`compact` once enough changes have built up. Every row is kept in
+    snowflake order, so they can be walked in the same order the family
+    tree is drawn in without sorting them.
+
+    Users are looked up by binary searching a sorted array of snowflakes,
+    with anyone added since the last compaction kept in a small dict.
+
+    The compacted arrays can also be read-only views onto a shared image
+    (see :class:`FamilyGraphImage`), in which case the overflow area holds
+    everything that's changed since the image was made. The user and
+    parent columns of an image have spare room at the end for new users.
+    """
+
+    BACKEND_NAME = "compact"
+
+    # The minimum number of changes we'll let build up in the overflow
+    # area before compacting
+    COMPACTION_THRESHOLD = 4_096
+
+    # The names and typecodes of the arrays that make up a compacted store
+    COLUMNS: Tuple[Tuple[str, str], ...] = (
+        ('snowflakes', 'q'),
+        ('sorted_snowflakes', 'q'),
+        ('sorted_indexes', 'i'),
+        ('parents', 'i'),
+        ('child_offsets', 'i'),
+        ('child_targets', 'i'),
+        ('partner_offsets', 'i'),
+        ('partner_targets', 'i'),
+    )
+
+    __slots__ = (
+        '_sorted_snowflakes',
+        '_sorted_indexes',
+        '_recent',
+        '_compacted_count',
+        '_child_offsets',
+        '_child_targets',
+        '_partner_offsets',
+        '_partner_targets',
+        '_child_overflow',
+        '_partner_overflow',
+        '_spare',
+    )
+
+    def __init__(self):
+        self._snowflakes: array = array('q')
+        self._sorted_snowflakes: array = array('q')
+        self._sorted_indexes: array = array('i')
+        self._recent: Dict[int, int] = {}
+        self._parents: array = array('i')
+        self._compacted_count: int = 0
+        self._child_offsets: array = array('i', [0])
+        self._child_targets: array = array('i')
+        self._partner_offsets: array = array('i', [0])
+        self._partner_targets: array = array('i')
+        self._child_overflow: Dict[int, List[int]] = {}
+        self._partner_overflow: Dict[int, List[int]] = {}
+        self._spare: Optional[Tuple[memoryview, memoryview]] = None
+        super().__init__()
+
+    @property
+    def is_mapped(self) -> bool:
+        """
+        Whether the store's compacted arrays are still views onto a shared
+        image.
+        """
+
+        return isinstance(self._sorted_snowflakes, memoryview)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate number of bytes used by the compacted arrays. The
+        overflow area isn't counted.
+        """
+
+        return sum(
+            i.itemsize * len(i)
+            for i in (
+                self._snowflakes,
+                self._sorted_snowflakes,
+                self._sorted_indexes,
+                self._parents,
+                self._child_offsets,
+                self._child_targets,
+                self._partner_offsets,
+                self._partner_targets,
+            )
+        ) + self.components.nbytes + self.ancestors.nbytes
+
+    # Index lookups
+
+    def index_of(self, user_id: int) -> Optional[int]:
+        """
+        Get the dense index of a given user, or ``None`` if they're not
+        in the store.
+        """
+
+        sorted_snowflakes = self._sorted_snowflakes
+        i = bisect_left(sorted_snowflakes, user_id)
+        if i < len(sorted_snowflakes) and sorted_snowflakes[i] == user_id:
+            return self._sorted_indexes[i]
+        return self._recent.get(user_id)
+
+    def ensure_index(self, user_id: int) -> int:
+        """
+        Get the dense index of a given user, adding them to the store if
+        they aren't there already.
+        """
+
+        index = self.index_of(user_id)
+        if index is not None:
+            return index
+        index = len(self._snowflakes)
+        if self._spare is not None and index < len(self._spare[0]):
+
+            # Use the spare room at the end of a mapped image
+            snowflakes, parents = self._spare
+            snowflakes[index] = user_id
+            parents[index] = -1
+            self._snowflakes, self._parents = snowflakes[:index + 1], parents[:index + 1]
+        else:
+            if self._spare is not None:
+                self._detach()
+            self._snowflakes.append(user_id)
+            self._parents.append(-1)
+        self._recent[user_id] = index
+        return index
+
+    def _detach(self) -> None:
+        """
+        Copy the user and parent columns out of a mapped image so that they
+        can be grown.
+        """
+
+        snowflakes, parents = array('q'), array('i')
+        snowflakes.frombytes(self._snowflakes.tobytes())
+        parents.frombytes(self._parents.tobytes())
+        self._snowflakes, self._parents = snowflakes, parents
+        self._spare = None
+
+    # Reading by index
+
+    def child_indexes(self, index: int) -> Sequence[int]:
+        """
+        Get the indexes of a user's children, in snowflake order.
+        """
+
+        row = self._child_overflow.get(index)
+        if row is not None:
+            return row
+        if index < self._compacted_count:
+            offsets = self._child_offsets
+            return self._child_targets[offsets[index]:offsets[index + 1]]
+        return ()
+
+    def partner_indexes(self, index: int) -> Sequence[int]:
+        """
+        Get the indexes of a user's partners, in snowflake order.
+        """
+
+        row = self._partner_overflow.get(index)
+        if row is not None:
+            return row
+        if index < self._compacted_count:
+            offsets = self._partner_offsets
+            return self._partner_targets[offsets[index]:offsets[index + 1]]
+        return ()
+
+    # Writing
+
+    def _editable_row(self, index: int, children: bool) -> List[int]:
+        if children:
+            overflow, offsets, targets = self._child_overflow, self._child_offsets, self._child_targets
+        else:
+            overflow, offsets, targets = self._partner_overflow, self._partner_offsets, self._partner_targets
+        row = overflow.get(index)
+        if row is None:
+            if index < self._compacted_count:
+                row = targets[offsets[index]:offsets[index + 1]].tolist()
+            else:
+                row = []
+            overflow[index] = row
+        return row
+
+    # Compaction
+
+    def _maybe_compact(self) -> None:
+        pending = len(self._recent) + len(self._child_overflow) + len(self._partner_overflow)
+        if pending > max(self.COMPACTION_THRESHOLD, self._compacted_count // 8):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Fold the overflow area back into the compressed row blocks, and
+        rebuild the sorted snowflake lookup.
+        """
+
+        node_count = len(self._snowflakes)
+        snowflakes = self._snowflakes
+        sort_key = snowflakes.__getitem__
+
+        # Rebuild the row blocks
+        self._child_offsets, self._child_targets = self.to_rows(True)
+        self._partner_offsets, self._partner_targets = self.to_rows(False)
+        self._child_overflow = {}
+        self._partner_overflow = {}
+
+        # Rebuild the lookup
+        order = sorted(range(node_count), key=sort_key)
+        self._sorted_indexes = array('i', order)
+        self._sorted_snowflakes = array('q', [snowflakes[i] for i in order])
+        self._recent = {}
+        self._compacted_count = node_count
+
+    def to_rows(self, children: bool) -> Tuple[array, array]:
+        """
+        Get a compacted copy of every user's children or partners, with the
+        overflow area folded in. The store itself isn't changed.
+
+        Parameters
+        ----------
+        children : bool
+            Whether to get the children rows (or the partner rows).
+
+        Returns
+        -------
+        Tuple[array, array]
+            The offsets of each user's row, and the indexes in the rows.
+        """
+
+        if children:
+            overflow, offsets, targets = self._child_overflow, self._child_offsets, self._child_targets
+        else:
+            overflow, offsets, targets = self._partner_overflow, self._partner_offsets, self._partner_targets
+        node_count = len(self._snowflakes)
+        compacted_count = self._compacted_count
+        new_offsets = array('i', [0])
+        new_targets = array('i')
+        position = 0
+        for index in sorted(overflow) + [node_count]:
+
+            # Copy the untouched compacted rows before this one in one go,
+            # shifting their offsets to where they now start
+            end = min(index, compacted_count)
+            if position < end:
+                shift = len(new_targets) - offsets[position]
+                new_targets.extend(targets[offsets[position]:offsets[end]])
+                new_offsets.extend([i + shift for i in offsets[position + 1:end + 1]])
+                position = end
+
+            # Then any empty rows for users added since the last compaction
+            if position < index:
+                new_offsets.extend([len(new_targets)] * (index - position))
+            if index == node_count:
+                break
+            new_targets.extend(overflow[index])
+            new_offsets.append(len(new_targets))
+            position = index + 1
+        return new_offsets, new_targets
+
+    def to_columns(self) -> Dict[str, Sequence[int]]:
+        """
+        Compact the store, and get the arrays that make it up keyed by the
+        names in :attr:`COLUMNS`. These are the store's own arrays, so they
+        mustn't be changed.
+        """
+
+        if self._recent or self._child_overflow or self._partner_overflow:
+            self.compact()
+        return {
+            name: getattr(self, f"_{name}")
+            for name, _ in self.COLUMNS
+        }
+
+    @classmethod
+    def from_columns(
+            cls,
+            columns: Dict[str, Sequence[int]],
+            spare: Optional[Tuple[memoryview, memoryview]] = None) -> CompactFamilyStore:
+        """
+        Build a store around a set of already compacted arrays. The arrays
+        are used as they are rather than copied, so they can be views onto
+        a shared image.
+
+        Parameters
+        ----------
+        columns : Dict[str, Sequence[int]]
+            The arrays, keyed by the names in :attr:`COLUMNS`.
+        spare : Optional[Tuple[memoryview, memoryview]], optional
+            Writable views of the user and parent columns including any
+            spare room at the end of them, for new users to be added in.
+
+        Returns
+        -------
+        CompactFamilyStore
+            The new store.
+        """
+
+        store = cls()
+        for name, _ in cls.COLUMNS:
+            setattr(store, f"_{name}", columns[name])
+        store._spare = spare
+        node_count = len(store._snowflakes)
+        store._compacted_count = node_count
+        store.components.rebuild_all(node_count)
+        store.ancestors.rebuild_all(node_count)
+        return store
+
+    @classmethod
+    def from_edges(
+            cls,
+            parent_edges: Iterable[Tuple[int, int]],
+            partner_edges: Iterable[Tuple[int, int]]) -> CompactFamilyStore:
+        """
+        Build a compacted store in one go from a list of edges.
+
+        Parameters
+        ----------
+        parent_edges : Iterable[Tuple[int, int]]
+            (child ID, parent ID) pairs.
+        partner_edges : Iterable[Tuple[int, int]]
+            (user ID, partner ID) pairs. Each pair is added in both
+            directions.
+
+        Returns
+        -------
+        CompactFamilyStore
+            The new store.
+        """
+
+        parent_edges = list(parent_edges)
+        partner_edges = list(partner_edges)
+
+        # Give everyone an index, in snowflake order
+        user_ids = set()
+        for a, b in parent_edges:
+            user_ids.add(a)
+            user_ids.add(b)
+        for a, b in partner_edges:
+            user_ids.add(a)
+            user_ids.add(b)
+        ordered = sorted(user_ids)
+        index_of = {o: i for i, o in enumerate(ordered)}
+        node_count = len(ordered)
+
+        # Parents and children
+        parents = array('i', [-1]) * node_count
+        child_rows: List[List[int]] = [[] for _ in range(node_count)]
+        for child, parent in parent_edges:
+            if child == parent:
+                continue
+            child_index, parent_index = index_of[child], index_of[parent]
+            parents[child_index] = parent_index
+            child_rows[parent_index].append(child_index)
+
+        # Partners
+        partner_rows: List[List[int]] = [[] for _ in range(node_count)]
+        for a, b in partner_edges:
+            if a == b:
+                continue
+            partner_rows[index_of[a]].append(index_of[b])
+            partner_rows[index_of[b]].append(index_of[a])
+
+        # And build
+        store = cls()
+        store._snowflakes = array('q', ordered)
+        store._sorted_snowflakes = array('q', ordered)
+        store._sorted_indexes = array('i', range(node_count))
+        store._parents = parents
+        for rows, offsets, targets in (
+                (child_rows, store._child_offsets, store._child_targets),
+                (partner_rows, store._partner_offsets, store._partner_targets)):
+            for row in rows:
+                targets.extend(sorted(set(row)))
+                offsets.append(len(targets))
+        store._compacted_count = node_count
+        store.components.rebuild_all(node_count)
+        store.ancestors.rebuild_all(node_count)
+        return store
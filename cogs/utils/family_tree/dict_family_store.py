@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from array import array
+import sys
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from cogs.utils.family_tree.family_store import FamilyStore
+
+
+__all__ = (
+    'DictFamilyStore',
+)
+
+
+class DictFamilyStore(FamilyStore):
+    """
+    A store for the relations of every member of one family tree that
+    keeps everything in plain Python lists and dicts - a list of children
+    and a list of partners for each user, the same as the family tree
+    members used to hold themselves.
+
+    This uses a lot more memory than a :class:`CompactFamilyStore`, but
+    nothing ever needs compacting, so changes always cost the same. It's
+    suited to guilds (eg Gold bot servers) that are small enough for that
+    not to matter.
+    """
+
+    BACKEND_NAME = "dict"
+
+    __slots__ = (
+        '_indexes',
+        '_children',
+        '_partners',
+    )
+
+    def __init__(self):
+        self._snowflakes: List[int] = []
+        self._parents: List[int] = []
+        self._indexes: Dict[int, int] = {}
+        self._children: List[List[int]] = []
+        self._partners: List[List[int]] = []
+        super().__init__()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate number of bytes used by the lists and dicts that
+        make up the store.
+        """
+
+        return (
+            sys.getsizeof(self._snowflakes)
+            + sys.getsizeof(self._parents)
+            + sys.getsizeof(self._indexes)
+            + sum(sys.getsizeof(i) for i in self._children)
+            + sum(sys.getsizeof(i) for i in self._partners)
+        ) + self.components.nbytes + self.ancestors.nbytes
+
+    # Index lookups
+
+    def index_of(self, user_id: int) -> Optional[int]:
+        return self._indexes.get(user_id)
+
+    def ensure_index(self, user_id: int) -> int:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            return index
+        index = self._indexes[user_id] = len(self._snowflakes)
+        self._snowflakes.append(user_id)
+        self._parents.append(-1)
+        self._children.append([])
+        self._partners.append([])
+        return index
+
+    # Reading by index
+
+    def child_indexes(self, index: int) -> List[int]:
+        return self._children[index]
+
+    def partner_indexes(self, index: int) -> List[int]:
+        return self._partners[index]
+
+    # Writing
+
+    def _editable_row(self, index: int, children: bool) -> List[int]:
+        return self._children[index] if children else self._partners[index]
+
+    # Bulk import and export
+
+    def to_rows(self, children: bool) -> Tuple[array, array]:
+        offsets = array('i', [0])
+        targets = array('i')
+        for row in (self._children if children else self._partners):
+            targets.extend(row)
+            offsets.append(len(targets))
+        return offsets, targets
+
+    @classmethod
+    def from_edges(
+            cls,
+            parent_edges: Iterable[Tuple[int, int]],
+            partner_edges: Iterable[Tuple[int, int]]) -> DictFamilyStore:
+        parent_edges = list(parent_edges)
+        partner_edges = list(partner_edges)
+
+        # Give everyone an index, in snowflake order
+        user_ids = set()
+        for a, b in parent_edges:
+            user_ids.add(a)
+            user_ids.add(b)
+        for a, b in partner_edges:
+            user_ids.add(a)
+            user_ids.add(b)
+        store = cls()
+        for i in sorted(user_ids):
+            store.ensure_index(i)
+        index_of = store._indexes
+
+        # Parents and children
+        for child, parent in parent_edges:
+            if child == parent:
+                continue
+            child_index, parent_index = index_of[child], index_of[parent]
+            store._parents[child_index] = parent_index
+            store._children[parent_index].append(child_index)
+
+        # Partners
+        for a, b in partner_edges:
+            if a == b:
+                continue
+            store._partners[index_of[a]].append(index_of[b])
+            store._partners[index_of[b]].append(index_of[a])
+
+        # And build - everyone's in snowflake order, so sorting the rows by
+        # index sorts them by snowflake too
+        for rows in (store._children, store._partners):
+            for i, row in enumerate(rows):
+                if len(row) > 1:
+                    rows[i] = sorted(set(row))
+        node_count = len(store)
+        store.components.rebuild_all(node_count)
+        store.ancestors.rebuild_all(node_count)
+        return store
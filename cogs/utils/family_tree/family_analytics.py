@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+import numpy as np
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_arrays import (
+    connected_labels,
+    export_graph_arrays,
+    line_depths,
+)
+
+
+__all__ = (
+    'FamilyAnalytics',
+)
+
+
+class FamilyAnalytics:
+    """
+    The overall shape of a family graph - how big its families are, how
+    deep they go, and how many relations people have.
+
+    Everything is worked out from an array export of the graph in a few
+    whole-array passes, rather than by spanning from each user, so it can
+    be run over the global tree in a couple of seconds. Families are the
+    connected components of the graph; anyone with no relations isn't
+    counted as being in one.
+
+    Parameters
+    ----------
+    guild_id : int
+        The ID of the guild that was looked at.
+    member_count : int
+        The number of users in the graph.
+    max_family_members : int
+        The family size limit that families were compared against.
+    family_sizes : Dict[int, int]
+        The number of families of each size.
+    generation_counts : Dict[int, int]
+        The number of families with each number of generations.
+    child_counts : Dict[int, int]
+        The number of users with each number of children.
+    partner_counts : Dict[int, int]
+        The number of users with each number of partners.
+    largest_families : List[Tuple[int, int, int]]
+        The biggest families, as (member ID, size, generations).
+    largest_partner_groups : List[Tuple[int, int]]
+        The biggest groups of people joined only by marriage, as (member
+        ID, size). Only groups of more than two are included.
+    """
+
+    # How full a family needs to be to count as near the size limit
+    NEAR_LIMIT = 0.9
+
+    # How many entries the leaderboards are cut down to
+    LEADERBOARD_SIZE = 10
+
+    __slots__ = (
+        'guild_id',
+        'member_count',
+        'max_family_members',
+        'family_sizes',
+        'generation_counts',
+        'child_counts',
+        'partner_counts',
+        'largest_families',
+        'largest_partner_groups',
+    )
+
+    def __init__(
+            self,
+            guild_id: int,
+            member_count: int,
+            max_family_members: int,
+            family_sizes: Dict[int, int],
+            generation_counts: Dict[int, int],
+            child_counts: Dict[int, int],
+            partner_counts: Dict[int, int],
+            largest_families: List[Tuple[int, int, int]],
+            largest_partner_groups: List[Tuple[int, int]]):
+        self.guild_id: int = guild_id
+        self.member_count: int = member_count
+        self.max_family_members: int = max_family_members
+        self.family_sizes: Dict[int, int] = family_sizes
+        self.generation_counts: Dict[int, int] = generation_counts
+        self.child_counts: Dict[int, int] = child_counts
+        self.partner_counts: Dict[int, int] = partner_counts
+        self.largest_families: List[Tuple[int, int, int]] = largest_families
+        self.largest_partner_groups: List[Tuple[int, int]] = largest_partner_groups
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(guild_id={self.guild_id!r}, families={self.family_count})"
+
+    @property
+    def family_count(self) -> int:
+        """
+        The number of families with more than one person in them.
+        """
+
+        return sum(self.family_sizes.values())
+
+    @property
+    def related_count(self) -> int:
+        """
+        The number of users who are in a family.
+        """
+
+        return sum(size * count for size, count in self.family_sizes.items())
+
+    @property
+    def near_limit_count(self) -> int:
+        """
+        The number of families that are close to the family size limit.
+        """
+
+        cutoff = self.max_family_members * self.NEAR_LIMIT
+        return sum(count for size, count in self.family_sizes.items() if size >= cutoff)
+
+    @property
+    def largest_family_size(self) -> int:
+        return max(self.family_sizes, default=0)
+
+    @property
+    def most_generations(self) -> int:
+        return max(self.generation_counts, default=0)
+
+    @staticmethod
+    def _histogram(values: np.ndarray) -> Dict[int, int]:
+        counts = np.bincount(values) if len(values) else np.zeros(0, dtype=np.int64)
+        found = np.flatnonzero(counts)
+        return dict(zip(found.tolist(), counts[found].tolist()))
+
+    @staticmethod
+    def bucket(counts: Dict[int, int]) -> Dict[str, int]:
+        """
+        Group a histogram into power-of-two buckets (``"0"``, ``"1"``,
+        ``"2"``, ``"3-4"``, ``"5-8"``, and so on), for showing or posting.
+        """
+
+        buckets: Dict[str, int] = {}
+        for value, count in sorted(counts.items()):
+            high = (1 << (value - 1).bit_length()) if value else 0
+            low = high // 2 + 1 if high > 2 else high
+            name = str(high) if low == high else f"{low}-{high}"
+            buckets[name] = buckets.get(name, 0) + count
+        return buckets
+
+    @classmethod
+    def compute(cls, graph: FamilyGraph, max_family_members: int) -> FamilyAnalytics:
+        """
+        Work out the analytics for a graph.
+        """
+
+        return cls.compute_arrays(graph.guild_id, export_graph_arrays(graph), max_family_members)
+
+    @classmethod
+    def compute_arrays(
+            cls,
+            guild_id: int,
+            arrays: Dict[str, np.ndarray],
+            max_family_members: int) -> FamilyAnalytics:
+        """
+        Work out the analytics for a graph that's been copied out with
+        :func:`export_graph_arrays`. This only reads the arrays it's given.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild that the arrays are from.
+        arrays : Dict[str, np.ndarray]
+            The arrays from :func:`export_graph_arrays`.
+        max_family_members : int
+            The family size limit to compare families against.
+
+        Returns
+        -------
+        FamilyAnalytics
+            The analytics for the graph.
+        """
+
+        snowflakes, parents = arrays['snowflakes'], arrays['parents']
+        partner_sources, partner_targets = arrays['partner_sources'], arrays['partner_targets']
+        node_count = len(snowflakes)
+        nodes = np.arange(node_count, dtype=np.int64)
+        has_parent = (parents >= 0) & (parents != nodes)
+
+        # Split everyone into families, by their parents and partners
+        labels = connected_labels(
+            node_count,
+            np.concatenate((nodes[has_parent], partner_sources)),
+            np.concatenate((parents[has_parent], partner_targets)),
+        )
+        sizes = np.bincount(labels, minlength=node_count)
+        families = np.flatnonzero(sizes > 1)
+
+        # The number of generations in a family is its longest line of
+        # parents - anyone in a loop just counts as one
+        depths = line_depths(np.where(has_parent, parents, -1))
+        generations = np.zeros(node_count, dtype=np.int64)
+        np.maximum.at(generations, labels, np.maximum(depths, 0) + 1)
+
+        # How many relations everyone has
+        child_counts = np.bincount(parents[has_parent], minlength=node_count)
+        partner_counts = np.bincount(partner_sources, minlength=node_count)
+
+        # Everyone joined only by marriage
+        partner_labels = connected_labels(node_count, partner_sources, partner_targets)
+        partner_sizes = np.bincount(partner_labels, minlength=node_count)
+        partner_groups = np.flatnonzero(partner_sizes > 2)
+
+        # And the leaderboards, biggest first
+        top = families[np.argsort(-sizes[families], kind='stable')[:cls.LEADERBOARD_SIZE]]
+        largest_families = list(zip(
+            snowflakes[top].tolist(),
+            sizes[top].tolist(),
+            generations[top].tolist(),
+        ))
+        top = partner_groups[np.argsort(-partner_sizes[partner_groups], kind='stable')[:cls.LEADERBOARD_SIZE]]
+        largest_partner_groups = list(zip(snowflakes[top].tolist(), partner_sizes[top].tolist()))
+
+        related = sizes[labels] > 1
+        return cls(
+            guild_id,
+            node_count,
+            max_family_members,
+            cls._histogram(sizes[families]),
+            cls._histogram(generations[families]),
+            cls._histogram(child_counts[related]),
+            cls._histogram(partner_counts[related]),
+            largest_families,
+            largest_partner_groups,
+        )
+
+    def to_text(self) -> str:
+        """
+        Summarise the analytics for sending to a moderator.
+        """
+
+        def histogram(counts: Dict[int, int]) -> str:
+            return ", ".join(f"{name}: {count}" for name, count in self.bucket(counts).items()) or "none"
+
+        lines = [
+            f"**{self.member_count}** users in guild {self.guild_id}, "
+            f"**{self.related_count}** of them in **{self.family_count}** families.",
+            f"**{self.near_limit_count}** families are near the limit of {self.max_family_members} members.",
+            f"**Family sizes:** {histogram(self.family_sizes)}",
+            f"**Generations:** {histogram(self.generation_counts)}",
+            f"**Children:** {histogram(self.child_counts)}",
+            f"**Partners:** {histogram(self.partner_counts)}",
+        ]
+        if self.largest_families:
+            lines.append("**Largest families:**")
+            lines.extend(
+                f"{i}. {size} members, {generations} generations (includes {user_id})"
+                for i, (user_id, size, generations) in enumerate(self.largest_families, start=1)
+            )
+        if self.largest_partner_groups:
+            lines.append("**Largest groups of partners:**")
+            lines.extend(
+                f"{i}. {size} members (includes {user_id})"
+                for i, (user_id, size) in enumerate(self.largest_partner_groups, start=1)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+
+__all__ = (
+    'FamilyComponentIndex',
+)
+
+
+class FamilyComponentIndex:
+    """
+    An index of which family (connected component) each member belongs to.
+
+    Members are identified by their dense index in a
+    :class:`FamilyStore`, and each one has a component label stored
+    in an int32 array. Components are merged smaller-into-larger,
+    union-find style, so that looking up the component of a member (and
+    its size) is an array lookup rather than a walk through the whole
+    family. Members with a label of 0 aren't linked to anyone, and are
+    treated as a family of one.
+
+    Removing an edge can split a component, so when that happens the index
+    searches outwards from both ends of the removed edge at once (through
+    members of that component only), and relabels whichever side runs out
+    first.
+
+    Each component also has an epoch, which is bumped by :meth:`touch`
+    whenever anyone in it has their relations changed. Labels are never
+    reused, so a (label, epoch) pair is enough to tell whether anything
+    worked out from a component is still up to date.
+
+    Parameters
+    ----------
+    neighbours : Callable[[int], Iterable[int]]
+        A function that returns the indexes of every member directly linked
+        to the given index (parent, children, and partners).
+    """
+
+    __slots__ = (
+        '_neighbours',
+        '_labels',
+        '_sizes',
+        '_epochs',
+        '_next_id',
+    )
+
+    def __init__(
+            self,
+            neighbours: Callable[[int], Iterable[int]]):
+        self._neighbours = neighbours
+        self._labels: array = array('i')
+        self._sizes: Dict[int, int] = {}
+        self._epochs: Dict[int, int] = {}
+        self._next_id: int = 1
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes used by the label array.
+        """
+
+        return self._labels.itemsize * len(self._labels)
+
+    def clear(self) -> None:
+        """
+        Remove every component from the index.
+        """
+
+        self._labels = array('i')
+        self._sizes.clear()
+        self._epochs.clear()
+
+    def _label(self, node: int) -> int:
+        labels = self._labels
+        if node < len(labels):
+            return labels[node]
+        return 0
+
+    def _set_label(self, node: int, label: int) -> None:
+        labels = self._labels
+        if node >= len(labels):
+            labels.extend([0] * (node + 1 - len(labels)))
+        labels[node] = label
+
+    def _new_label(self) -> int:
+        label = self._next_id
+        self._next_id += 1
+        return label
+
+    def component_id(self, node: Optional[int]) -> Optional[int]:
+        """
+        Get the ID of the component that the given member is in.
+
+        Parameters
+        ----------
+        node : Optional[int]
+            The index of the member.
+
+        Returns
+        -------
+        Optional[int]
+            The component ID, or ``None`` if the member isn't linked to
+            anyone.
+        """
+
+        if node is None:
+            return None
+        return self._label(node) or None
+
+    def epoch(self, label: int) -> int:
+        """
+        Get how many times the given component has been changed.
+        """
+
+        return self._epochs.get(label, 0)
+
+    def touch(self, node: int) -> None:
+        """
+        Bump the epoch of the component that the given member is in. This
+        should be called whenever their relations change, before the
+        component is linked or unlinked.
+        """
+
+        label = self._label(node)
+        if label:
+            self._epochs[label] = self._epochs.get(label, 0) + 1
+
+    def component_size(self, node: Optional[int]) -> int:
+        """
+        Get the number of members in the same component as the given
+        member, including themselves.
+        """
+
+        if node is None:
+            return 1
+        label = self._label(node)
+        if label == 0:
+            return 1
+        return self._sizes[label]
+
+    def component_members(self, node: int) -> List[int]:
+        """
+        Get the indexes of every member in the same component as the given
+        member. This walks the component.
+        """
+
+        label = self._label(node)
+        if label == 0:
+            return [node]
+        return self._collect(node, label)
+
+    def same_component(self, a: Optional[int], b: Optional[int]) -> bool:
+        """
+        Whether or not the two given members are in the same family.
+        """
+
+        if a is None or b is None:
+            return False
+        if a == b:
+            return True
+        label = self._label(a)
+        return label != 0 and label == self._label(b)
+
+    def would_exceed(self, a: Optional[int], b: Optional[int], limit: int) -> bool:
+        """
+        Whether joining the families of the two given members would reach
+        the given member limit. Members who are already in the same family
+        are only counted once.
+
+        Parameters
+        ----------
+        a : Optional[int]
+            The index of the first member.
+        b : Optional[int]
+            The index of the second member.
+        limit : int
+            The maximum number of family members.
+
+        Returns
+        -------
+        bool
+            Whether the joined family would be at or over the limit.
+        """
+
+        if self.same_component(a, b):
+            return self.component_size(a) >= limit
+        return self.component_size(a) + self.component_size(b) >= limit
+
+    def _collect(self, node: int, label: int) -> List[int]:
+        """
+        Gets every member reachable from the given one through members with
+        the given label.
+        """
+
+        neighbours = self._neighbours
+        seen = {node}
+        output = [node]
+        for current in output:
+            for i in neighbours(current):
+                if i not in seen and self._label(i) == label:
+                    seen.add(i)
+                    output.append(i)
+        return output
+
+    def link(self, a: int, b: int) -> None:
+        """
+        Record that there is now an edge between the two given members,
+        merging their components if they were separate.
+        """
+
+        if a == b:
+            return
+        a_label = self._label(a)
+        b_label = self._label(b)
+
+        # Neither are in a component yet
+        if a_label == 0 and b_label == 0:
+            label = self._new_label()
+            self._set_label(a, label)
+            self._set_label(b, label)
+            self._sizes[label] = 2
+            return
+
+        # One of them is in a component
+        if b_label == 0:
+            self._set_label(b, a_label)
+            self._sizes[a_label] += 1
+            return
+        if a_label == 0:
+            self._set_label(a, b_label)
+            self._sizes[b_label] += 1
+            return
+
+        # They're in separate components - relabel the smaller one
+        if a_label == b_label:
+            return
+        if self._sizes[a_label] < self._sizes[b_label]:
+            a, a_label, b, b_label = b, b_label, a, a_label
+        moved = self._collect(b, b_label)
+        for i in moved:
+            self._labels[i] = a_label
+        self._sizes[a_label] += self._sizes.pop(b_label)
+        self._epochs.pop(b_label, None)
+
+    def unlink(self, a: int, b: int) -> None:
+        """
+        Record that an edge between the two given members has been removed,
+        splitting their component if that was the last thing joining them.
+        """
+
+        self.unlink_all(a, (b,))
+
+    def unlink_all(self, node: int, others: Iterable[int]) -> None:
+        """
+        Record that the edges between a member and each of the given others
+        have been removed, splitting their component into as many pieces
+        as that leaves.
+
+        Only members with the component's label are walked through, so any
+        edges that have been added to the store but not linked yet are
+        ignored until they are.
+        """
+
+        # Keep checking pairs of these that still share a label until none
+        # of them do. Anyone still connected to another one is dropped,
+        # since they'll always be moved along with them, and the labels
+        # are looked at again after every split.
+        pending = [node, *(i for i in others if i != node)]
+        while True:
+            first_with_label: Dict[int, int] = {}
+            for position, i in enumerate(pending):
+                label = self._label(i)
+                if label == 0:
+                    continue
+                first = first_with_label.get(label)
+                if first is None:
+                    first_with_label[label] = i
+                    continue
+                if not self._separate(first, i, label):
+                    del pending[position]
+                break
+            else:
+                return
+
+    def _separate(self, a: int, b: int, label: int) -> bool:
+        """
+        See if two members with the same label are still connected, and
+        relabel whichever side runs out first if they're not. Returns
+        whether they were split.
+        """
+
+        # Search outwards from both sides a step at a time until either they
+        # meet or one side runs out of people
+        neighbours = self._neighbours
+        labels = self._labels
+        searches = (
+            ({a}, deque([a]), [a]),
+            ({b}, deque([b]), [b]),
+        )
+        while True:
+            for index, (seen, queue, found) in enumerate(searches):
+                other_seen = searches[1 - index][0]
+                if not queue:
+
+                    # This side ran out, so it's been split off
+                    if len(found) == 1:
+                        labels[found[0]] = 0
+                    else:
+                        new_label = self._new_label()
+                        for i in found:
+                            labels[i] = new_label
+                        self._sizes[new_label] = len(found)
+                    self._sizes[label] -= len(found)
+
+                    # See if the other side is on its own now
+                    if self._sizes[label] == 1:
+                        labels[searches[1 - index][2][0]] = 0
+                        del self._sizes[label]
+                        self._epochs.pop(label, None)
+                    return True
+                current = queue.popleft()
+                for i in neighbours(current):
+                    if i in other_seen:
+                        return False  # Still connected
+                    if i not in seen and self._label(i) == label:
+                        seen.add(i)
+                        queue.append(i)
+                        found.append(i)
+
+    def rebuild_all(self, node_count: int) -> None:
+        """
+        Label every member from scratch.
+
+        Parameters
+        ----------
+        node_count : int
+            The number of members in the store.
+        """
+
+        self.clear()
+        self._labels = array('i', [0]) * node_count
+        labels = self._labels
+        neighbours = self._neighbours
+        for start in range(node_count):
+            if labels[start]:
+                continue
+            first = neighbours(start)
+            if not first:
+                continue
+            label = self._new_label()
+            labels[start] = label
+            found = [start]
+            for current in found:
+                for i in (first if current == start else neighbours(current)):
+                    if not labels[i]:
+                        labels[i] = label
+                        found.append(i)
+            self._sizes[label] = len(found)
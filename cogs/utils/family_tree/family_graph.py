@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import itertools
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+from cogs.utils.family_tree.ancestor_index import AncestorIndex
+from cogs.utils.family_tree.compact_family_store import CompactFamilyStore
+from cogs.utils.family_tree.family_component_index import FamilyComponentIndex
+from cogs.utils.family_tree.family_store import FamilyStore
+from cogs.utils.family_tree.family_timestamps import FamilyTimestamps
+from cogs.utils.family_tree.generation_index import GenerationIndex
+
+
+__all__ = (
+    'FamilyGraph',
+)
+
+
+class FamilyGraph:
+    """
+    All of the family data for a single guild - the relation store and
+    the indexes built over it.
+
+    Each guild's graph is held separately in :attr:`graphs`, so a single
+    guild can be dropped, reloaded, or swapped out without touching any
+    other guild. Swapping is a single dict assignment, so anything that
+    looks a graph up after the swap sees the new one in full.
+
+    Parameters
+    ----------
+    guild_id : int
+        The ID of the guild that this graph is for (0 for the global tree).
+    store : Optional[FamilyStore], optional
+        The relation store to use. An empty :attr:`store_class` is made if
+        not given.
+    """
+
+    graphs: Dict[int, FamilyGraph] = {}
+
+    # The store backend that new graphs are built with
+    store_class: Type[FamilyStore] = CompactFamilyStore
+    _serials = itertools.count(1)
+
+    # The minimum number of users with no relations left that a graph has
+    # to build up before it's worth rebuilding it without them
+    SWEEP_THRESHOLD = 1_024
+
+    __slots__ = (
+        'guild_id',
+        'serial',
+        'store',
+        'dirty',
+        'timestamps',
+        '_visited',
+    )
+
+    def __init__(
+            self,
+            guild_id: int,
+            store: Optional[FamilyStore] = None):
+        self.guild_id: int = guild_id
+        self.serial: int = next(self._serials)  # Unique to this graph, so caches can tell when it's been swapped
+        self.store: FamilyStore = store if store is not None else self.store_class()
+        self.dirty: Set[int] = set()  # Users changed here who haven't been sent to the other clusters yet
+        self.timestamps: FamilyTimestamps = FamilyTimestamps()
+        self._visited: bytearray = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(guild_id={self.guild_id!r}, members={len(self)})"
+
+    @property
+    def components(self) -> FamilyComponentIndex:
+        """
+        The connected component index for this guild.
+        """
+
+        return self.store.components
+
+    @property
+    def ancestors(self) -> AncestorIndex:
+        """
+        The index of parent lines for this guild.
+        """
+
+        return self.store.ancestors
+
+    @property
+    def generations(self) -> GenerationIndex:
+        """
+        The cache of roots and generations for this guild's families.
+        """
+
+        return self.store.generations
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate number of bytes used by this graph's arrays.
+        """
+
+        return self.store.nbytes
+
+    def visited_buffer(self) -> bytearray:
+        """
+        Get a zeroed buffer with a byte for every member of the graph, for
+        marking people as visited during a traversal. The same buffer is
+        reused between traversals, so whatever uses it has to zero it again
+        before giving control back to the event loop.
+        """
+
+        visited = self._visited
+        if len(visited) < len(self.store):
+            visited.extend(bytes(len(self.store) - len(visited)))
+        return visited
+
+    @classmethod
+    def from_edges(
+            cls,
+            guild_id: int,
+            parent_edges: Iterable[Tuple[int, int]],
+            partner_edges: Iterable[Tuple[int, int]]) -> FamilyGraph:
+        """
+        Build a graph for a guild in one go from a list of edges.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild that the graph is for.
+        parent_edges : Iterable[Tuple[int, int]]
+            (child ID, parent ID) pairs.
+        partner_edges : Iterable[Tuple[int, int]]
+            (user ID, partner ID) pairs.
+
+        Returns
+        -------
+        FamilyGraph
+            The new graph. This isn't added to :attr:`graphs`.
+        """
+
+        return cls(guild_id, cls.store_class.from_edges(parent_edges, partner_edges))
+
+    def without_empty_members(self) -> FamilyGraph:
+        """
+        Build a copy of this graph with everyone who has no relations left
+        taken out. This isn't added to :attr:`graphs`.
+
+        The copy is built from :meth:`FamilyStore.to_edges`, so it only
+        matches this graph if every relation is stored on both sides (see
+        :attr:`FamilyStore.has_one_way`).
+        """
+
+        parent_edges, partner_edges = self.store.to_edges()
+        return self.from_edges(
+            self.guild_id,
+            zip(parent_edges[0::2], parent_edges[1::2]),
+            zip(partner_edges[0::2], partner_edges[1::2]),
+        )
+
+    def take_dirty(self) -> List[int]:
+        """
+        Get the IDs of everyone who's been changed since this was last
+        called, in order, and start tracking again from nothing.
+        """
+
+        dirty, self.dirty = self.dirty, set()
+        return sorted(dirty)
+
+    def mark_clean(self, *user_ids: int) -> None:
+        """
+        Stop tracking the given users as changed, for when their changes
+        won't be published (eg because a recache is sending them instead).
+        """
+
+        self.dirty.difference_update(user_ids)
+
+    @classmethod
+    def sweep(cls) -> int:
+        """
+        Rebuild any graph that's built up enough users with no relations
+        left (eg after divorces and disowns), so that they're no longer
+        held. Graphs mapped from a shared image are left alone, so that
+        they stay shared, as are graphs with any relation that's only
+        stored on one side, since rebuilding would change it.
+
+        Returns
+        -------
+        int
+            The number of users that were removed.
+        """
+
+        reclaimed = 0
+        for graph in list(cls.graphs.values()):
+            store = graph.store
+            if store.is_mapped or store.has_one_way:
+                continue
+            empty = store.empty_count()
+            if empty < max(cls.SWEEP_THRESHOLD, len(store) // 8):
+                continue
+            new_graph = graph.without_empty_members()
+            new_graph.dirty |= graph.dirty
+            new_graph.timestamps = graph.timestamps
+            cls.swap(new_graph)
+            reclaimed += len(graph) - len(new_graph)
+        return reclaimed
+
+    @classmethod
+    def get(cls, guild_id: int = 0) -> FamilyGraph:
+        """
+        Get the graph for a given guild, creating an empty one if it
+        doesn't exist yet.
+        """
+
+        graph = cls.graphs.get(guild_id)
+        if graph is None:
+            graph = cls.graphs[guild_id] = cls(guild_id)
+        return graph
+
+    @classmethod
+    def swap(cls, graph: FamilyGraph) -> Optional[FamilyGraph]:
+        """
+        Put a graph in place for its guild, replacing whatever was there.
+
+        Parameters
+        ----------
+        graph : FamilyGraph
+            The graph to put in place.
+
+        Returns
+        -------
+        Optional[FamilyGraph]
+            The graph that was replaced, if there was one.
+        """
+
+        old = cls.graphs.get(graph.guild_id)
+        cls.graphs[graph.guild_id] = graph
+        return old
+
+    @classmethod
+    def drop(cls, guild_id: int) -> Optional[FamilyGraph]:
+        """
+        Remove the graph for a given guild.
+
+        Returns
+        -------
+        Optional[FamilyGraph]
+            The graph that was removed, if there was one.
+        """
+
+        return cls.graphs.pop(guild_id, None)
+
+    @classmethod
+    def replace_all(cls, graphs: Iterable[FamilyGraph]) -> None:
+        """
+        Replace every cached graph with the ones given.
+        """
+
+        cls.graphs = {i.guild_id: i for i in graphs}
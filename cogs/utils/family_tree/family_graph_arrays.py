@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import (
+    Dict,
+    Iterable,
+)
+
+import numpy as np
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+
+
+__all__ = (
+    'export_graph_arrays',
+    'merge_graph_arrays',
+    'connected_labels',
+    'line_depths',
+)
+
+
+def export_graph_arrays(graph: FamilyGraph) -> Dict[str, np.ndarray]:
+    """
+    Copy a graph out into NumPy arrays, so that it can be worked on
+    somewhere else (eg in another thread) while the graph keeps changing.
+
+    Parameters
+    ----------
+    graph : FamilyGraph
+        The graph to copy.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        The user IDs (``snowflakes``) and parent indexes (``parents``) of
+        every user, and the (source, target) indexes of every child and
+        partner row entry (``child_sources``, ``child_targets``,
+        ``partner_sources``, ``partner_targets``).
+    """
+
+    store = graph.store
+    node_count = len(store)
+    arrays = {
+        'snowflakes': np.fromiter(store, dtype=np.int64, count=node_count),
+        'parents': np.fromiter(map(store.parent_index, range(node_count)), dtype=np.int64, count=node_count),
+    }
+    for name, children in (('child', True,), ('partner', False,)):
+        offsets, targets = store.to_rows(children)
+        offsets_array = np.frombuffer(offsets, dtype=np.int32)
+        arrays[f'{name}_sources'] = np.repeat(np.arange(node_count, dtype=np.int64), np.diff(offsets_array))
+        arrays[f'{name}_targets'] = np.frombuffer(targets, dtype=np.int32).astype(np.int64)
+    return arrays
+
+
+def merge_graph_arrays(exports: Iterable[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Merge the exports of several graphs into one, as if they were a single
+    graph with no relations between them.
+    """
+
+    parts: Dict[str, list] = {
+        'snowflakes': [],
+        'parents': [],
+        'child_sources': [],
+        'child_targets': [],
+        'partner_sources': [],
+        'partner_targets': [],
+    }
+    shift = 0
+    for arrays in exports:
+        for name, found in arrays.items():
+            if name == 'snowflakes':
+                parts[name].append(found)
+            elif name == 'parents':
+                parts[name].append(np.where(found >= 0, found + shift, -1))
+            else:
+                parts[name].append(found + shift)
+        shift += len(arrays['snowflakes'])
+    return {
+        name: np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        for name, found in parts.items()
+    }
+
+
+def connected_labels(
+        node_count: int,
+        sources: np.ndarray,
+        targets: np.ndarray) -> np.ndarray:
+    """
+    Label everyone by the connected component that the given edges put them
+    in. Each component is labelled with its lowest index, so everyone with
+    no edges is labelled as themselves.
+
+    This hooks the larger label of each edge onto the smaller one and then
+    flattens the labels, over and over until no edge joins two labels,
+    which takes a handful of whole-array passes.
+    """
+
+    labels = np.arange(node_count, dtype=np.int64)
+    while True:
+        a, b = labels[sources], labels[targets]
+        joining = a != b
+        if not joining.any():
+            return labels
+        low, high = np.minimum(a, b)[joining], np.maximum(a, b)[joining]
+        np.minimum.at(labels, high, low)
+        while True:
+            flattened = labels[labels]
+            if np.array_equal(flattened, labels):
+                break
+            labels = flattened
+
+
+def line_depths(parents: np.ndarray) -> np.ndarray:
+    """
+    Work out how many generations below the top of their line everyone is,
+    from their parent indexes (-1 for no parent). Anyone stuck in a loop of
+    parents is given -1.
+    """
+
+    # Jump 2^k generations up at a time, adding up how far we've gone
+    node_count = len(parents)
+    jumps = parents.copy()
+    depths = (jumps >= 0).astype(np.int64)
+    for _ in range(max(node_count, 1).bit_length() + 1):
+        valid = jumps >= 0
+        if not valid.any():
+            break
+        depths[valid] += depths[jumps[valid]]
+        jumps[valid] = jumps[jumps[valid]]
+    depths[jumps >= 0] = -1
+    return depths
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from datetime import datetime as dt, timedelta
+import mmap
+import struct
+import sys
+import zlib
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+)
+
+from cogs.utils.family_tree.compact_family_store import CompactFamilyStore
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_snapshot import EPOCH, FamilyGraphSnapshot, replace_file
+
+
+__all__ = (
+    'FamilyGraphImage',
+)
+
+
+class FamilyGraphImage:
+    """
+    A read-only image of every cached family graph, laid out exactly as
+    the compacted arrays of a :class:`CompactFamilyStore`, so that it can
+    be memory mapped and used in place.
+
+    Every cluster on a host can map the same image file. The file is
+    mapped copy-on-write, so the pages of it are shared between all of
+    them until one writes to a page - anything changed after the image
+    was made goes into that store's overflow area instead, so in practice
+    only the few pages holding new users' IDs and changed parents are ever
+    copied.
+
+    The layout is a header - the magic bytes ``MBFI``, the format version
+    (uint16), some reserved flags (uint16), when the image was made in
+    microseconds since the Unix epoch (int64), the number of guilds
+    (uint32), and a CRC32 of everything after the header (uint32) - then a
+    guild table, then each guild's arrays in the order of
+    :attr:`CompactFamilyStore.COLUMNS`, each padded to 8 bytes. Every
+    number is native little-endian.
+
+    Parameters
+    ----------
+    created_at : datetime.datetime
+        When the image was made, as a naive UTC time.
+    guilds : Dict[int, Tuple[Dict[str, memoryview], Tuple[memoryview, memoryview]]]
+        The arrays for each guild, and the writable user and parent arrays
+        with their spare room.
+    """
+
+    MAGIC = b"MBFI"
+    VERSION = 1
+
+    # How many spare slots the user and parent arrays get for new users -
+    # the larger of these, or an eighth of the users already there
+    SPARE_USERS = 1_024
+
+    _HEADER = struct.Struct("<4sHHqII")
+    _GUILD = struct.Struct("<qIIII")
+
+    __slots__ = (
+        'created_at',
+        'guilds',
+    )
+
+    def __init__(
+            self,
+            created_at: dt,
+            guilds: Dict[int, Tuple[Dict[str, memoryview], Tuple[memoryview, memoryview]]]):
+        self.created_at: dt = created_at
+        self.guilds = guilds
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(created_at={self.created_at!r}, guilds={len(self.guilds)})"
+
+    @staticmethod
+    def _column_lengths(
+            count: int,
+            capacity: int,
+            child_count: int,
+            partner_count: int) -> Dict[str, int]:
+        return {
+            'snowflakes': capacity,
+            'sorted_snowflakes': count,
+            'sorted_indexes': count,
+            'parents': capacity,
+            'child_offsets': count + 1,
+            'child_targets': child_count,
+            'partner_offsets': count + 1,
+            'partner_targets': partner_count,
+        }
+
+    @classmethod
+    def write(cls, snapshot: FamilyGraphSnapshot, path: str) -> None:
+        """
+        Build an image from a snapshot and write it to a file. The file is
+        written next to the target and then moved into place, so anything
+        that's already mapped the old image keeps it.
+        """
+
+        if sys.byteorder != "little":
+            raise ValueError("Family graph images can only be made on little-endian machines")
+        table = bytearray()
+        body = bytearray()
+        for guild_id, (parent_edges, partner_edges) in snapshot.guilds.items():
+            store = CompactFamilyStore.from_edges(
+                zip(parent_edges[0::2], parent_edges[1::2]),
+                zip(partner_edges[0::2], partner_edges[1::2]),
+            )
+            columns = store.to_columns()
+            count = len(store)
+            capacity = count + max(cls.SPARE_USERS, count // 8)
+            lengths = cls._column_lengths(
+                count,
+                capacity,
+                len(columns['child_targets']),
+                len(columns['partner_targets']),
+            )
+            table += cls._GUILD.pack(guild_id, count, capacity, lengths['child_targets'], lengths['partner_targets'])
+            for name, typecode in CompactFamilyStore.COLUMNS:
+                data = bytes(columns[name])  # type: ignore
+                spare = lengths[name] * struct.calcsize(typecode) - len(data)
+                if name == 'parents':
+                    data += b"\xff" * spare  # -1 for no parent
+                else:
+                    data += bytes(spare)
+                body += data + bytes(-len(data) % 8)
+        payload = table + bytes(-len(table) % 8) + body
+        created_at = (snapshot.created_at - EPOCH) // timedelta(microseconds=1)
+        header = cls._HEADER.pack(
+            cls.MAGIC,
+            cls.VERSION,
+            0,
+            created_at,
+            len(snapshot.guilds),
+            zlib.crc32(payload),
+        )
+
+        replace_file(path, header, payload)
+
+    @classmethod
+    def open(cls, path: str) -> FamilyGraphImage:
+        """
+        Map an image file into memory.
+
+        Raises
+        ------
+        OSError
+            If the file can't be read.
+        ValueError
+            If the file isn't a valid image, or can't be used on this
+            machine.
+        """
+
+        if sys.byteorder != "little":
+            raise ValueError("Family graph images can only be used on little-endian machines")
+        with open(path, "rb") as a:
+            mapped = mmap.mmap(a.fileno(), 0, access=mmap.ACCESS_COPY)
+        view = memoryview(mapped)  # This keeps the map open for as long as anything uses it
+        if len(view) < cls._HEADER.size:
+            raise ValueError("Image is too short to have a header")
+        magic, version, _, created_at, guild_count, checksum = cls._HEADER.unpack_from(view)
+        if magic != cls.MAGIC:
+            raise ValueError("File is not a family graph image")
+        if version != cls.VERSION:
+            raise ValueError(f"Can't read version {version} images")
+        payload = view[cls._HEADER.size:]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError("Image checksum doesn't match")
+
+        # Read the guild table
+        table_size = cls._GUILD.size * guild_count
+        if len(payload) < table_size:
+            raise ValueError("Image guild table is truncated")
+        entries = list(cls._GUILD.iter_unpack(payload[:table_size]))
+
+        # And point at each guild's arrays
+        guilds: Dict[int, Tuple[Dict[str, memoryview], Tuple[memoryview, memoryview]]] = {}
+        position = table_size + (-table_size % 8)
+        for guild_id, count, capacity, child_count, partner_count in entries:
+            lengths = cls._column_lengths(count, capacity, child_count, partner_count)
+            columns: Dict[str, memoryview] = {}
+            spare: List[memoryview] = []
+            for name, typecode in CompactFamilyStore.COLUMNS:
+                end = position + lengths[name] * struct.calcsize(typecode)
+                if end > len(payload):
+                    raise ValueError("Image arrays are truncated")
+                column = payload[position:end].cast(typecode)
+                if name in ('snowflakes', 'parents'):
+                    spare.append(column)
+                    column = column[:count]
+                else:
+                    column = column.toreadonly()
+                columns[name] = column
+                position = end + (-end % 8)
+            guilds[guild_id] = (columns, (spare[0], spare[1],),)
+        return cls(EPOCH + timedelta(microseconds=created_at), guilds)
+
+    def to_graphs(self) -> Iterator[FamilyGraph]:
+        """
+        Build a graph for each guild in the image, around the mapped
+        arrays. None of them are added to :attr:`FamilyGraph.graphs`.
+        """
+
+        for guild_id, (columns, spare) in self.guilds.items():
+            yield FamilyGraph(guild_id, CompactFamilyStore.from_columns(columns, spare))
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from array import array
+from datetime import datetime as dt, timedelta
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+
+
+__all__ = (
+    'FamilyGraphSnapshot',
+)
+
+
+EPOCH = dt(1970, 1, 1)
+
+
+def replace_file(path: str, *chunks: bytes) -> None:
+    """
+    Write a file next to the given path and then move it into place, so a
+    reader never sees half of one. Each call writes to its own temporary
+    file, so several clusters can write the same path at once - the last
+    one to finish wins.
+    """
+
+    temporary = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp",
+        delete=False,
+    )
+    try:
+        with temporary as a:
+            for chunk in chunks:
+                a.write(chunk)
+            a.flush()
+            os.fsync(a.fileno())
+        os.replace(temporary.name, path)
+    except BaseException:
+        try:
+            os.unlink(temporary.name)
+        except OSError:
+            pass
+        raise
+
+
+class FamilyGraphSnapshot:
+    """
+    A point-in-time copy of the relations of every cached family graph,
+    which can be saved to disk and loaded back much faster than the
+    database can be read and replayed.
+
+    Snapshots are written in a small versioned binary format, with every
+    number little-endian:
+
+    * A header - the magic bytes ``MBFG``, the format version (uint16),
+      some reserved flags (uint16), when the snapshot was taken in
+      microseconds since the Unix epoch (int64), the number of guilds
+      (uint32), and a CRC32 of everything after the header (uint32).
+    * A guild table - the guild ID (int64), the number of parent edges
+      (uint64), and the number of partner edges (uint64) for each guild.
+    * The edges themselves - for each guild in table order, the (child ID,
+      parent ID) pairs and then the (user ID, partner ID) pairs, as int64s.
+
+    Only relations are stored, so a snapshot can't tell you about anything
+    that's been *removed* since it was taken; whoever loads one needs to
+    check it against the database for that.
+
+    Parameters
+    ----------
+    created_at : datetime.datetime
+        When the snapshot was taken, as a naive UTC time (to match the
+        timestamps in the database).
+    guilds : Dict[int, Tuple[array, array]]
+        The parent edges and partner edges for each guild, as flat int64
+        arrays of pairs.
+    """
+
+    MAGIC = b"MBFG"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHqII")
+    _GUILD = struct.Struct("<qQQ")
+
+    __slots__ = (
+        'created_at',
+        'guilds',
+    )
+
+    def __init__(
+            self,
+            created_at: dt,
+            guilds: Dict[int, Tuple[array, array]]):
+        self.created_at: dt = created_at
+        self.guilds: Dict[int, Tuple[array, array]] = guilds
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(created_at={self.created_at!r}, "
+            f"guilds={len(self.guilds)}, edges={self.edge_count})"
+        )
+
+    @property
+    def edge_count(self) -> int:
+        """
+        The total number of edges in the snapshot.
+        """
+
+        return sum((len(a) + len(b)) // 2 for a, b in self.guilds.values())
+
+    @classmethod
+    def from_graphs(
+            cls,
+            graphs: Iterable[FamilyGraph],
+            created_at: Optional[dt] = None) -> FamilyGraphSnapshot:
+        """
+        Take a snapshot of the given graphs. Empty graphs are left out.
+
+        Parameters
+        ----------
+        graphs : Iterable[FamilyGraph]
+            The graphs to take a snapshot of.
+        created_at : Optional[datetime.datetime], optional
+            When the snapshot was taken. Defaults to now.
+        """
+
+        if created_at is None:
+            created_at = dt.utcnow()
+        guilds: Dict[int, Tuple[array, array]] = {}
+        for graph in graphs:
+            parent_edges, partner_edges = graph.store.to_edges()
+            if parent_edges or partner_edges:
+                guilds[graph.guild_id] = (parent_edges, partner_edges,)
+        return cls(created_at, guilds)
+
+    def to_graphs(self) -> Iterator[FamilyGraph]:
+        """
+        Build a new graph for each guild in the snapshot. None of them are
+        added to :attr:`FamilyGraph.graphs`.
+        """
+
+        for guild_id, (parent_edges, partner_edges) in self.guilds.items():
+            yield FamilyGraph.from_edges(
+                guild_id,
+                zip(parent_edges[0::2], parent_edges[1::2]),
+                zip(partner_edges[0::2], partner_edges[1::2]),
+            )
+
+    # Encoding
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the snapshot in the binary format.
+        """
+
+        table = bytearray()
+        body = bytearray()
+        for guild_id, (parent_edges, partner_edges) in self.guilds.items():
+            table += self._GUILD.pack(guild_id, len(parent_edges) // 2, len(partner_edges) // 2)
+            for edges in (parent_edges, partner_edges):
+                if sys.byteorder == "big":
+                    edges = array('q', edges)
+                    edges.byteswap()
+                body += edges.tobytes()
+        payload = table + body
+        created_at = (self.created_at - EPOCH) // timedelta(microseconds=1)
+        header = self._HEADER.pack(
+            self.MAGIC,
+            self.VERSION,
+            0,
+            created_at,
+            len(self.guilds),
+            zlib.crc32(payload),
+        )
+        return header + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> FamilyGraphSnapshot:
+        """
+        Decode a snapshot from the binary format.
+
+        Raises
+        ------
+        ValueError
+            If the data isn't a snapshot, is a version we can't read, or
+            is damaged.
+        """
+
+        view = memoryview(data)
+        if len(view) < cls._HEADER.size:
+            raise ValueError("Snapshot is too short to have a header")
+        magic, version, _, created_at, guild_count, checksum = cls._HEADER.unpack_from(view)
+        if magic != cls.MAGIC:
+            raise ValueError("Data is not a family graph snapshot")
+        if version != cls.VERSION:
+            raise ValueError(f"Can't read version {version} snapshots")
+        payload = view[cls._HEADER.size:]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError("Snapshot checksum doesn't match")
+
+        # Read the guild table
+        table_size = cls._GUILD.size * guild_count
+        if len(payload) < table_size:
+            raise ValueError("Snapshot guild table is truncated")
+        counts = list(cls._GUILD.iter_unpack(payload[:table_size]))
+
+        # And the edges
+        guilds: Dict[int, Tuple[array, array]] = {}
+        position = table_size
+        for guild_id, parent_count, partner_count in counts:
+            edges = []
+            for count in (parent_count, partner_count):
+                end = position + count * 16
+                if end > len(payload):
+                    raise ValueError("Snapshot edges are truncated")
+                edge_array = array('q')
+                edge_array.frombytes(payload[position:end])
+                if sys.byteorder == "big":
+                    edge_array.byteswap()
+                edges.append(edge_array)
+                position = end
+            guilds[guild_id] = (edges[0], edges[1],)
+        if position != len(payload):
+            raise ValueError("Snapshot has trailing data")
+        return cls(EPOCH + timedelta(microseconds=created_at), guilds)
+
+    # Files
+
+    def write(self, path: str) -> None:
+        """
+        Write the snapshot to a file. The file is written next to the
+        target and then moved into place, so a reader never sees half of
+        one.
+        """
+
+        replace_file(path, self.to_bytes())
+
+    @classmethod
+    def read(cls, path: str) -> FamilyGraphSnapshot:
+        """
+        Read a snapshot from a file.
+
+        Raises
+        ------
+        OSError
+            If the file can't be read.
+        ValueError
+            If the file isn't a valid snapshot.
+        """
+
+        with open(path, "rb") as a:
+            return cls.from_bytes(a.read())
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+import numpy as np
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_arrays import export_graph_arrays
+
+
+__all__ = (
+    'FamilyIntegrityReport',
+)
+
+
+class FamilyIntegrityReport:
+    """
+    Everything that's inconsistent in a guild's cached family graph.
+
+    The graph is exported to NumPy arrays and checked with whole-array
+    operations, so that even the global tree can be scanned in a few
+    seconds. Every issue is given as a tuple of user IDs:
+
+    * ``self_parent`` - (user,) who is their own parent.
+    * ``self_child`` - (user,) who is their own child.
+    * ``self_partner`` - (user,) who is their own partner.
+    * ``duplicate_child`` - (parent, child) listed more than once.
+    * ``duplicate_partner`` - (user, partner) listed more than once.
+    * ``child_without_parent`` - (parent, child) where the child is listed
+      but doesn't have that parent.
+    * ``parent_without_child`` - (parent, child) where the child has that
+      parent but isn't listed as their child.
+    * ``one_way_partner`` - (user, partner) where the partner doesn't have
+      the user listed back.
+    * ``parent_loop`` - (user, ...) everyone in a loop of parents, starting
+      from the lowest ID.
+
+    Parameters
+    ----------
+    guild_id : int
+        The ID of the guild that was scanned.
+    member_count : int
+        The number of users in the graph.
+    issues : Dict[str, List[Tuple[int, ...]]]
+        The issues that were found, keyed by kind.
+    """
+
+    KINDS: Tuple[str, ...] = (
+        'self_parent',
+        'self_child',
+        'self_partner',
+        'duplicate_child',
+        'duplicate_partner',
+        'child_without_parent',
+        'parent_without_child',
+        'one_way_partner',
+        'parent_loop',
+    )
+
+    __slots__ = (
+        'guild_id',
+        'member_count',
+        'issues',
+    )
+
+    def __init__(
+            self,
+            guild_id: int,
+            member_count: int,
+            issues: Dict[str, List[Tuple[int, ...]]]):
+        self.guild_id: int = guild_id
+        self.member_count: int = member_count
+        self.issues: Dict[str, List[Tuple[int, ...]]] = issues
+
+    def __bool__(self) -> bool:
+        return any(self.issues.values())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(guild_id={self.guild_id!r}, issues={self.issue_count})"
+
+    @property
+    def issue_count(self) -> int:
+        """
+        The total number of issues found.
+        """
+
+        return sum(len(i) for i in self.issues.values())
+
+    @staticmethod
+    def _parent_loops(parents: np.ndarray) -> List[List[int]]:
+        """
+        Find every loop of parents, as lists of indexes.
+        """
+
+        # Jump 2^k generations up at a time - after enough jumps, anyone
+        # who hasn't reached the top of their line must be stuck in a loop
+        node_count = len(parents)
+        jumps = parents.copy()
+        for _ in range(max(node_count, 1).bit_length() + 1):
+            valid = jumps >= 0
+            jumps[valid] = jumps[jumps[valid]]
+        stuck = np.unique(jumps[jumps >= 0])
+
+        # Everyone we've ended up on is in a loop, so walk each loop once
+        seen = np.zeros(node_count, dtype=bool)
+        loops: List[List[int]] = []
+        for start in stuck.tolist():
+            if seen[start]:
+                continue
+            loop = [start]
+            seen[start] = True
+            current = int(parents[start])
+            while current != start:
+                loop.append(current)
+                seen[current] = True
+                current = int(parents[current])
+            loops.append(loop)
+        return loops
+
+    @classmethod
+    def scan(cls, graph: FamilyGraph) -> FamilyIntegrityReport:
+        """
+        Scan a graph for inconsistencies.
+        """
+
+        return cls.scan_arrays(graph.guild_id, export_graph_arrays(graph))
+
+    @classmethod
+    def scan_arrays(cls, guild_id: int, arrays: Dict[str, np.ndarray]) -> FamilyIntegrityReport:
+        """
+        Scan a graph that's been copied out with
+        :func:`export_graph_arrays` for inconsistencies. This only reads
+        the arrays it's given.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild that the arrays are from.
+        arrays : Dict[str, np.ndarray]
+            The arrays from :func:`export_graph_arrays`.
+
+        Returns
+        -------
+        FamilyIntegrityReport
+            The issues that were found.
+        """
+
+        snowflakes, parents = arrays['snowflakes'], arrays['parents']
+        child_sources, child_targets = arrays['child_sources'], arrays['child_targets']
+        partner_sources, partner_targets = arrays['partner_sources'], arrays['partner_targets']
+        node_count = len(snowflakes)
+        nodes = np.arange(node_count, dtype=np.int64)
+
+        def pairs(a: np.ndarray, b: np.ndarray) -> List[Tuple[int, ...]]:
+            return list(zip(snowflakes[a].tolist(), snowflakes[b].tolist()))
+
+        def singles(a: np.ndarray) -> List[Tuple[int, ...]]:
+            return [(i,) for i in snowflakes[a].tolist()]
+
+        def keys(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            return a * node_count + b
+
+        def contains(values: np.ndarray, pool: np.ndarray) -> np.ndarray:
+            # Sorting and searching beats np.isin for keys this spread out
+            pool = np.sort(pool)
+            found = np.searchsorted(pool, values)
+            found[found == len(pool)] = 0
+            return (pool[found] == values) if len(pool) else np.zeros(len(values), dtype=bool)
+
+        def duplicates(a: np.ndarray, b: np.ndarray) -> List[Tuple[int, ...]]:
+            ordered = np.sort(keys(a, b))
+            repeated = np.unique(ordered[1:][ordered[1:] == ordered[:-1]])
+            return pairs(repeated // max(node_count, 1), repeated % max(node_count, 1))
+
+        issues: Dict[str, List[Tuple[int, ...]]] = {}
+
+        # People related to themselves
+        issues['self_parent'] = singles(nodes[parents == nodes])
+        issues['self_child'] = singles(child_sources[child_sources == child_targets])
+        issues['self_partner'] = singles(partner_sources[partner_sources == partner_targets])
+
+        # People listed twice
+        issues['duplicate_child'] = duplicates(child_sources, child_targets)
+        issues['duplicate_partner'] = duplicates(partner_sources, partner_targets)
+
+        # Children and parents that don't agree - the parent column is taken
+        # as (parent, child) pairs so it can be compared with the rows
+        has_parent = (parents >= 0) & (parents != nodes)
+        parent_keys = keys(parents[has_parent], nodes[has_parent])
+        listed = child_sources != child_targets
+        child_keys = keys(child_sources[listed], child_targets[listed])
+        missing = ~contains(child_keys, parent_keys)
+        issues['child_without_parent'] = pairs(child_sources[listed][missing], child_targets[listed][missing])
+        missing = ~contains(parent_keys, child_keys)
+        issues['parent_without_child'] = pairs(parents[has_parent][missing], nodes[has_parent][missing])
+
+        # Partners that aren't listed both ways round
+        listed = partner_sources != partner_targets
+        partner_keys = keys(partner_sources[listed], partner_targets[listed])
+        reverse_keys = keys(partner_targets[listed], partner_sources[listed])
+        missing = ~contains(reverse_keys, partner_keys)
+        issues['one_way_partner'] = pairs(partner_sources[listed][missing], partner_targets[listed][missing])
+
+        # Loops of parents
+        loops = []
+        for loop in cls._parent_loops(np.where(has_parent, parents, -1)):
+            ids = snowflakes[loop].tolist()
+            lowest = ids.index(min(ids))
+            loops.append(tuple(ids[lowest:] + ids[:lowest]))
+        issues['parent_loop'] = sorted(loops)
+        return cls(guild_id, node_count, issues)
+
+    def repair_plan(self) -> List[Tuple[str, int, int]]:
+        """
+        Work out which database rows need to be removed to fix the issues
+        that aren't just the cache being out of date. Everything else is
+        fixed by reloading the guild's graph from the database, since the
+        parents and marriages tables can't disagree with themselves.
+
+        Returns
+        -------
+        List[Tuple[str, int, int]]
+            ``("parents", child ID, parent ID)`` and ``("marriages", user
+            ID, partner ID)`` rows to delete.
+        """
+
+        plan: List[Tuple[str, int, int]] = []
+        for (user_id,) in self.issues['self_parent']:
+            plan.append(("parents", user_id, user_id,))
+        for (user_id,) in self.issues['self_partner']:
+            plan.append(("marriages", user_id, user_id,))
+
+        # Break each loop above its lowest ID
+        for loop in self.issues['parent_loop']:
+            plan.append(("parents", loop[0], loop[1],))
+        return plan
+
+    def to_text(self, examples: int = 5) -> str:
+        """
+        Summarise the report for sending to a moderator.
+
+        Parameters
+        ----------
+        examples : int, optional
+            How many examples of each kind of issue to give.
+        """
+
+        lines = [f"Scanned {self.member_count} users in guild {self.guild_id}."]
+        if not self:
+            lines.append("No issues found.")
+            return "\n".join(lines)
+        for kind in self.KINDS:
+            found = self.issues.get(kind)
+            if not found:
+                continue
+            shown = ", ".join(
+                "(" + " -> ".join(str(o) for o in i) + ")"
+                for i in found[:examples]
+            )
+            more = f" and {len(found) - examples} more" if len(found) > examples else ""
+            lines.append(f"**{kind}** ({len(found)}): {shown}{more}")
+        return "\n".join(lines)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+)
+
+from cogs.utils.discord_name_manager import DiscordNameManager
+
+
+__all__ = (
+    'FamilyNameIndex',
+)
+
+
+class FamilyNameIndex:
+    """
+    A prefix index over the cached names of the members of one family, so
+    that a family can be searched by name without fetching every member's
+    name.
+
+    The names are casefolded and held in a sorted list, so a search is a
+    binary search to the first name with the prefix and a walk along from
+    there. Only names that are already cached in :class:`DiscordNameManager`
+    are indexed. Whenever a cached name changes (eg through
+    ``NameHandler.save_name``) it's noted in
+    :attr:`DiscordNameManager.changes`, and the index catches up with those
+    before each search - or is rebuilt, if it's fallen too far behind.
+
+    Parameters
+    ----------
+    members : Iterable[int]
+        The IDs of everyone in the family.
+    """
+
+    __slots__ = (
+        '_members',
+        '_keys',
+        '_ids',
+        '_names',
+        '_seen',
+    )
+
+    def __init__(self, members: Iterable[int]):
+        self._members: FrozenSet[int] = frozenset(members)
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._names: Dict[int, str] = {}
+        self._seen: int = 0
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(members={len(self._members)}, named={len(self)})"
+
+    @staticmethod
+    def normalise(name: str) -> str:
+        """
+        Get the form of a name that's indexed and searched by.
+        """
+
+        return name.strip().casefold()
+
+    def _rebuild(self) -> None:
+        """
+        Build the index again from every member's cached name.
+        """
+
+        self._seen = DiscordNameManager.change_count
+        self._names.clear()
+        entries = []
+        for user_id in self._members:
+            name = DiscordNameManager.cached_name(user_id)
+            if name:
+                key = self._names[user_id] = self.normalise(name)
+                entries.append((key, user_id,))
+        entries.sort()
+        self._keys = [i[0] for i in entries]
+        self._ids = [i[1] for i in entries]
+
+    def _remove(self, user_id: int) -> None:
+        key = self._names.pop(user_id, None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self._keys, key)
+        while self._ids[position] != user_id:
+            position += 1
+        del self._keys[position]
+        del self._ids[position]
+
+    def _add(self, user_id: int, name: str) -> None:
+        key = self._names[user_id] = self.normalise(name)
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, user_id)
+
+    def refresh(self) -> None:
+        """
+        Catch up with any cached names that have changed since the index
+        was last used.
+        """
+
+        changes = DiscordNameManager.changes
+        behind = DiscordNameManager.change_count - self._seen
+        if behind == 0:
+            return
+        if behind > len(changes):
+            return self._rebuild()
+        for user_id in set(itertools.islice(reversed(changes), behind)):
+            if user_id not in self._members:
+                continue
+            self._remove(user_id)
+            name = DiscordNameManager.cached_name(user_id)
+            if name:
+                self._add(user_id, name)
+        self._seen = DiscordNameManager.change_count
+
+    def find(self, prefix: str, limit: Optional[int] = 25) -> List[int]:
+        """
+        Find the members of the family whose names start with a given
+        prefix, ignoring case.
+
+        Parameters
+        ----------
+        prefix : str
+            The start of the name to look for.
+        limit : Optional[int], optional
+            The most members to give back. Everyone who matches is given
+            if this is ``None``.
+
+        Returns
+        -------
+        List[int]
+            The IDs of the members who match, in name order.
+        """
+
+        self.refresh()
+        prefix = self.normalise(prefix)
+        keys = self._keys
+        position = bisect.bisect_left(keys, prefix)
+        end = len(keys) if limit is None else min(len(keys), position + limit)
+        found: List[int] = []
+        while position < end and keys[position].startswith(prefix):
+            found.append(self._ids[position])
+            position += 1
+        return found
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from datetime import datetime as dt
+from typing import (
+    Optional,
+    Set,
+    Tuple,
+)
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.relation_cache import RelationCache
+
+
+__all__ = (
+    'FamilyStatistics',
+)
+
+
+class FamilyStatistics:
+    """
+    The statistics for a single family (connected component) - how big it
+    is, how it's shaped, and how long it's been around.
+
+    These are kept per family, and are only worked out again once someone
+    in the family has changed (which bumps its component epoch), so asking
+    again for an unchanged family is a single cache lookup. The generation
+    numbers come from the graph's :class:`GenerationIndex`, and the times
+    from its :class:`FamilyTimestamps`.
+
+    They aren't kept up to date as each relation changes. The first
+    lookup after a change walks that family once (other families keep
+    their cached statistics), which costs no more than keeping them up to
+    date would have: a split or merge moves an unknown set of members
+    between families, one adoption can move every generation number (so
+    the generation index works them out again anyway), and the oldest
+    marriage can't be found again after a divorce without keeping a heap
+    per family. Doing it per change would put all that on every marry,
+    adopt, and disown instead of on the much rarer stats lookups.
+
+    Parameters
+    ----------
+    guild_id : int
+        The ID of the guild that the family is in.
+    member_count : int
+        The number of people in the family.
+    generation_count : int
+        The number of generations in the family.
+    widest_generation : int
+        The number of people in the family's biggest generation.
+    marriage_count : int
+        The number of marriages in the family.
+    adoption_count : int
+        The number of people in the family who have a parent.
+    oldest_marriage : Optional[Tuple[dt, int, int]]
+        The marriage that's been going the longest, as (timestamp, user ID,
+        partner ID), if we know the time of any of them. Ties go to the
+        lowest IDs.
+    oldest_adoption : Optional[Tuple[dt, int, int]]
+        The adoption that's been going the longest, as (timestamp, child ID,
+        parent ID), if we know the time of any of them.
+    """
+
+    cache = RelationCache(maxsize=4_096)
+
+    __slots__ = (
+        'guild_id',
+        'member_count',
+        'generation_count',
+        'widest_generation',
+        'marriage_count',
+        'adoption_count',
+        'oldest_marriage',
+        'oldest_adoption',
+    )
+
+    def __init__(
+            self,
+            guild_id: int,
+            member_count: int = 1,
+            generation_count: int = 1,
+            widest_generation: int = 1,
+            marriage_count: int = 0,
+            adoption_count: int = 0,
+            oldest_marriage: Optional[Tuple[dt, int, int]] = None,
+            oldest_adoption: Optional[Tuple[dt, int, int]] = None):
+        self.guild_id: int = guild_id
+        self.member_count: int = member_count
+        self.generation_count: int = generation_count
+        self.widest_generation: int = widest_generation
+        self.marriage_count: int = marriage_count
+        self.adoption_count: int = adoption_count
+        self.oldest_marriage: Optional[Tuple[dt, int, int]] = oldest_marriage
+        self.oldest_adoption: Optional[Tuple[dt, int, int]] = oldest_adoption
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(guild_id={self.guild_id!r}, "
+            f"members={self.member_count}, generations={self.generation_count})"
+        )
+
+    @classmethod
+    def get(cls, graph: FamilyGraph, user_id: int) -> FamilyStatistics:
+        """
+        Get the statistics for the family that a user is in.
+
+        Parameters
+        ----------
+        graph : FamilyGraph
+            The graph that the family is in.
+        user_id : int
+            The ID of any member of the family.
+
+        Returns
+        -------
+        FamilyStatistics
+            The family's statistics. These may be shared with anyone else
+            who asked about the same family since it last changed.
+        """
+
+        store = graph.store
+        components = store.components
+        start = store.index_of(user_id)
+        label = components.component_id(start)
+        if start is None or label is None:
+            return cls(graph.guild_id)
+
+        # See if we've worked them out since it last changed
+        key = (graph.guild_id, label,)
+        token = (graph.serial, components.epoch(label), graph.timestamps.version,)
+        found, statistics = cls.cache.get(key, token)
+        if found:
+            return statistics
+
+        # Count up the relations - they aren't always stored both ways
+        # round, so marriages are counted as pairs
+        snowflake = store.snowflake
+        timestamps = graph.timestamps
+        marriages: Set[Tuple[int, int]] = set()
+        adoption_count = 0
+        oldest_adoption: Optional[Tuple[dt, int, int]] = None
+        for i in components.component_members(start):
+            user = snowflake(i)
+            for o in store.partner_indexes(i):
+                if o != i:
+                    partner = snowflake(o)
+                    marriages.add((user, partner,) if user < partner else (partner, user,))
+            parent = store.parent_index(i)
+            if parent >= 0 and parent != i:
+                adoption_count += 1
+                timestamp = timestamps.adopted_at(user)
+                if timestamp is not None:
+                    adoption = (timestamp, user, snowflake(parent),)
+                    if oldest_adoption is None or adoption < oldest_adoption:
+                        oldest_adoption = adoption
+        oldest_marriage: Optional[Tuple[dt, int, int]] = None
+        for user, partner in marriages:
+            timestamp = timestamps.married_at(user, partner)
+            if timestamp is not None:
+                marriage = (timestamp, user, partner,)
+                if oldest_marriage is None or marriage < oldest_marriage:
+                    oldest_marriage = marriage
+
+        # And the shape of the family
+        generation_sizes = store.generations.generation_sizes(start)
+        statistics = cls(
+            graph.guild_id,
+            member_count=components.component_size(start),
+            generation_count=len(generation_sizes),
+            widest_generation=max(generation_sizes),
+            marriage_count=len(marriages),
+            adoption_count=adoption_count,
+            oldest_marriage=oldest_marriage,
+            oldest_adoption=oldest_adoption,
+        )
+        cls.cache.put(key, token, statistics)
+        return statistics
@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from array import array
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableSequence,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+from cogs.utils.family_tree.ancestor_index import AncestorIndex
+from cogs.utils.family_tree.family_component_index import FamilyComponentIndex
+from cogs.utils.family_tree.generation_index import GenerationIndex
+
+
+__all__ = (
+    'FamilyStore',
+)
+
+
+class FamilyStore(ABC):
+    """
+    The relations of every member of one family tree (ie one guild), and
+    the indexes built over them.
+
+    This is the interface that everything else reads and changes family
+    data through, so that how the rows are actually held can be swapped
+    out per deployment (see :attr:`BACKEND_NAME` and :meth:`get_backend`).
+    Each Discord user with any relations is given a dense integer index,
+    which never changes for as long as they're in the store, and each
+    user's children and partners are kept as a row of indexes in snowflake
+    order.
+
+    Subclasses hold the user IDs and parents in the ``_snowflakes`` and
+    ``_parents`` sequences, and provide the index lookups, the rows, and
+    the bulk import and export; everything here is built on top of those.
+
+    Relations should always be stored on both sides (a parent lists their
+    child, and the child has that parent), but while a change is being made
+    - or if the data is off - only one side might have it. Those are noted
+    so that :meth:`neighbour_indexes` can always be read both ways round.
+    """
+
+    # The name that this backend is picked with in the config
+    BACKEND_NAME: str = ""
+
+    __slots__ = (
+        '_snowflakes',
+        '_parents',
+        '_one_way',
+        'components',
+        'ancestors',
+        'generations',
+    )
+
+    def __init__(self):
+        self._one_way: Dict[int, List[int]] = {}
+        self.components = FamilyComponentIndex(self.neighbour_indexes)
+        self.ancestors = AncestorIndex(self.parent_index, self.neighbour_indexes)
+        self.generations = GenerationIndex(self)
+
+    def __len__(self) -> int:
+        return len(self._snowflakes)
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.index_of(user_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._snowflakes)
+
+    @classmethod
+    def get_backend(cls, name: str) -> Type[FamilyStore]:
+        """
+        Get the store class with the given :attr:`BACKEND_NAME`.
+
+        Raises
+        ------
+        ValueError
+            If there's no backend with that name.
+        """
+
+        for backend in cls.__subclasses__():
+            if backend.BACKEND_NAME == name:
+                return backend
+        raise ValueError(f"There's no family store backend called {name!r}")
+
+    @property
+    def is_mapped(self) -> bool:
+        """
+        Whether the store is using a shared image that it shouldn't be
+        rebuilt away from.
+        """
+
+        return False
+
+    @property
+    def has_one_way(self) -> bool:
+        """
+        Whether any relation is only stored on one side. A store rebuilt
+        from :meth:`to_edges` would have those on both sides, or not at
+        all.
+        """
+
+        return bool(self._one_way)
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """
+        The approximate number of bytes used by the store.
+        """
+
+    # Index lookups
+
+    @abstractmethod
+    def index_of(self, user_id: int) -> Optional[int]:
+        """
+        Get the dense index of a given user, or ``None`` if they're not
+        in the store.
+        """
+
+    @abstractmethod
+    def ensure_index(self, user_id: int) -> int:
+        """
+        Get the dense index of a given user, adding them to the store if
+        they aren't there already.
+        """
+
+    def snowflake(self, index: int) -> int:
+        """
+        Get the user ID for a given dense index.
+        """
+
+        return self._snowflakes[index]
+
+    # Reading by index
+
+    def parent_index(self, index: int) -> int:
+        """
+        Get the index of a user's parent, or -1 if they have none.
+        """
+
+        return self._parents[index]
+
+    @abstractmethod
+    def child_indexes(self, index: int) -> Sequence[int]:
+        """
+        Get the indexes of a user's children, in snowflake order.
+        """
+
+    @abstractmethod
+    def partner_indexes(self, index: int) -> Sequence[int]:
+        """
+        Get the indexes of a user's partners, in snowflake order.
+        """
+
+    def neighbour_indexes(self, index: int) -> List[int]:
+        """
+        Get the indexes of everyone directly related to a user, including
+        anyone who only has the relation stored on their side.
+        """
+
+        output = [*self.child_indexes(index), *self.partner_indexes(index)]
+        parent = self._parents[index]
+        if parent >= 0:
+            output.append(parent)
+        one_way = self._one_way.get(index)
+        if one_way:
+            output.extend(one_way)
+        return output
+
+    def _row_position(self, row: Sequence[int], other: int) -> int:
+        """
+        Binary search a row (which is in snowflake order) for where the
+        given index is, or where it would go.
+        """
+
+        snowflakes = self._snowflakes
+        target = snowflakes[other]
+        low, high = 0, len(row)
+        while low < high:
+            middle = (low + high) // 2
+            if snowflakes[row[middle]] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _row_contains(self, row: Sequence[int], other: int) -> bool:
+        position = self._row_position(row, other)
+        return position < len(row) and row[position] == other
+
+    def _has_relation(self, index: int, other: int) -> bool:
+        return (
+            self._parents[index] == other
+            or self._row_contains(self.child_indexes(index), other)
+            or self._row_contains(self.partner_indexes(index), other)
+        )
+
+    # Reading by user ID
+
+    def get_parent(self, user_id: int) -> Optional[int]:
+        """
+        Get the ID of a user's parent.
+        """
+
+        index = self.index_of(user_id)
+        if index is None:
+            return None
+        parent = self._parents[index]
+        if parent < 0:
+            return None
+        return self._snowflakes[parent]
+
+    def get_children(self, user_id: int) -> List[int]:
+        """
+        Get the IDs of a user's children.
+        """
+
+        index = self.index_of(user_id)
+        if index is None:
+            return []
+        snowflakes = self._snowflakes
+        return [snowflakes[i] for i in self.child_indexes(index)]
+
+    def get_partners(self, user_id: int) -> List[int]:
+        """
+        Get the IDs of a user's partners.
+        """
+
+        index = self.index_of(user_id)
+        if index is None:
+            return []
+        snowflakes = self._snowflakes
+        return [snowflakes[i] for i in self.partner_indexes(index)]
+
+    def has_child(self, user_id: int, child_id: int) -> bool:
+        """
+        Whether a user has the given child, without building their list of
+        children.
+        """
+
+        index, other = self.index_of(user_id), self.index_of(child_id)
+        if index is None or other is None:
+            return False
+        return self._row_contains(self.child_indexes(index), other)
+
+    def has_partner(self, user_id: int, partner_id: int) -> bool:
+        """
+        Whether a user has the given partner, without building their list
+        of partners.
+        """
+
+        index, other = self.index_of(user_id), self.index_of(partner_id)
+        if index is None or other is None:
+            return False
+        return self._row_contains(self.partner_indexes(index), other)
+
+    def empty_count(self) -> int:
+        """
+        Get how many users are still in the store with no relations left.
+        """
+
+        parents = self._parents
+        child_indexes, partner_indexes = self.child_indexes, self.partner_indexes
+        return sum(
+            1
+            for i in range(len(parents))
+            if parents[i] < 0 and not child_indexes(i) and not partner_indexes(i)
+        )
+
+    def is_empty(self, user_id: int) -> bool:
+        """
+        Whether a user has no parent, children, or partners.
+        """
+
+        index = self.index_of(user_id)
+        if index is None:
+            return True
+        return (
+            self._parents[index] < 0
+            and not self.child_indexes(index)
+            and not self.partner_indexes(index)
+        )
+
+    # Writing
+
+    def _sync_relation(self, index: int, other: int) -> None:
+        """
+        Note down whether a relation between the two given users is only
+        stored on one side.
+        """
+
+        if index < 0 or other < 0 or index == other:
+            return
+        forward = self._has_relation(index, other)
+        backward = self._has_relation(other, index)
+        pairs = (
+            (other, index, forward and not backward,),
+            (index, other, backward and not forward,),
+        )
+        for target, source, one_way in pairs:
+            row = self._one_way.get(target)
+            if one_way:
+                if row is None:
+                    self._one_way[target] = [source]
+                elif source not in row:
+                    row.append(source)
+            elif row is not None and source in row:
+                row.remove(source)
+                if not row:
+                    del self._one_way[target]
+
+    def _invalidate(self, *indexes: int) -> None:
+        """
+        Bump the epochs and drop the cached generations for the families of
+        the given members. This needs to be called before the component
+        index is updated.
+        """
+
+        for i in indexes:
+            if i >= 0:
+                self.components.touch(i)
+                self.generations.invalidate(i)
+
+    @abstractmethod
+    def _editable_row(self, index: int, children: bool) -> MutableSequence[int]:
+        """
+        Get a user's children or partners as a list that can be changed in
+        place.
+        """
+
+    def _maybe_compact(self) -> None:
+        """
+        Tidy the store up after a change, if it needs it.
+        """
+
+    def _add_to_row(self, user_id: int, other_id: int, children: bool) -> bool:
+        index = self.ensure_index(user_id)
+        other = self.ensure_index(other_id)
+        row = self._editable_row(index, children)
+        position = self._row_position(row, other)
+        if position < len(row) and row[position] == other:
+            return False
+        self._invalidate(index, other)
+        row.insert(position, other)
+        self._sync_relation(index, other)
+        self._maybe_compact()
+        return True
+
+    def _remove_from_row(self, user_id: int, other_id: int, children: bool) -> bool:
+        index = self.index_of(user_id)
+        other = self.index_of(other_id)
+        if index is None or other is None:
+            return False
+        row = self._editable_row(index, children)
+        position = self._row_position(row, other)
+        if position == len(row) or row[position] != other:
+            return False
+        self._invalidate(index, other)
+        del row[position]
+        self._sync_relation(index, other)
+        self._maybe_compact()
+        return True
+
+    def add_child(self, user_id: int, child_id: int) -> bool:
+        """
+        Add a child to a user's children. Returns whether anything changed.
+        """
+
+        return self._add_to_row(user_id, child_id, True)
+
+    def remove_child(self, user_id: int, child_id: int) -> bool:
+        """
+        Remove a child from a user's children. Returns whether anything
+        changed.
+        """
+
+        return self._remove_from_row(user_id, child_id, True)
+
+    def add_partner(self, user_id: int, partner_id: int) -> bool:
+        """
+        Add a partner to a user's partners. Returns whether anything changed.
+        """
+
+        return self._add_to_row(user_id, partner_id, False)
+
+    def remove_partner(self, user_id: int, partner_id: int) -> bool:
+        """
+        Remove a partner from a user's partners. Returns whether anything
+        changed.
+        """
+
+        return self._remove_from_row(user_id, partner_id, False)
+
+    def set_parent(self, user_id: int, parent_id: Optional[int]) -> None:
+        """
+        Set (or remove) a user's parent.
+        """
+
+        if parent_id is None:
+            index = self.index_of(user_id)
+            if index is not None and self._parents[index] >= 0:
+                old_parent = self._parents[index]
+                self._invalidate(index, old_parent)
+                self._parents[index] = -1
+                self._sync_relation(index, old_parent)
+                self.ancestors.set_parent(index)
+            return
+        index = self.ensure_index(user_id)
+        parent = self.ensure_index(parent_id)
+        old_parent = self._parents[index]
+        if old_parent != parent:
+            self._invalidate(index, parent, old_parent)
+            self._parents[index] = parent
+            self._sync_relation(index, old_parent)
+            self._sync_relation(index, parent)
+            self.ancestors.set_parent(index)
+        self._maybe_compact()
+
+    def set_children(self, user_id: int, child_ids: Iterable[int]) -> None:
+        """
+        Replace a user's children.
+        """
+
+        self._set_row(user_id, child_ids, True)
+
+    def set_partners(self, user_id: int, partner_ids: Iterable[int]) -> None:
+        """
+        Replace a user's partners.
+        """
+
+        self._set_row(user_id, partner_ids, False)
+
+    def _set_row(self, user_id: int, other_ids: Iterable[int], children: bool) -> None:
+        other_ids = list(dict.fromkeys(other_ids))
+        if other_ids:
+            index = self.ensure_index(user_id)
+        else:
+            index = self.index_of(user_id)
+            if index is None:
+                return
+        row = self._editable_row(index, children)
+        new_row = sorted([self.ensure_index(i) for i in other_ids], key=self._snowflakes.__getitem__)
+        if row != new_row:
+            changed = [*row, *new_row]
+            self._invalidate(index, *changed)
+            row[:] = new_row
+            for i in changed:
+                self._sync_relation(index, i)
+        self._maybe_compact()
+
+    # Bulk import and export
+
+    @abstractmethod
+    def to_rows(self, children: bool) -> Tuple[array, array]:
+        """
+        Get a compacted copy of every user's children or partners. The
+        store itself isn't changed.
+
+        Parameters
+        ----------
+        children : bool
+            Whether to get the children rows (or the partner rows).
+
+        Returns
+        -------
+        Tuple[array, array]
+            The offsets of each user's row, and the indexes in the rows.
+        """
+
+    def to_edges(self) -> Tuple[array, array]:
+        """
+        Get every relation in the store as flat arrays of snowflake pairs,
+        in the same shape that :meth:`from_edges` takes them.
+
+        Returns
+        -------
+        Tuple[array, array]
+            The (child ID, parent ID) pairs and the (user ID, partner ID)
+            pairs, one after the other in int64 arrays. Each partnership
+            is only given once.
+        """
+
+        snowflakes = self._snowflakes
+        parent_edges = array('q')
+        for index, parent in enumerate(self._parents):
+            if parent >= 0 and parent != index:
+                parent_edges.append(snowflakes[index])
+                parent_edges.append(snowflakes[parent])
+        partner_edges = array('q')
+        partner_indexes = self.partner_indexes
+        for index in range(len(snowflakes)):
+            for other in partner_indexes(index):
+
+                # Give the pair from the lower index, unless it's only
+                # stored on the higher index's side
+                if other > index or (other < index and index not in partner_indexes(other)):
+                    partner_edges.append(snowflakes[index])
+                    partner_edges.append(snowflakes[other])
+        return parent_edges, partner_edges
+
+    @classmethod
+    @abstractmethod
+    def from_edges(
+            cls,
+            parent_edges: Iterable[Tuple[int, int]],
+            partner_edges: Iterable[Tuple[int, int]]) -> FamilyStore:
+        """
+        Build a store in one go from a list of edges.
+
+        Parameters
+        ----------
+        parent_edges : Iterable[Tuple[int, int]]
+            (child ID, parent ID) pairs.
+        partner_edges : Iterable[Tuple[int, int]]
+            (user ID, partner ID) pairs. Each pair is added in both
+            directions.
+
+        Returns
+        -------
+        FamilyStore
+            The new store.
+        """
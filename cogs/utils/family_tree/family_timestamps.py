@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from datetime import datetime as dt
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from cogs.utils import types
+
+
+__all__ = (
+    'FamilyTimestamps',
+)
+
+
+class FamilyTimestamps:
+    """
+    When each marriage and adoption in one guild's family graph happened,
+    as given by the ``timestamp`` column of the ``marriages`` and
+    ``parents`` rows.
+
+    These are loaded once from the rows that the graph is built from, and
+    then kept up to date as relations are added and removed through
+    :class:`FamilyTreeMember`. Anything added without a row to hand (eg
+    from another cluster) is given the time that it was added here.
+    """
+
+    __slots__ = (
+        '_marriages',
+        '_adoptions',
+        'version',
+    )
+
+    def __init__(self):
+        self._marriages: Dict[Tuple[int, int], dt] = {}
+        self._adoptions: Dict[int, dt] = {}  # Keyed by child ID
+        self.version: int = 0  # Bumped whenever rows are loaded in bulk
+
+    def __len__(self) -> int:
+        return len(self._marriages) + len(self._adoptions)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(marriages={len(self._marriages)}, "
+            f"adoptions={len(self._adoptions)})"
+        )
+
+    @staticmethod
+    def _pair(user_id: int, partner_id: int) -> Tuple[int, int]:
+        if user_id < partner_id:
+            return (user_id, partner_id,)
+        return (partner_id, user_id,)
+
+    def married_at(self, user_id: int, partner_id: int) -> Optional[dt]:
+        """
+        Get when two users got married, if we know.
+        """
+
+        return self._marriages.get(self._pair(user_id, partner_id))
+
+    def adopted_at(self, child_id: int) -> Optional[dt]:
+        """
+        Get when a user got their current parent, if we know.
+        """
+
+        return self._adoptions.get(child_id)
+
+    def set_married(self, user_id: int, partner_id: int, timestamp: Optional[dt] = None) -> None:
+        """
+        Note down when two users got married, keeping any time that we
+        already have for them. Now is used if no time is given.
+        """
+
+        if user_id == partner_id:
+            return
+        self._marriages.setdefault(self._pair(user_id, partner_id), timestamp or dt.utcnow())
+
+    def set_adopted(self, child_id: int, timestamp: Optional[dt] = None) -> None:
+        """
+        Note down when a user got their current parent, replacing any time
+        we had for a previous parent. Now is used if no time is given.
+        """
+
+        self._adoptions[child_id] = timestamp or dt.utcnow()
+
+    def forget_marriage(self, user_id: int, partner_id: int) -> None:
+        """
+        Forget when two users got married, since they're not any more.
+        """
+
+        self._marriages.pop(self._pair(user_id, partner_id), None)
+
+    def forget_adoption(self, child_id: int) -> None:
+        """
+        Forget when a user got their parent, since they don't have one any
+        more.
+        """
+
+        self._adoptions.pop(child_id, None)
+
+    def load(
+            self,
+            partnerships: Iterable[types.MarriagesDB],
+            parents: Iterable[types.ParentageDB]) -> None:
+        """
+        Load the times from database rows, replacing any that we already
+        have for the same relations. Rows without a timestamp are skipped.
+        """
+
+        for i in partnerships:
+            if i['timestamp'] is not None and i['user_id'] != i['partner_id']:
+                self._marriages[self._pair(i['user_id'], i['partner_id'])] = i['timestamp']
+        for i in parents:
+            if i['timestamp'] is not None:
+                self._adoptions[i['child_id']] = i['timestamp']
+        self.version += 1
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from cogs.utils.family_tree.family_store import FamilyStore
+
+
+__all__ = (
+    'span_indexes',
+    'generational_span_indexes',
+    'neighbourhood_indexes',
+    'root_index',
+)
+
+
+def span_indexes(
+        store: FamilyStore,
+        start: int,
+        visited: bytearray,
+        *,
+        add_parent: bool = False,
+        add_partners: bool = True,
+        expand_upwards: bool = False,
+        skip: Iterable[int] = ()) -> List[int]:
+    """
+    Gets the index of every user related to the given one, in the same
+    (depth-first) order that the recursive span used to give them in.
+
+    Parameters
+    ----------
+    store : FamilyStore
+        The store to walk.
+    start : int
+        The index of the user to start from.
+    visited : bytearray
+        A zeroed buffer at least as long as the store. It's zeroed again
+        before this returns, so it can be reused.
+    add_parent : bool, optional
+        Whether or not to add the parent of the starting user.
+    add_partners : bool, optional
+        Whether or not to walk through partners.
+    expand_upwards : bool, optional
+        Whether or not to walk upwards through parents.
+    skip : Iterable[int], optional
+        Indexes that should be treated as already visited.
+
+    Returns
+    -------
+    List[int]
+        The indexes of everyone in the span.
+    """
+
+    parent_index = store.parent_index
+    child_indexes = store.child_indexes
+    partner_indexes = store.partner_indexes
+    skip = list(skip)
+    for i in skip:
+        visited[i] = 1
+
+    # Items on the stack are pushed in the reverse of the order that the
+    # recursion would visit them in, and checked when they're popped
+    output: List[int] = []
+    stack: List[Tuple[int, bool]] = [(start, add_parent,)]
+    pop, push = stack.pop, stack.append
+    try:
+        while stack:
+            node, node_add_parent = pop()
+            if visited[node]:
+                continue
+            visited[node] = 1
+            output.append(node)
+            if add_partners:
+                for i in reversed(partner_indexes(node)):
+                    if not visited[i]:
+                        push((i, True,))
+            for i in reversed(child_indexes(node)):
+                if not visited[i]:
+                    push((i, False,))
+            if expand_upwards and node_add_parent:
+                parent = parent_index(node)
+                if parent >= 0 and not visited[parent]:
+                    push((parent, True,))
+    finally:
+        for i in output:
+            visited[i] = 0
+        for i in skip:
+            visited[i] = 0
+    return output
+
+
+def generational_span_indexes(
+        store: FamilyStore,
+        start: int,
+        visited: bytearray,
+        *,
+        add_parent: bool = False,
+        add_partners: bool = True,
+        expand_upwards: bool = False,
+        max_generations: Optional[int] = None) -> Dict[int, List[int]]:
+    """
+    Gets the index of every user related to the given one, split up by
+    generation, in the same order that the recursive generational span
+    used to give them in. Unlike that, this has no depth limit.
+
+    Parameters
+    ----------
+    store : FamilyStore
+        The store to walk.
+    start : int
+        The index of the user to start from.
+    visited : bytearray
+        A zeroed buffer at least as long as the store. It's zeroed again
+        before this returns, so it can be reused.
+    add_parent : bool, optional
+        Whether or not to add the parent of the starting user.
+    add_partners : bool, optional
+        Whether or not to add the partners of the starting user.
+    expand_upwards : bool, optional
+        Whether or not to walk upwards through parents.
+    max_generations : Optional[int], optional
+        If given, users more than this many generations above or below
+        the starting user aren't included.
+
+    Returns
+    -------
+    Dict[int, List[int]]
+        The indexes of each generation of users, keyed by generation
+        relative to the starting user.
+    """
+
+    parent_index = store.parent_index
+    child_indexes = store.child_indexes
+    partner_indexes = store.partner_indexes
+    if max_generations is None:
+        max_generations = -1
+
+    # Items on the stack are (index, generation, add parent, add partners),
+    # pushed in the reverse of the order that the recursion would visit
+    # them in, and checked when they're popped
+    output: Dict[int, List[int]] = {}
+    touched: List[int] = []
+    stack: List[Tuple[int, int, bool, bool]] = [(start, 0, add_parent, add_partners,)]
+    pop, push = stack.pop, stack.append
+    try:
+        while stack:
+            node, depth, node_add_parent, node_add_partners = pop()
+            if visited[node]:
+                continue
+            visited[node] = 1
+            touched.append(node)
+            generation = output.get(depth)
+            if generation is None:
+                output[depth] = [node]
+            else:
+                generation.append(node)
+
+            # Add your parent
+            if expand_upwards and node_add_parent and (max_generations < 0 or -depth < max_generations):
+                parent = parent_index(node)
+                if parent >= 0 and not visited[parent]:
+                    push((parent, depth - 1, True, True,))
+
+            # Add your partners
+            if node_add_partners:
+                for i in reversed(partner_indexes(node)):
+                    if not visited[i]:
+                        push((i, depth, True, False,))
+
+            # Add your children
+            if max_generations < 0 or depth < max_generations:
+                for i in reversed(child_indexes(node)):
+                    if not visited[i]:
+                        push((i, depth + 1, False, True,))
+    finally:
+        for i in touched:
+            visited[i] = 0
+    return output
+
+
+def neighbourhood_indexes(
+        store: FamilyStore,
+        start: int,
+        *,
+        generations: int,
+        partner_hops: Optional[int] = None) -> Dict[int, List[int]]:
+    """
+    Gets the index of everyone near to the given user, split up by
+    generation. This walks outwards from the user a step at a time through
+    parents, children, and partners, so it only ever touches the people
+    that it returns - however big the rest of the family is.
+
+    Parameters
+    ----------
+    store : FamilyStore
+        The store to walk.
+    start : int
+        The index of the user to start from.
+    generations : int
+        How many generations above or below the starting user to go.
+    partner_hops : Optional[int], optional
+        How many marriages can be gone through to reach someone. There's
+        no limit if this isn't given.
+
+    Returns
+    -------
+    Dict[int, List[int]]
+        The indexes of each generation of users, keyed by generation
+        relative to the starting user. Each generation is in the order
+        that it was reached in.
+    """
+
+    parent_index = store.parent_index
+    child_indexes = store.child_indexes
+    partner_indexes = store.partner_indexes
+
+    # Keep each person's generation, and the fewest marriages gone through
+    # to reach them - they're walked again if they turn up through fewer
+    reached: Dict[int, Tuple[int, int]] = {start: (0, 0,)}
+    output: Dict[int, List[int]] = {0: [start]}
+    queue = deque([start])
+    pop, push = queue.popleft, queue.append
+    while queue:
+        node = pop()
+        depth, used = reached[node]
+        found: List[Tuple[int, int, int]] = []
+        if depth > -generations:
+            parent = parent_index(node)
+            if parent >= 0:
+                found.append((parent, depth - 1, used,))
+        if partner_hops is None or used < partner_hops:
+            found.extend((i, depth, used + 1,) for i in partner_indexes(node))
+        if depth < generations:
+            found.extend((i, depth + 1, used,) for i in child_indexes(node))
+        for other, other_depth, other_used in found:
+            previous = reached.get(other)
+            if previous is None:
+                output.setdefault(other_depth, []).append(other)
+            elif other_used < previous[1]:
+                other_depth = previous[0]
+            else:
+                continue
+            reached[other] = (other_depth, other_used,)
+            push(other)
+    return output
+
+
+def root_index(store: FamilyStore, start: int) -> int:
+    """
+    Walks up from the given user to the top of their tree. This only goes
+    up one line of the family, so it won't go through their partner's
+    parents unless they have no parent of their own.
+
+    Parameters
+    ----------
+    store : FamilyStore
+        The store to walk.
+    start : int
+        The index of the user to start from.
+
+    Returns
+    -------
+    int
+        The index of the user at the top of the tree.
+    """
+
+    root = start
+    already_processed = set()
+    while root not in already_processed:
+        already_processed.add(root)
+
+        # If this user has a parent, they must be higher than this one
+        parent = store.parent_index(root)
+        if parent >= 0:
+            root = parent
+            continue
+
+        # If they have any partners, one of THEM could have a parent
+        partners = store.partner_indexes(root)
+        if not partners:
+            break
+        for i in partners:
+            parent = store.parent_index(i)
+            if parent >= 0:
+                root = parent
+                break
+    return root
@@ -7,8 +7,8 @@ from typing import (
     List,
     Optional,
     Iterable,
-    Union,
     Set,
+    Union,
     overload,
     Literal,
 )
@@ -18,10 +18,19 @@ import random
 from cogs.utils import types
 from cogs.utils.customised_tree_user import CustomisedTreeUser
 from cogs.utils.family_tree.relationship_string_simplifier import RelationshipStringSimplifier as Simplifier
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_statistics import FamilyStatistics
+from cogs.utils.family_tree.family_worker_pool import FamilyWorkerPool
+from cogs.utils.family_tree.frozen_family import FrozenFamily
+from cogs.utils.family_tree.relation_cache import RelationCache
+from cogs.utils.family_tree import family_traversal, relation_engine
 from cogs.utils.discord_name_manager import DiscordNameManager
 
 if TYPE_CHECKING:
     import discord
+    from discord.ext import vbu
+
+    from cogs.utils.family_tree.family_store import FamilyStore
 
     FamilyTreeMemberSetter = Union[
         "FamilyTreeMember",
@@ -38,16 +47,20 @@ def get_cluster_name(k: int = 5) -> str:
 class FamilyTreeMember:
     """
     A class representing a member of a family.
+
+    Instances are thin views onto the :class:`FamilyGraph` for the
+    member's guild - the relations themselves are held in that graph's
+    store, so these objects are cheap to create and aren't cached anywhere.
+
+    Creating an instance directly replaces that user's relations with the
+    ones given; use :meth:`get` to look someone up.
     """
 
-    all_users: Dict[Tuple[int, int], FamilyTreeMember] = {}
     INVISIBLE = "[shape=point,width=0.001,style=invis]"  # For the DOT script
+    relation_cache = RelationCache(maxsize=10_000)
 
     __slots__ = (
         'id',
-        '_children',
-        '_parent',
-        '_partners',
         '_guild_id',
     )
 
@@ -59,15 +72,20 @@ class FamilyTreeMember:
             partners: Optional[List[int]] = None,
             guild_id: int = 0):
         self.id: int = discord_id
-        self._children: List[int] = children or list()
-        self._parent: Optional[int] = parent_id
-        self._partners: List[int] = partners or list()
         self._guild_id: int = guild_id
-        self.all_users[(self.id, self._guild_id)] = self
+        self._replace_relations(parent_id, children or [], partners or [])
 
     def __hash__(self):
         return hash((self.id, self._guild_id,))
 
+    @property
+    def _graph(self) -> FamilyGraph:
+        return FamilyGraph.get(self._guild_id)
+
+    @property
+    def _store(self) -> FamilyStore:
+        return FamilyGraph.get(self._guild_id).store
+
     @overload
     def _get_user_id(self, value: FamilyTreeMemberSetter) -> int:
         ...
@@ -105,13 +123,20 @@ class FamilyTreeMember:
         """
 
         assert discord_id
-        v = cls.all_users.get((discord_id, guild_id))
-        if v:
-            return v
-        return cls(
-            discord_id=discord_id,
-            guild_id=guild_id,
-        )
+        v = cls.__new__(cls)
+        v.id = discord_id
+        v._guild_id = guild_id
+        return v
+
+    def _view(self, discord_id: int) -> FamilyTreeMember:
+        """
+        Gets a view of another user in this user's guild.
+        """
+
+        v = self.__class__.__new__(self.__class__)
+        v.id = discord_id
+        v._guild_id = self._guild_id
+        return v
 
     @classmethod
     def get_multiple(
@@ -125,6 +150,70 @@ class FamilyTreeMember:
         for i in discord_ids:
             yield cls.get(i, guild_id)
 
+    def _mark_dirty(self) -> None:
+        self._graph.dirty.add(self.id)
+
+    def _link(self, other_id: int) -> None:
+        store = self._store
+        store.components.link(store.ensure_index(self.id), store.ensure_index(other_id))
+
+    def _unlink(self, other_id: int) -> None:
+        store = self._store
+        index, other = store.index_of(self.id), store.index_of(other_id)
+        if index is not None and other is not None:
+            store.components.unlink(index, other)
+
+    def _replace_relations(
+            self,
+            parent_id: Optional[int],
+            children: List[int],
+            partners: List[int]) -> None:
+        """
+        Replace all of this user's relations at once, updating the
+        component index with whatever was added or removed.
+        """
+
+        graph = self._graph
+        store = graph.store
+        old_relations = set(self.get_direct_relations())
+        old_parent, old_partners = store.get_parent(self.id), set(store.get_partners(self.id))
+        store.set_parent(self.id, parent_id)
+        store.set_children(self.id, children)
+        store.set_partners(self.id, partners)
+        new_relations = set(self.get_direct_relations())
+        self._mark_dirty()
+
+        removed = old_relations - new_relations
+        if removed:
+            index = store.index_of(self.id)
+            store.components.unlink_all(index, [store.index_of(i) for i in removed])
+        for i in new_relations - old_relations:
+            self._link(i)
+
+        # Keep the times that relations were made up to date
+        new_partners = set(partners)
+        for i in old_partners - new_partners:
+            graph.timestamps.forget_marriage(self.id, i)
+        for i in new_partners - old_partners:
+            graph.timestamps.set_married(self.id, i)
+        if parent_id != old_parent:
+            if parent_id is None:
+                graph.timestamps.forget_adoption(self.id)
+            else:
+                graph.timestamps.set_adopted(self.id)
+
+    @property
+    def _parent(self) -> Optional[int]:
+        return self._store.get_parent(self.id)
+
+    @property
+    def _children(self) -> List[int]:
+        return self._store.get_children(self.id)
+
+    @property
+    def _partners(self) -> List[int]:
+        return self._store.get_partners(self.id)
+
     @overload
     def add_child(
             self,
@@ -151,8 +240,9 @@ class FamilyTreeMember:
         """
 
         child_id = self._get_user_id(child)
-        if child_id not in self._children:
-            self._children.append(child_id)
+        if self._store.add_child(self.id, child_id):
+            self._mark_dirty()
+            self._link(child_id)
 
         if return_added:
             return self.get(child_id, self._guild_id)
@@ -183,8 +273,9 @@ class FamilyTreeMember:
         """
 
         child_id = self._get_user_id(child)
-        while child_id in self._children:
-            self._children.remove(child_id)
+        if self._store.remove_child(self.id, child_id):
+            self._mark_dirty()
+            self._unlink(child_id)
 
         if return_added:
             return self.get(child_id, self._guild_id)
@@ -215,8 +306,10 @@ class FamilyTreeMember:
         """
 
         partner_id = self._get_user_id(partner)
-        if partner_id not in self._partners:
-            self._partners.append(partner_id)
+        if self._store.add_partner(self.id, partner_id):
+            self._mark_dirty()
+            self._link(partner_id)
+            self._graph.timestamps.set_married(self.id, partner_id)
 
         if return_added:
             return self.get(partner_id, self._guild_id)
@@ -247,8 +340,10 @@ class FamilyTreeMember:
         """
 
         partner_id = self._get_user_id(partner)
-        while partner_id in self._partners:
-            self._partners.remove(partner_id)
+        if self._store.remove_partner(self.id, partner_id):
+            self._mark_dirty()
+            self._unlink(partner_id)
+            self._graph.timestamps.forget_marriage(self.id, partner_id)
 
         if return_added:
             return self.get(partner_id, self._guild_id)
@@ -266,6 +361,48 @@ class FamilyTreeMember:
             "guild_id": self._guild_id,
         }
 
+    @classmethod
+    async def publish_dirty(cls, redis: vbu.Redis, guild_id: int = 0) -> int:
+        """
+        Send everyone in a guild who's been changed since the last publish
+        to the other clusters, as a single message.
+
+        Parameters
+        ----------
+        redis : vbu.Redis
+            The connection to publish over.
+        guild_id : int, optional
+            The ID of the guild whose changes should be published.
+
+        Returns
+        -------
+        int
+            The number of users that were published.
+        """
+
+        dirty = FamilyGraph.get(guild_id).take_dirty()
+        if not dirty:
+            return 0
+        payload: types.FamilyTreeMembersPayload = {
+            "guild_id": guild_id,
+            "members": [cls.get(i, guild_id).to_json() for i in dirty],  # type: ignore
+        }
+        await redis.publish("TreeMemberUpdates", payload)
+        return len(dirty)
+
+    @classmethod
+    def load_published(cls, payload: types.FamilyTreeMembersPayload) -> None:
+        """
+        Load a set of users sent by :meth:`publish_dirty` on another
+        cluster. They aren't marked as changed here, so they won't be
+        sent back out again.
+        """
+
+        graph = FamilyGraph.get(payload['guild_id'])
+        for data in payload['members']:
+            cls(**data)
+            graph.dirty.discard(data['discord_id'])
+
     @classmethod
     def from_json(cls, data: dict) -> FamilyTreeMember:
         """
@@ -309,13 +446,25 @@ class FamilyTreeMember:
         Gets you the instance of this user's parent.
         """
 
-        if self._parent and self._parent != self.id:
-            return self.get(self._parent, self._guild_id)
+        parent_id = self._parent
+        if parent_id and parent_id != self.id:
+            return self.get(parent_id, self._guild_id)
         return None
 
     @parent.setter
     def parent(self, value: Optional[FamilyTreeMemberSetter]):
-        self._parent = self._get_user_id(value)
+        old_parent, new_parent = self._parent, self._get_user_id(value)
+        if old_parent == new_parent:
+            return
+        self._store.set_parent(self.id, new_parent)
+        self._mark_dirty()
+        if old_parent is not None:
+            self._unlink(old_parent)
+        if new_parent is not None:
+            self._link(new_parent)
+            self._graph.timestamps.set_adopted(self.id)
+        else:
+            self._graph.timestamps.forget_adoption(self.id)
 
     @property
     def children(self) -> Iterable[FamilyTreeMember]:
@@ -323,14 +472,18 @@ class FamilyTreeMember:
         Gets you the list of children instances for this user.
         """
 
-        for i in sorted(self._children):
+        for i in self._children:  # These are kept in order by the store
             if i == self.id:
                 continue
             yield self.get(i, self._guild_id)
 
     @children.setter
     def children(self, value: Iterable[FamilyTreeMemberSetter]):
-        self._children = [self._get_user_id(i) for i in value]
+        self._replace_relations(
+            self._parent,
+            [self._get_user_id(i) for i in value],
+            self._partners,
+        )
 
     @property
     def partners(self) -> Iterable[FamilyTreeMember]:
@@ -338,14 +491,32 @@ class FamilyTreeMember:
         Gets you the list of partner instances for this user.
         """
 
-        for i in sorted(self._partners):
+        for i in self._partners:  # These are kept in order by the store
             if i == self.id:
                 continue
             yield self.get(i, self._guild_id)
 
     @partners.setter
     def partners(self, value: Iterable[FamilyTreeMemberSetter]):
-        self._partners = [self._get_user_id(i) for i in value]
+        self._replace_relations(
+            self._parent,
+            self._children,
+            [self._get_user_id(i) for i in value],
+        )
+
+    def has_child(self, child: FamilyTreeMemberSetter) -> bool:
+        """
+        Whether or not the given user is one of this user's children.
+        """
+
+        return self._store.has_child(self.id, self._get_user_id(child))
+
+    def has_partner(self, partner: FamilyTreeMemberSetter) -> bool:
+        """
+        Whether or not the given user is one of this user's partners.
+        """
+
+        return self._store.has_partner(self.id, self._get_user_id(partner))
 
     def get_direct_relations(self) -> List[int]:
         """
@@ -365,11 +536,7 @@ class FamilyTreeMember:
         for loops etc, and is only used before a tree generation.
         """
 
-        return not any((
-            len(self._partners) > 0,
-            self._parent is not None,
-            len(self._children) > 0
-        ))
+        return self._store.is_empty(self.id)
 
     def get_relation(self, target_user: FamilyTreeMember) -> Optional[str]:
         """
@@ -386,10 +553,32 @@ class FamilyTreeMember:
             The family tree relationship string.
         """
 
-        text = self.get_unshortened_relation(target_user)
-        if text is None:
+        # See if we've already worked it out
+        key = (self.id, target_user.id, self._guild_id,)
+        token = self._relation_cache_token()
+        if token is not None:
+            found, relation = self.relation_cache.get(key, token)
+            if found:
+                return relation
+
+        # Work it out
+        path = self.get_relation_path(target_user)
+        relation = None if path is None else Simplifier.simplify_path(path)
+        if token is not None:
+            self.relation_cache.put(key, token, relation)
+        return relation
+
+    def _relation_cache_token(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Gets a token that changes whenever anyone in this user's family has
+        their relations changed, or ``None`` if they have no family.
+        """
+
+        graph = self._graph
+        label = graph.components.component_id(graph.store.index_of(self.id))
+        if label is None:
             return None
-        return Simplifier().simplify(text)
+        return (graph.serial, label, graph.components.epoch(label),)
 
     @property
     def family_member_count(self) -> int:
@@ -397,16 +586,93 @@ class FamilyTreeMember:
         Returns the number of people in the family.
         """
 
-        family_member_count = 0
-        for _ in self.span(add_parent=True, expand_upwards=True):
-            family_member_count += 1
-        return family_member_count
+        return self.component_size
+
+    @property
+    def component_id(self) -> Optional[int]:
+        """
+        The ID of the family (connected component) that this user is in,
+        or ``None`` if they aren't related to anyone.
+        """
+
+        return self._store.components.component_id(self._store.index_of(self.id))
+
+    @property
+    def component_size(self) -> int:
+        """
+        The number of people in this user's family, including themselves.
+        """
+
+        return self._store.components.component_size(self._store.index_of(self.id))
+
+    @classmethod
+    def would_exceed(
+            cls,
+            a: FamilyTreeMember,
+            b: FamilyTreeMember,
+            limit: int) -> bool:
+        """
+        Whether joining the families of the two given users would put them
+        at or over the given member limit. People who are already in both
+        families are only counted once.
+
+        Parameters
+        ----------
+        a : FamilyTreeMember
+            The first user.
+        b : FamilyTreeMember
+            The second user.
+        limit : int
+            The maximum number of family members.
+
+        Returns
+        -------
+        bool
+            Whether the joined family would be too large.
+        """
+
+        if a == b:
+            return a.component_size >= limit
+        store = a._store
+        return store.components.would_exceed(
+            store.index_of(a.id),
+            store.index_of(b.id),
+            limit,
+        )
+
+    def is_ancestor_of(self, other: FamilyTreeMember) -> bool:
+        """
+        Whether this user is somewhere above another in their line of
+        parents. Making this user the other's child would make a loop.
+
+        This is answered from the store's ancestor index, so it doesn't
+        walk the tree.
+
+        Parameters
+        ----------
+        other : FamilyTreeMember
+            The user who might be descended from this one.
+
+        Returns
+        -------
+        bool
+            Whether this user is an ancestor of the other.
+        """
+
+        if self == other:
+            return False
+        store = self._store
+        a, b = store.index_of(self.id), store.index_of(other.id)
+        if a is None or b is None:
+            return False
+        return store.ancestors.is_ancestor(a, b)
 
     def span(
             self,
             people_list: Union[set, None] = None,
             add_parent: bool = False,
-            expand_upwards: bool = False) -> Iterable[FamilyTreeMember]:
+            expand_upwards: bool = False,
+            add_partners: bool = True) -> Iterable[FamilyTreeMember]:
         """
         Gets a list of every user related to this one
         If "add_parent" and "expand_upwards" are True, then it should
@@ -416,11 +682,14 @@ class FamilyTreeMember:
         Parameters
         ----------
         people_list : set, optional
-            The list of users who are currently in the tree (so as to avoid recursion)
+            A set of users who shouldn't be added to the span. Users
+            that are added will be put into this set.
         add_parent : bool, optional
             Whether or not to add the parent of this user to the people list
         expand_upwards : bool, optional
             Whether or not to expand upwards in the tree
+        add_partners : bool, optional
+            Whether or not to expand through partners
 
         Yields
         ------
@@ -432,34 +701,37 @@ class FamilyTreeMember:
         if people_list is None:
             people_list = set()
         if self in people_list:
-            return people_list
-        people_list.add(self)
-        yield self
-
-        # Add your parent
-        if expand_upwards and add_parent and self._parent:
-            assert self.parent
-            yield from self.parent.span(
-                people_list,
-                add_parent=True,
-                expand_upwards=expand_upwards,
-            )
-
-        # Add your children
-        for child in self.children:
-            yield from child.span(
-                people_list,
-                add_parent=False,
-                expand_upwards=expand_upwards,
-            )
-
-        # Add your partner
-        for partner in self.partners:
-            yield from partner.span(
-                people_list,
-                add_parent=True,
-                expand_upwards=expand_upwards,
+            return
+        graph = self._graph
+        store = graph.store
+        start = store.index_of(self.id)
+        if start is None:
+            people_list.add(self)
+            yield self
+            return
+
+        # Walk the tree
+        skip = [
+            i for i in (
+                store.index_of(p.id)
+                for p in people_list
+                if p._guild_id == self._guild_id
             )
+            if i is not None
+        ]
+        indexes = family_traversal.span_indexes(
+            store,
+            start,
+            graph.visited_buffer(),
+            add_parent=add_parent,
+            add_partners=add_partners,
+            expand_upwards=expand_upwards,
+            skip=skip,
+        )
+        for i in indexes:
+            user = self._view(store.snowflake(i))
+            people_list.add(user)
+            yield user
 
     def get_root(self) -> FamilyTreeMember:
         """
@@ -467,122 +739,217 @@ class FamilyTreeMember:
         Only goes up one line of family so it cannot add your spouse's parents etc.
         """
 
-        # Set a default user to look at
-        root_user = self
-        already_processed = set()
+        store = self._store
+        index = store.index_of(self.id)
+        if index is None:
+            return self
+        root = store.generations.root(index)
+        if root == index:
+            return self
+        return self._view(store.snowflake(root))
 
-        # Loop until we get someone
-        while True:
+    @property
+    def generation(self) -> int:
+        """
+        How many generations below the top of their family this user is.
+        """
 
-            # The person we're looking at has been processed before,
-            # and as such they should be the top of our tree
-            if root_user in already_processed:
-                return root_user
+        store = self._store
+        index = store.index_of(self.id)
+        if index is None:
+            return 0
+        return store.generations.generation(index)
 
-            # Keep track of people we've looked at already
-            already_processed.add(root_user)
+    @property
+    def generation_count(self) -> int:
+        """
+        The number of generations in this user's family.
+        """
 
-            # If this user has a parent, they must be higher than
-            # this instance by default
-            if root_user._parent:
-                assert root_user.parent
-                root_user = root_user.parent
+        store = self._store
+        index = store.index_of(self.id)
+        if index is None:
+            return 1
+        return store.generations.generation_count(index)
 
-            # If they have any partners, one of THEM could have a parent
-            elif root_user._partners:
+    @property
+    def statistics(self) -> FamilyStatistics:
+        """
+        The statistics for this user's family.
+        """
 
-                # Have to iterate through them to get the cached values
-                for p in root_user.partners:
+        return FamilyStatistics.get(self._graph, self.id)
 
-                    # See if a partner has a parent
-                    if p._parent:
-                        assert p.parent
-                        root_user = p.parent
-                        break
+    def _get_relation_links(self) -> relation_engine.RelationLinks:
+        """
+        Gets a function that gives the parent, partners, and children of
+        a user in this user's guild, for the relation engine to search.
+        """
 
-            # If this user has no parents or partners, they must be the
-            # top of our tree
-            else:
-                return root_user
+        store = self._store
+
+        def get_links(user_id: int) -> Tuple[Optional[int], Iterable[int], Iterable[int]]:
+            return (
+                store.get_parent(user_id),
+                sorted(store.get_partners(user_id)),
+                sorted(store.get_children(user_id)),
+            )
+        return get_links
+
+    def get_relation_path(
+            self,
+            target_user: FamilyTreeMember) -> Optional[Tuple[int, ...]]:
+        """
+        Gets the shortest path of relation tokens from this user to another.
+
+        Parameters
+        ----------
+        target_user : FamilyTreeMember
+            The user who you want to find the path to.
+
+        Returns
+        -------
+        Optional[Tuple[int, ...]]
+            The relation tokens (see ``relation_engine``), or ``None`` if the
+            users aren't related.
+        """
+
+        if self == target_user:
+            return ()
+        store = self._store
+        if not store.components.same_component(store.index_of(self.id), store.index_of(target_user.id)):
+            return None
+        get_links = self._get_relation_links()
+        if store.has_one_way:
+
+            # Searching back from the target only works if every relation
+            # is stored on both sides, so search out from this user alone
+            return relation_engine.find_relation_paths(self.id, get_links).get(target_user.id)
+        return relation_engine.find_relation_path(
+            self.id,
+            target_user.id,
+            get_links,
+        )
 
     def get_unshortened_relation(
             self,
-            target_user: FamilyTreeMember,
-            working_relation: Union[List[str], None] = None,
-            added_already: Union[Set[int], None] = None) -> Optional[str]:
+            target_user: FamilyTreeMember) -> Optional[str]:
         """
         Gets your relation to the other given user.
 
-        Args:
-            target_user (FamilyTreeMember): The user who you want to list the relation to.
-            working_relation (list, optional): The list of relation steps it's taking to get.
-            added_already (list, optional): So we can keep track of who's been looked at before.
+        Parameters
+        ----------
+        target_user : FamilyTreeMember
+            The user who you want to list the relation to.
+
+        Returns
+        -------
+        Optional[str]
+            The unshortened family tree relationship string, following the
+            shortest path between the two users.
+        """
+
+        path = self.get_relation_path(target_user)
+        if path is None:
+            return None
+        return relation_engine.path_to_string(path)
+
+    def get_relation_paths(self) -> Dict[int, Tuple[int, ...]]:
+        """
+        Gets the shortest path of relation tokens from this user to everyone
+        they're related to, in a single search of the family.
+
+        Returns
+        -------
+        Dict[int, Tuple[int, ...]]
+            The relation tokens (see ``relation_engine``) to each user,
+            keyed by user ID, closest first. This user is included with an
+            empty path.
+        """
+
+        return relation_engine.find_relation_paths(self.id, self._get_relation_links())
 
-        Returns:
-            Optional[str]: The family tree relationship string.
+    def get_all_relations(self) -> Dict[int, str]:
         """
+        Gets this user's relation to everyone they're related to, in a
+        single search of the family.
 
-        # Set default values
-        if working_relation is None:
-            working_relation = []
-        if added_already is None:
-            added_already = set()
+        Where someone can be reached by more than one equally short path,
+        this may describe them differently to :meth:`get_relation`.
 
-        # You're doing a loop - return None
-        if self.id in added_already:
+        Returns
+        -------
+        Dict[int, str]
+            The family tree relationship string for each user, keyed by
+            user ID, closest first. This user isn't included.
+        """
+
+        return {
+            user_id: Simplifier.simplify_path(path)
+            for user_id, path in self.get_relation_paths().items()
+            if user_id != self.id
+        }
+
+    def get_blood_relation_path(
+            self,
+            target_user: FamilyTreeMember) -> Optional[Tuple[int, ...]]:
+        """
+        Gets the path from this user up to the closest ancestor that they
+        share with another user, and back down to that user. This is looked
+        up from the guild's ancestor index rather than by searching the tree.
+
+        Parameters
+        ----------
+        target_user : FamilyTreeMember
+            The user who you want to find the blood relation to.
+
+        Returns
+        -------
+        Optional[Tuple[int, ...]]
+            The relation tokens (see ``relation_engine``), or ``None`` if the
+            users don't share an ancestor.
+        """
+
+        if self == target_user:
+            return ()
+        store = self._store
+        a, b = store.index_of(self.id), store.index_of(target_user.id)
+        if a is None or b is None:
             return None
+        distance = store.ancestors.blood_distance(a, b)
+        if distance is None:
+            return None
+        up, down = distance
+        return (relation_engine.PARENT,) * up + (relation_engine.CHILD,) * down
 
-        # We hit the jackpot - return the made up string
-        if target_user.id == self.id:
-            ret_string = "'s ".join(working_relation)
-            return ret_string
-
-        # Add self to list of checked people
-        added_already.add(self.id)
-
-        # Check parent
-        if self._parent and self._parent not in added_already:
-            parent = self.parent
-            assert parent
-            x = parent.get_unshortened_relation(
-                target_user,
-                working_relation=working_relation + ['parent'],
-                added_already=added_already
-            )
-            if x:
-                return x
-
-        # Check partner
-        for i in [o for o in self.partners if o.id not in added_already]:
-            x = i.get_unshortened_relation(
-                target_user,
-                working_relation=working_relation + ['partner'],
-                added_already=added_already
-            )
-            if x:
-                return x
-
-        # Check children
-        for i in [o for o in self.children if o.id not in added_already]:
-            x = i.get_unshortened_relation(
-                target_user,
-                working_relation=working_relation + ['child'],
-                added_already=added_already
-            )
-            if x:
-                return x
+    def get_blood_relation(self, target_user: FamilyTreeMember) -> Optional[str]:
+        """
+        Gets how this user is related to another by blood (eg "cousin"),
+        ignoring any relation through marriage.
 
-        return None
+        Parameters
+        ----------
+        target_user : FamilyTreeMember
+            The user who we want to get the blood relation to.
+
+        Returns
+        -------
+        Optional[str]
+            The family tree relationship string, or ``None`` if the users
+            aren't related by blood.
+        """
+
+        path = self.get_blood_relation_path(target_user)
+        if path is None:
+            return None
+        return Simplifier.simplify_path(path)
 
     def generational_span(
             self,
-            people_dict: Union[Dict[int, List[FamilyTreeMember]], None] = None,
-            depth: int = 0,
             add_parent: bool = False,
             add_partners: bool = True,
             expand_upwards: bool = False,
-            all_people: Union[set, None] = None,
-            recursive_depth: int = 0) -> Dict[int, List[FamilyTreeMember]]:
+            max_generations: Optional[int] = None) -> Dict[int, List[FamilyTreeMember]]:
         """
         Gets a list of every user related to this one.
         If "add_parent" and "expand_upwards" are True, then it
@@ -591,22 +958,16 @@ class FamilyTreeMember:
 
         Parameters
         ----------
-        people_dict : Union[dict, None], optional
-            The dict of users who are currently in the tree
-            (so as to avoid recursion).
-        depth : int, optional
-            The current generation of the tree span.
         add_parent : bool, optional
             Whether or not to add the parent of this user to the
             people list.
+        add_partners : bool, optional
+            Whether or not to add the partners of this user.
         expand_upwards : bool, optional
             Whether or not to expand upwards in the tree.
-        all_people : Union[set, None], optional
-            A set of all people who this recursive function would
-            look at.
-        recursive_depth : int, optional
-            How far into the recursion you have gone - this is so we
-            don't get recursion errors.
+        max_generations : Optional[int], optional
+            How many generations above or below this user to go.
+            Everyone is added if this isn't given.
 
         Returns
         -------
@@ -614,67 +975,47 @@ class FamilyTreeMember:
             A dictionary of each generation of users.
         """
 
-        # Don't add yourself again
-        if people_dict is None:
-            people_dict = {}
-        if all_people is None:
-            all_people = set()
-        if self.id in all_people:
-            return people_dict
-        if recursive_depth >= 500:
-            return people_dict
-        all_people.add(self.id)
-
-        # Add to dict
-        x = people_dict.setdefault(depth, list())
-        x.append(self)
-
-        # Add your children
-        for child in self.children:
-            people_dict = child.generational_span(
-                people_dict,
-                depth=depth + 1,
-                add_parent=False,
-                add_partners=True,
+        graph = self._graph
+        store = graph.store
+        start = store.index_of(self.id)
+        if start is None:
+            return {0: [self]}
+        if max_generations is None:
+            generations = store.generations.generational_span(
+                start,
+                graph.visited_buffer(),
+                add_parent=add_parent,
+                add_partners=add_partners,
                 expand_upwards=expand_upwards,
-                all_people=all_people,
-                recursive_depth=recursive_depth + 1,
             )
-
-        # Add your partner
-        if add_partners:
-            for partner in self.partners:
-                people_dict = partner.generational_span(
-                    people_dict,
-                    depth=depth,
-                    add_parent=True,
-                    add_partners=False,
-                    expand_upwards=expand_upwards,
-                    all_people=all_people,
-                    recursive_depth=recursive_depth + 1,
-                )
-
-        # Add your parent
-        if expand_upwards and add_parent and self._parent:
-            parent = self.parent
-            assert parent
-            people_dict = parent.generational_span(
-                people_dict,
-                depth=depth - 1,
-                add_parent=True,
-                add_partners=True,
+        else:
+            generations = family_traversal.generational_span_indexes(
+                store,
+                start,
+                graph.visited_buffer(),
+                add_parent=add_parent,
+                add_partners=add_partners,
                 expand_upwards=expand_upwards,
-                all_people=all_people,
-                recursive_depth=recursive_depth + 1,
+                max_generations=max_generations,
             )
+        return {
+            depth: [self._view(store.snowflake(i)) for i in indexes]
+            for depth, indexes in generations.items()
+        }
 
-        # Remove dupes, should they be in there
-        return people_dict
+    def freeze(self) -> FrozenFamily:
+        """
+        Gets an immutable copy of this user's family, which won't change
+        if the live family does.
+        """
+
+        return FrozenFamily.freeze(self._graph, self.id)
 
     async def to_dot_script(
             self,
             bot: types.Bot,
-            customised_tree_user: CustomisedTreeUser) -> str:
+            customised_tree_user: CustomisedTreeUser,
+            depth: Optional[int] = None) -> str:
         """
         Gives you a string of the current family tree that will go through DOT.
 
@@ -685,6 +1026,10 @@ class FamilyTreeMember:
         customised_tree_user : CustomisedTreeUser
             The customised tree object that should be used to alter how the
             dot script looks.
+        depth : Optional[int], optional
+            If given, only people this many generations above or below this
+            user (and their partners) are included, rather than the whole
+            tree from its root.
 
         Returns
         -------
@@ -692,14 +1037,18 @@ class FamilyTreeMember:
             The generated DOT code.
         """
 
-        root_user = self.get_root()
-        gen_span = root_user.generational_span()
-        return await self.to_dot_script_from_generational_span(bot, gen_span, customised_tree_user)
+        family = self.freeze()
+        gen_span = await self._tree_span(family, full=False, depth=depth)
+        return await self.to_dot_script_from_generational_span(
+            bot, family, gen_span, customised_tree_user,
+            partial=depth is not None,
+        )
 
     async def to_full_dot_script(
             self,
             bot: types.Bot,
-            customised_tree_user: CustomisedTreeUser) -> str:
+            customised_tree_user: CustomisedTreeUser,
+            depth: Optional[int] = None) -> str:
         """
         Gives you the string of the FULL current family.
 
@@ -710,6 +1059,9 @@ class FamilyTreeMember:
         customised_tree_user : CustomisedTreeUser
             The customised tree object that should be used to alter how the
             dot script looks.
+        depth : Optional[int], optional
+            If given, only people this many generations above or below this
+            user are included, rather than the whole family.
 
         Returns
         -------
@@ -717,9 +1069,32 @@ class FamilyTreeMember:
             The generated DOT code.
         """
 
-        root_user = self.get_root()
-        gen_span = root_user.generational_span(expand_upwards=True, add_parent=True)
-        return await self.to_dot_script_from_generational_span(bot, gen_span, customised_tree_user)
+        family = self.freeze()
+        gen_span = await self._tree_span(family, full=True, depth=depth)
+        return await self.to_dot_script_from_generational_span(
+            bot, family, gen_span, customised_tree_user,
+            partial=depth is not None,
+        )
+
+    async def _tree_span(
+            self,
+            family: FrozenFamily,
+            *,
+            full: bool,
+            depth: Optional[int]) -> Dict[int, Tuple[int, ...]]:
+        """
+        Get the span for this user's tree, working it out in a
+        :class:`FamilyWorkerPool` process if the family's big enough.
+        """
+
+        gen_span = family.cached_tree_span(self.id, full=full, depth=depth)
+        if gen_span is None:
+            gen_span = await FamilyWorkerPool.run_sized(
+                len(family), family.tree_span, self.id,
+                full=full, depth=depth,
+            )
+            family.remember_tree_span(self.id, gen_span, full=full, depth=depth)
+        return gen_span
 
     def to_graphviz_label(
             self,
@@ -729,32 +1104,59 @@ class FamilyTreeMember:
         Convert the current family tree member into a label applicable for Graphviz.
         """
 
+        return self.graphviz_label(
+            self.id, name,
+            customised_tree_user.hex if customised_tree_user else None,
+        )
+
+    @staticmethod
+    def graphviz_label(
+            user_id: int,
+            name: str,
+            colours: Optional[Dict[str, str]] = None) -> str:
+        """
+        Make the Graphviz label for a user, highlighted with the given
+        colours if there are any.
+        """
+
         # Generate dot for both ourselves and others
-        if customised_tree_user:
+        if colours:
             return (
-                f'{self.id}[label="{name}",'
-                f'fillcolor={customised_tree_user.hex["highlighted_node"]},'
-                f'fontcolor={customised_tree_user.hex["highlighted_font"]}];'
+                f'{user_id}[label="{name}",'
+                f'fillcolor={colours["highlighted_node"]},'
+                f'fontcolor={colours["highlighted_font"]}];'
             )
-        return f'{self.id}[label="{name}"];'
+        return f'{user_id}[label="{name}"];'
 
     async def to_dot_script_from_generational_span(
             self,
             bot: types.Bot,
-            gen_span: Dict[int, List[FamilyTreeMember]],
-            customised_tree_user: CustomisedTreeUser) -> str:
+            family: FrozenFamily,
+            gen_span: Dict[int, Tuple[int, ...]],
+            customised_tree_user: CustomisedTreeUser,
+            *,
+            partial: bool = False) -> str:
         """
-        Generates the DOT script from a given generational span.
+        Generates the DOT script from a given generational span. All of the
+        names are fetched before any of the script is built, so nothing
+        else is awaited partway through reading the family. Families of at
+        least :attr:`FamilyWorkerPool.threshold` members are worked on in
+        a worker process, off the event loop.
 
         Parameters
         ----------
         bot : types.Bot
             The bot instance that should be used to get the names of users.
-        gen_span : Dict[int, List[FamilyTreeMember]]
-            The generational span.
+        family : FrozenFamily
+            The frozen family that the span was taken from.
+        gen_span : Dict[int, Tuple[int, ...]]
+            The generational span, as user IDs.
         customised_tree_user : CustomisedTreeUser
             The customised tree object that should be used to alter how the
             dot script looks.
+        partial : bool, optional
+            Whether the span leaves out some of the family, so that lines
+            are only drawn to children who are in it.
 
         Returns
         -------
@@ -762,58 +1164,85 @@ class FamilyTreeMember:
             The generated DOT code.
         """
 
-        # Find my own depth
-        my_depth: int = 0
-        for depth, depth_list in gen_span.items():
-            if self in depth_list:
-                my_depth = depth
-                break
+        # Everyone who could be drawn is in the span (once my partners and
+        # parent are added to it), or a partner (or a partner's partner) of
+        # someone in it
+        size = len(family)
+        names: Dict[int, str] = {}
+        for i in await FamilyWorkerPool.run_sized(size, family.drawn_members, gen_span, self.id):
+            names[i] = await DiscordNameManager.fetch_name_by_id(bot, i)
+
+        # Big families are built in a worker process
+        return await FamilyWorkerPool.run_sized(
+            size, self.dot_script, self.id, family, gen_span, names,
+            customised_tree_user.hex, partial=partial,
+        )
 
-        # Add my partner and parent
-        for partner in self.partners:
-            if partner not in (x := gen_span.get(my_depth, [])):
-                x.append(partner)
-                gen_span[my_depth] = x
-        if (parent := self.parent):
-            if parent not in (x := gen_span.get(my_depth - 1, [])):
-                x.append(parent)
-                gen_span[my_depth - 1] = x
+    @staticmethod
+    def dot_script(
+            user_id: int,
+            family: FrozenFamily,
+            gen_span: Dict[int, Tuple[int, ...]],
+            names: Dict[int, str],
+            colours: Dict[str, str],
+            *,
+            partial: bool = False) -> str:
+        """
+        Builds the DOT script for a generational span, as seen by a given
+        user. This is a staticmethod that only reads from what it's given,
+        so it can be sent to a :class:`FamilyWorkerPool` process.
 
-        # Long var names suck
-        ctu = customised_tree_user
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user that the tree is being drawn for.
+        family : FrozenFamily
+            The frozen family that the span was taken from.
+        gen_span : Dict[int, Tuple[int, ...]]
+            The generational span, as user IDs.
+        names : Dict[int, str]
+            The name of everyone in the span, and of their partners.
+        colours : Dict[str, str]
+            The Graphviz colours to use, from :attr:`CustomisedTreeUser.hex`.
+        partial : bool, optional
+            Whether the span leaves out some of the family, so that lines
+            are only drawn to children who are in it.
 
-        # Make some initial digraph stuff
-        all_text: str = (
-            "digraph {"
-            f"node [shape=box,fontcolor={ctu.hex['font']},"
-            f"color={ctu.hex['edge']},"
-            f"fillcolor={ctu.hex['node']},style=filled];"
-            f"edge [dir=none,color={ctu.hex['edge']}];"
-            f"bgcolor={ctu.hex['background']};"
-            f"rankdir={ctu.hex['direction']};"
-        )
+        Returns
+        -------
+        str
+            The generated DOT code.
+        """
 
-        # The ordered list of generation numbers -
-        # just a list of sequential numbers
-        # Done so we can make sure we have each generation in the
-        # right order
-        generation_numbers: List[int] = sorted(list(gen_span.keys()))
+        # Add my partner and parent, leaving the given span alone
+        span = family.viewer_span(user_id, gen_span)
 
-        # Go through the members for each generation
-        for generation_number in generation_numbers:
-            if (generation := gen_span.get(generation_number)) is None:
-                continue
+        # Only draw lines to children who are in the span if it's been cut
+        # short, since it'll have left some out
+        in_span: Optional[Set[int]] = None
+        if partial:
+            in_span = {i for generation in span.values() for i in generation}
+
+        # Make some initial digraph stuff
+        all_text: List[str] = [(
+            "digraph {"
+            f"node [shape=box,fontcolor={colours['font']},"
+            f"color={colours['edge']},"
+            f"fillcolor={colours['node']},style=filled];"
+            f"edge [dir=none,color={colours['edge']}];"
+            f"bgcolor={colours['background']};"
+            f"rankdir={colours['direction']};"
+        )]
+        drawn: Set[str] = set()
+
+        # Go through the members for each generation, in order
+        for generation_number in sorted(span):
+            generation = span[generation_number]
 
             # Make sure you don't add a spouse twice (as they will
             # be added both by the partner loop and they'll be in the
             # generation list)
-            added_already: List[FamilyTreeMember] = []
-
-            # # Add a ranking for this generation; only necessary if this
-            # # if our first runthrough (the child adding section adds this
-            # # on subsequent loops)
-            # all_text += "{rank=same;"
-
+            added_already: Set[int] = set()
 
             # Go through each person in the generation
             for person in generation:
@@ -821,69 +1250,48 @@ class FamilyTreeMember:
                 # Don't add a person twice
                 if person in added_already:
                     continue
-                added_already.append(person)
-
-                # Work out who the user's partners are
-                previous_partner = None
-                filtered_possible_partners = [*person.partners]
-                for p in filtered_possible_partners.copy():
-                    filtered_possible_partners.extend(p.partners)
-                filtered_possible_partners = [*list(set(filtered_possible_partners))]
-                try:
-                    filtered_possible_partners.remove(person)
-                except ValueError:
-                    pass
-                filtered_possible_partners.insert(0, person)
+                added_already.add(person)
 
                 # Add the user's partners
-                all_text += f"subgraph cluster{get_cluster_name()}{{peripheries=0;{{rank=same;"
-                for partner in filtered_possible_partners:
-                    name = (
-                        (
-                            await DiscordNameManager
-                            .fetch_name_by_id(bot, partner.id)
-                        )
-                        .replace('"', '\\"')
-                    )
-                    if partner == self:
-                        all_text += partner.to_graphviz_label(name, ctu)
+                previous_partner = None
+                all_text.append(f"subgraph cluster{get_cluster_name()}{{peripheries=0;{{rank=same;")
+                for partner in family.partner_cluster(person):
+                    name = names[partner].replace('"', '\\"')
+                    if partner == user_id:
+                        all_text.append(FamilyTreeMember.graphviz_label(partner, name, colours))
                     else:
-                        all_text += partner.to_graphviz_label(name)
+                        all_text.append(FamilyTreeMember.graphviz_label(partner, name))
                     if previous_partner is None:
                         previous_partner = partner
                         continue
-                    partner_link = f"{previous_partner.id} -> {partner.id};"
-                    alt_partner_link = f"{partner.id} -> {previous_partner.id};"
+                    partner_link = f"{previous_partner} -> {partner};"
+                    alt_partner_link = f"{partner} -> {previous_partner};"
                     if (
-                            partner_link not in all_text
-                            and alt_partner_link not in all_text
+                            partner_link not in drawn
+                            and alt_partner_link not in drawn
                             and partner != previous_partner):
-                        all_text += partner_link
-                    added_already.append(partner)
+                        all_text.append(partner_link)
+                        drawn.add(partner_link)
+                    added_already.add(partner)
                     previous_partner = partner
-                all_text += "}" + "}"
-
-            # # Close off the generation and open a new ranking for
-            # # adding children links
-            # all_text += "}"
+                all_text.append("}" + "}")
 
             # Go through the people in the generation and see if they have
             # any children to add
             for person in generation:
-                if person._children:
-                    all_text += f"p{person.id} {self.INVISIBLE};"
+                if any(in_span is None or i in in_span for i in family.get_children(person)):
+                    all_text.append(f"p{person} {FamilyTreeMember.INVISIBLE};")
 
             # Add the lines from parent to node to child
             for person in generation:
-                if person._children:
-                    new_text = f"{person.id}:s -> p{person.id}:c;"
-                    if new_text not in all_text:
-                        all_text += new_text
-                for child in person.children:
-                    new_text = f"p{person.id}:c -> {child.id}:n;"
-                    if new_text not in all_text:
-                        all_text += new_text
+                children = [i for i in family.get_children(person) if in_span is None or i in in_span]
+                new_lines = [f"{person}:s -> p{person}:c;"] if children else []
+                new_lines.extend(f"p{person}:c -> {child}:n;" for child in children if child != person)
+                for new_text in new_lines:
+                    if new_text not in drawn:
+                        all_text.append(new_text)
+                        drawn.add(new_text)
 
         # And we're done!
-        all_text += "}"
-        return all_text
+        all_text.append("}")
+        return "".join(all_text)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import multiprocessing
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    TypeVar,
+)
+
+
+__all__ = (
+    'FamilyWorkerPool',
+)
+
+
+T = TypeVar("T")
+
+
+class FamilyWorkerPool:
+    """
+    A pool of worker processes that heavy family work (tree spans, DOT
+    scripts, analytics) is handed off to, so that it doesn't hold up the
+    event loop - and with it the shard's heartbeat and every other
+    command - while it runs.
+
+    Work is sent over as a :class:`FrozenFamily` (or exported arrays), and
+    anything given to :meth:`run` has to be picklable, so it should be a
+    module-level function, a classmethod or staticmethod, or a method of
+    something picklable. There's one pool per process, so everything here
+    is held on the class.
+
+    If no pool has been started then nothing is offloaded by size, and
+    :meth:`run` uses the event loop's default thread pool instead.
+    """
+
+    executor: Optional[ProcessPoolExecutor] = None
+    processes: int = 0
+
+    # The fewest members a family needs before working on it is sent to
+    # the pool, rather than being done on the event loop
+    threshold: int = 2_000
+
+    @classmethod
+    def start(cls, processes: int, threshold: Optional[int] = None) -> None:
+        """
+        Start the pool, replacing any that's already running.
+
+        Parameters
+        ----------
+        processes : int
+            How many worker processes to run. Nothing is started if this
+            is 0.
+        threshold : Optional[int], optional
+            The fewest members a family needs before it's sent to the
+            pool. The current threshold is kept if not given.
+        """
+
+        cls.stop()
+        if threshold is not None:
+            cls.threshold = threshold
+        cls.processes = processes
+        if processes <= 0:
+            return
+
+        # The workers are spawned rather than forked - forking a process
+        # that's running an event loop and a gateway connection copies all
+        # of that (and any held locks) into the children
+        cls.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Shut down the pool, if there is one. Anything still running in it
+        is left to finish.
+        """
+
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+        cls.executor = None
+
+    @classmethod
+    def should_offload(cls, size: int) -> bool:
+        """
+        Whether work on a family of the given size should be sent to the
+        pool.
+        """
+
+        return cls.executor is not None and size >= cls.threshold
+
+    @classmethod
+    async def run(cls, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a function in the pool, or in the default thread pool if
+        there isn't one.
+
+        If a worker dies (and so breaks the pool), the pool is restarted
+        and the function is run in a thread instead, so that the caller
+        still gets their result.
+        """
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        executor = cls.executor
+        if executor is None:
+            return await loop.run_in_executor(None, call)
+        try:
+            return await loop.run_in_executor(executor, call)
+        except BrokenProcessPool:
+            if cls.executor is executor:
+                cls.start(cls.processes)
+            return await loop.run_in_executor(None, call)
+
+    @classmethod
+    async def run_sized(cls, size: int, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a function in the pool if the family it's working on is at
+        least :attr:`threshold` members, or just call it here otherwise.
+        """
+
+        if cls.should_offload(size):
+            return await cls.run(func, *args, **kwargs)
+        return func(*args, **kwargs)
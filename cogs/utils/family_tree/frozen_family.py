@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+from typing import (
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from cogs.utils.family_tree import family_traversal
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_name_index import FamilyNameIndex
+from cogs.utils.family_tree.relation_cache import RelationCache
+
+
+__all__ = (
+    'FrozenFamily',
+)
+
+
+class FrozenFamily:
+    """
+    An immutable copy of a single family (connected component), taken from
+    a :class:`FamilyGraph` at one point in time.
+
+    Everything is held in tuples, so a frozen family can be read across
+    awaits, or handed to another thread or process, without any locking -
+    changes to the live graph never show up in it. Freezing the same
+    family again before anyone in it has changed gives back the same
+    object, so it's only copied once per change - and since nothing in it
+    can change, the roots, spans and partner clusters worked out from it
+    are kept on it too, so that drawing the same unchanged family again
+    (from any of its members) doesn't walk it again.
+
+    Members are given their own dense indexes (in snowflake order), and
+    the family can be walked with the same functions as a
+    :class:`FamilyStore`.
+    """
+
+    cache = RelationCache(maxsize=256)
+
+    __slots__ = (
+        'guild_id',
+        'members',
+        '_indexes',
+        '_parents',
+        '_children',
+        '_partners',
+        '_roots',
+        '_spans',
+        '_clusters',
+        '_name_index',
+    )
+
+    def __init__(
+            self,
+            guild_id: int,
+            members: Tuple[int, ...],
+            parents: Tuple[int, ...],
+            children: Tuple[Tuple[int, ...], ...],
+            partners: Tuple[Tuple[int, ...], ...]):
+        self.guild_id: int = guild_id
+        self.members: Tuple[int, ...] = members
+        self._indexes: Dict[int, int] = {o: i for i, o in enumerate(members)}
+        self._parents = parents
+        self._children = children
+        self._partners = partners
+        self._roots: Dict[int, int] = {}
+        self._spans: Dict[Hashable, Dict[int, Tuple[int, ...]]] = {}
+        self._clusters: Dict[int, Tuple[int, ...]] = {}
+        self._name_index: Optional[FamilyNameIndex] = None
+
+    def __reduce__(self):
+        # Only the family itself is sent to other processes, not everything
+        # that's been worked out from it
+        return (
+            self.__class__,
+            (self.guild_id, self.members, self._parents, self._children, self._partners,),
+        )
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._indexes
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.members)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(guild_id={self.guild_id!r}, members={len(self)})"
+
+    @classmethod
+    def freeze(cls, graph: FamilyGraph, user_id: int) -> FrozenFamily:
+        """
+        Get a frozen copy of the family that a user is in.
+
+        Parameters
+        ----------
+        graph : FamilyGraph
+            The graph to copy the family from.
+        user_id : int
+            The ID of any member of the family.
+
+        Returns
+        -------
+        FrozenFamily
+            The frozen family. This may be shared with anyone else who
+            froze the same family since it last changed.
+        """
+
+        store = graph.store
+        components = store.components
+        start = store.index_of(user_id)
+        label = components.component_id(start)
+        if start is None or label is None:
+            return cls(graph.guild_id, (user_id,), (-1,), ((),), ((),))
+
+        # See if we've got a copy from since it last changed
+        key = (graph.guild_id, label,)
+        token = (graph.serial, components.epoch(label),)
+        found, family = cls.cache.get(key, token)
+        if found:
+            return family
+
+        # Copy the rows over, renumbered - keeping the members in snowflake
+        # order means that the rows stay in snowflake order too
+        snowflake = store.snowflake
+        indexes = sorted(components.component_members(start), key=snowflake)
+        renumbered = {o: i for i, o in enumerate(indexes)}
+        family = cls(
+            graph.guild_id,
+            tuple(snowflake(i) for i in indexes),
+            tuple(renumbered.get(store.parent_index(i), -1) for i in indexes),
+            tuple(tuple(renumbered[o] for o in store.child_indexes(i)) for i in indexes),
+            tuple(tuple(renumbered[o] for o in store.partner_indexes(i)) for i in indexes),
+        )
+        cls.cache.put(key, token, family)
+        return family
+
+    @property
+    def name_index(self) -> FamilyNameIndex:
+        """
+        An index of the cached names of everyone in the family, built the
+        first time that it's used.
+        """
+
+        if self._name_index is None:
+            self._name_index = FamilyNameIndex(self.members)
+        return self._name_index
+
+    # Reading by index, so that the family can be walked in the same way as
+    # a store
+
+    def index_of(self, user_id: int) -> Optional[int]:
+        """
+        Get the index of a given user in the family, or ``None`` if they're
+        not in it.
+        """
+
+        return self._indexes.get(user_id)
+
+    def snowflake(self, index: int) -> int:
+        """
+        Get the user ID for a given index.
+        """
+
+        return self.members[index]
+
+    def parent_index(self, index: int) -> int:
+        """
+        Get the index of a user's parent, or -1 if they have none.
+        """
+
+        return self._parents[index]
+
+    def child_indexes(self, index: int) -> Tuple[int, ...]:
+        """
+        Get the indexes of a user's children, in snowflake order.
+        """
+
+        return self._children[index]
+
+    def partner_indexes(self, index: int) -> Tuple[int, ...]:
+        """
+        Get the indexes of a user's partners, in snowflake order.
+        """
+
+        return self._partners[index]
+
+    # Reading by user ID
+
+    def get_parent(self, user_id: int) -> Optional[int]:
+        """
+        Get the ID of a user's parent.
+        """
+
+        index = self._indexes.get(user_id)
+        if index is None or self._parents[index] < 0:
+            return None
+        return self.members[self._parents[index]]
+
+    def get_children(self, user_id: int) -> Tuple[int, ...]:
+        """
+        Get the IDs of a user's children, in snowflake order.
+        """
+
+        index = self._indexes.get(user_id)
+        if index is None:
+            return ()
+        members = self.members
+        return tuple(members[i] for i in self._children[index])
+
+    def get_partners(self, user_id: int) -> Tuple[int, ...]:
+        """
+        Get the IDs of a user's partners, in snowflake order.
+        """
+
+        index = self._indexes.get(user_id)
+        if index is None:
+            return ()
+        members = self.members
+        return tuple(members[i] for i in self._partners[index])
+
+    def get_root(self, user_id: int) -> int:
+        """
+        Get the ID of the user at the top of a given user's tree, following
+        the same rules as :meth:`FamilyTreeMember.get_root`.
+        """
+
+        root = self._roots.get(user_id)
+        if root is not None:
+            return root
+        index = self._indexes.get(user_id)
+        if index is None:
+            return user_id
+        root = self._roots[user_id] = self.members[family_traversal.root_index(self, index)]  # type: ignore
+        return root
+
+    def partner_cluster(self, user_id: int) -> Tuple[int, ...]:
+        """
+        Get the IDs of a user, their partners, and their partners'
+        partners, in the order that they're drawn next to each other in a
+        tree.
+        """
+
+        cluster = self._clusters.get(user_id)
+        if cluster is not None:
+            return cluster
+        partners = [i for i in self.get_partners(user_id) if i != user_id]
+        for p in partners.copy():
+            partners.extend(i for i in self.get_partners(p) if i != p)
+        cluster = self._clusters[user_id] = (
+            user_id,
+            *(i for i in dict.fromkeys(partners) if i != user_id),
+        )
+        return cluster
+
+    def viewer_span(
+            self,
+            user_id: int,
+            gen_span: Dict[int, Tuple[int, ...]]) -> Dict[int, Tuple[int, ...]]:
+        """
+        Get a span with a user's partners and parent added to it, as it's
+        drawn for that user. The given span is left alone. The partners
+        and parent may not be in the span already if the user is only
+        connected to its root through a partner's parents.
+        """
+
+        # Find my own depth
+        my_depth: int = 0
+        for depth, depth_list in gen_span.items():
+            if user_id in depth_list:
+                my_depth = depth
+                break
+
+        # Add my partner and parent
+        span: Dict[int, List[int]] = {depth: list(i) for depth, i in gen_span.items()}
+        for partner in self.get_partners(user_id):
+            if partner != user_id and partner not in (x := span.setdefault(my_depth, [])):
+                x.append(partner)
+        parent = self.get_parent(user_id)
+        if parent and parent != user_id:
+            if parent not in (x := span.setdefault(my_depth - 1, [])):
+                x.append(parent)
+        return {depth: tuple(i) for depth, i in span.items()}
+
+    def drawn_members(
+            self,
+            gen_span: Dict[int, Tuple[int, ...]],
+            user_id: Optional[int] = None) -> Tuple[int, ...]:
+        """
+        Get the IDs of everyone who's drawn in a tree of the given span -
+        everyone in it, and their partner clusters. If the tree is being
+        drawn for a user, their partners and parent (and their partner
+        clusters) are included too, as in :meth:`viewer_span`.
+        """
+
+        if user_id is not None:
+            gen_span = self.viewer_span(user_id, gen_span)
+        drawn: Dict[int, None] = {}
+        for generation in gen_span.values():
+            for person in generation:
+                drawn.update(dict.fromkeys(self.partner_cluster(person)))
+        return tuple(drawn)
+
+    def tree_span(
+            self,
+            user_id: int,
+            *,
+            full: bool = False,
+            depth: Optional[int] = None) -> Dict[int, Tuple[int, ...]]:
+        """
+        Get the span that's drawn for a user's tree - from the root of their
+        tree, or only the people within a given number of generations of
+        them. The returned dict is kept for next time, so it mustn't be
+        changed.
+
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user whose tree is being drawn.
+        full : bool, optional
+            Whether to include everyone in the family (as in a full tree),
+            rather than only their blood relatives and partners.
+        depth : Optional[int], optional
+            How many generations above or below the user to go.
+
+        Returns
+        -------
+        Dict[int, Tuple[int, ...]]
+            The IDs of each generation of members.
+        """
+
+        key = ('tree', user_id, full, depth,)
+        span = self._spans.get(key)
+        if span is not None:
+            return span
+        if depth is None:
+            root = self.get_root(user_id)
+            if full:
+                span = self.generational_span(root, expand_upwards=True, add_parent=True)
+            else:
+                span = self.generational_span(root)
+        elif full:
+            span = self.neighbourhood(user_id, generations=depth)
+        else:
+            span = self.neighbourhood(user_id, generations=depth, partner_hops=1)
+        self._spans[key] = span
+        return span
+
+    def cached_tree_span(
+            self,
+            user_id: int,
+            *,
+            full: bool = False,
+            depth: Optional[int] = None) -> Optional[Dict[int, Tuple[int, ...]]]:
+        """
+        Get a span from :meth:`tree_span` if it's already been worked out.
+        """
+
+        return self._spans.get(('tree', user_id, full, depth,))
+
+    def remember_tree_span(
+            self,
+            user_id: int,
+            span: Dict[int, Tuple[int, ...]],
+            *,
+            full: bool = False,
+            depth: Optional[int] = None) -> None:
+        """
+        Keep a span from :meth:`tree_span` that was worked out somewhere else
+        (eg in a :class:`FamilyWorkerPool` process, on a copy of this
+        family).
+        """
+
+        self._spans[('tree', user_id, full, depth,)] = span
+
+    def generational_span(
+            self,
+            user_id: int,
+            *,
+            add_parent: bool = False,
+            add_partners: bool = True,
+            expand_upwards: bool = False,
+            max_generations: Optional[int] = None) -> Dict[int, Tuple[int, ...]]:
+        """
+        Get the IDs of everyone related to a user, split up by generation,
+        in the same way as :meth:`FamilyTreeMember.generational_span`. The
+        returned dict is kept for next time, so it mustn't be changed.
+        """
+
+        key = ('span', user_id, add_parent, add_partners, expand_upwards, max_generations,)
+        span = self._spans.get(key)
+        if span is not None:
+            return span
+        index = self._indexes.get(user_id)
+        if index is None:
+            return {0: (user_id,)}
+        generations = family_traversal.generational_span_indexes(
+            self,  # type: ignore
+            index,
+            bytearray(len(self)),
+            add_parent=add_parent,
+            add_partners=add_partners,
+            expand_upwards=expand_upwards,
+            max_generations=max_generations,
+        )
+        members = self.members
+        span = self._spans[key] = {
+            depth: tuple(members[i] for i in indexes)
+            for depth, indexes in generations.items()
+        }
+        return span
+
+    def neighbourhood(
+            self,
+            user_id: int,
+            *,
+            generations: int,
+            partner_hops: Optional[int] = None) -> Dict[int, Tuple[int, ...]]:
+        """
+        Get the IDs of everyone within a few steps of a user, going up
+        through parents, down through children, and across through
+        partners. Only the people returned are walked over, so this stays
+        cheap however large the rest of the family is. The returned dict
+        is kept for next time, so it mustn't be changed.
+
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user to start from.
+        generations : int
+            How many generations above or below the user to go.
+        partner_hops : Optional[int], optional
+            How many marriages can be gone through to reach someone (eg 1
+            reaches the user's partner, and their partner's parents).
+            There's no limit if this isn't given.
+
+        Returns
+        -------
+        Dict[int, Tuple[int, ...]]
+            The IDs of each generation of members, keyed by generation
+            relative to the user.
+        """
+
+        key = ('neighbourhood', user_id, generations, partner_hops,)
+        span = self._spans.get(key)
+        if span is not None:
+            return span
+        index = self._indexes.get(user_id)
+        if index is None:
+            return {0: (user_id,)}
+        generations_found = family_traversal.neighbourhood_indexes(
+            self,  # type: ignore
+            index,
+            generations=generations,
+            partner_hops=partner_hops,
+        )
+        members = self.members
+        span = self._spans[key] = {
+            depth: tuple(members[i] for i in indexes)
+            for depth, indexes in generations_found.items()
+        }
+        return span
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from cogs.utils.family_tree import family_traversal
+
+if TYPE_CHECKING:
+    from cogs.utils.family_tree.family_store import FamilyStore
+
+
+__all__ = (
+    'GenerationIndex',
+)
+
+
+class _ComponentGenerations:
+    """
+    Everything we've worked out so far for a single family.
+    """
+
+    __slots__ = (
+        'roots',
+        'spans',
+        'generations',
+        'top',
+    )
+
+    def __init__(self):
+        self.roots: Dict[int, int] = {}
+        self.spans: Dict[Tuple[int, bool, bool, bool], Dict[int, List[int]]] = {}
+        self.generations: Optional[Dict[int, int]] = None
+        self.top: int = -1
+
+
+class GenerationIndex:
+    """
+    A cache of the roots, generational spans, and generation numbers of the
+    families in a :class:`FamilyStore`.
+
+    Everything is cached per family (connected component), and worked out
+    the first time that it's asked for. Whenever the store changes a
+    member's relations it invalidates the families of everyone involved,
+    so that anything not touched by the change is kept. That invalidation
+    has to happen before the component index relabels anyone, which the
+    store takes care of by doing it as it changes its rows.
+
+    Parameters
+    ----------
+    store : FamilyStore
+        The store that this indexes.
+    """
+
+    __slots__ = (
+        '_store',
+        '_components',
+    )
+
+    def __init__(self, store: FamilyStore):
+        self._store = store
+        self._components: Dict[int, _ComponentGenerations] = {}
+
+    def __len__(self) -> int:
+        return len(self._components)
+
+    def clear(self) -> None:
+        """
+        Remove everything from the cache.
+        """
+
+        self._components.clear()
+
+    def invalidate(self, node: int) -> None:
+        """
+        Drop everything that's cached for the given member's family.
+        """
+
+        label = self._store.components.component_id(node)
+        if label is not None:
+            self._components.pop(label, None)
+
+    def _component(self, node: int) -> Optional[_ComponentGenerations]:
+        label = self._store.components.component_id(node)
+        if label is None:
+            return None  # People with no family aren't worth caching
+        component = self._components.get(label)
+        if component is None:
+            component = self._components[label] = _ComponentGenerations()
+        return component
+
+    def root(self, node: int) -> int:
+        """
+        Get the member at the top of the given member's tree, following the
+        same rules as :meth:`FamilyTreeMember.get_root`.
+        """
+
+        component = self._component(node)
+        if component is None:
+            return node
+        root = component.roots.get(node)
+        if root is None:
+            root = component.roots[node] = family_traversal.root_index(self._store, node)
+        return root
+
+    def generational_span(
+            self,
+            node: int,
+            visited: bytearray,
+            *,
+            add_parent: bool = False,
+            add_partners: bool = True,
+            expand_upwards: bool = False) -> Dict[int, List[int]]:
+        """
+        Get the generational span from the given member. The returned dict
+        is shared with the cache, so it mustn't be changed.
+
+        Parameters
+        ----------
+        node : int
+            The index of the member to start from.
+        visited : bytearray
+            A zeroed buffer at least as long as the store.
+        add_parent : bool, optional
+            Whether or not to add the parent of the starting member.
+        add_partners : bool, optional
+            Whether or not to add the partners of the starting member.
+        expand_upwards : bool, optional
+            Whether or not to walk upwards through parents.
+
+        Returns
+        -------
+        Dict[int, List[int]]
+            The indexes of each generation of members.
+        """
+
+        component = self._component(node)
+        if component is None:
+            return {0: [node]}
+        key = (node, add_parent, add_partners, expand_upwards,)
+        span = component.spans.get(key)
+        if span is None:
+            span = component.spans[key] = family_traversal.generational_span_indexes(
+                self._store,
+                node,
+                visited,
+                add_parent=add_parent,
+                add_partners=add_partners,
+                expand_upwards=expand_upwards,
+            )
+        return span
+
+    def _family_generations(self, node: int) -> Tuple[Dict[int, int], int]:
+        """
+        Number every member of the given member's family by generation, so
+        that the top generation is 0, and pick the lowest snowflake from the
+        top generation as the family's root.
+        """
+
+        component = self._component(node)
+        if component is None:
+            return {node: 0}, node
+        if component.generations is not None:
+            return component.generations, component.top
+
+        # Start from the lowest snowflake in the family so that the numbering
+        # doesn't depend on who asked for it
+        store = self._store
+        members = store.components.component_members(node)
+        snowflake = store.snowflake
+        start = min(members, key=snowflake)
+
+        # Parents are a generation up, children a generation down, and
+        # partners are the same generation. Relations aren't always stored
+        # both ways round, so anyone we can't reach from the start gets
+        # numbered from themselves.
+        generations: Dict[int, int] = {}
+        for seed in (start, *members):
+            if seed in generations:
+                continue
+            generations[seed] = 0
+            queue = [seed]
+            for current in queue:
+                generation = generations[current]
+                steps = [(i, generation,) for i in store.partner_indexes(current)]
+                steps.extend((i, generation + 1,) for i in store.child_indexes(current))
+                parent = store.parent_index(current)
+                if parent >= 0:
+                    steps.append((parent, generation - 1,))
+                for i, i_generation in steps:
+                    if i not in generations:
+                        generations[i] = i_generation
+                        queue.append(i)
+
+        # Make the top generation 0
+        highest = min(generations.values())
+        for i in generations:
+            generations[i] -= highest
+        top = min((i for i, g in generations.items() if g == 0), key=snowflake)
+        component.generations, component.top = generations, top
+        return generations, top
+
+    def generation(self, node: int) -> int:
+        """
+        Get how many generations below the top of their family a member is.
+        """
+
+        return self._family_generations(node)[0][node]
+
+    def generation_count(self, node: int) -> int:
+        """
+        Get the number of generations in a member's family.
+        """
+
+        return max(self._family_generations(node)[0].values()) + 1
+
+    def generation_sizes(self, node: int) -> List[int]:
+        """
+        Get how many members are in each generation of a member's family,
+        from the top generation down.
+        """
+
+        generations = self._family_generations(node)[0]
+        sizes = [0] * (max(generations.values()) + 1)
+        for generation in generations.values():
+            sizes[generation] += 1
+        return sizes
+
+    def family_root(self, node: int) -> int:
+        """
+        Get the member at the top of a member's family - the one with the
+        lowest snowflake in the top generation.
+        """
+
+        return self._family_generations(node)[1]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Hashable,
+    Tuple,
+)
+
+
+__all__ = (
+    'RelationCache',
+)
+
+
+class RelationCache:
+    """
+    A bounded least-recently-used cache for relation results.
+
+    Each entry is stored along with a version token - something that
+    changes whenever the result might have - and is only given back if the
+    token it's looked up with matches. Entries with an old token are
+    dropped as they're found, and anything else falls off the end once the
+    cache is full.
+
+    Parameters
+    ----------
+    maxsize : int
+        The most entries to keep.
+    """
+
+    __slots__ = (
+        'maxsize',
+        'hits',
+        'misses',
+        '_entries',
+    )
+
+    def __init__(self, maxsize: int):
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[Hashable, Tuple[Hashable, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(size={len(self)}, maxsize={self.maxsize}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The proportion of lookups that were answered from the cache.
+        """
+
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def get(self, key: Hashable, token: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached result.
+
+        Parameters
+        ----------
+        key : Hashable
+            The key that the result was stored under.
+        token : Hashable
+            The current version token for the result.
+
+        Returns
+        -------
+        Tuple[bool, Any]
+            Whether the result was found, and the result.
+        """
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, token: Hashable, value: Any) -> None:
+        """
+        Store a result in the cache, dropping the least recently used entry
+        if it's full.
+        """
+
+        self._entries[key] = (token, value,)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache, and reset the counters.
+        """
+
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+__all__ = (
+    'PARENT',
+    'PARTNER',
+    'CHILD',
+    'TOKEN_NAMES',
+    'INVERSE_TOKENS',
+    'RelationLinks',
+    'find_relation_path',
+    'find_relation_paths',
+    'path_to_string',
+)
+
+
+# The edge tokens that make up a relation path. A path of
+# (PARENT, PARTNER) reads as "parent's partner".
+PARENT = 0
+PARTNER = 1
+CHILD = 2
+TOKEN_NAMES = ("parent", "partner", "child",)
+INVERSE_TOKENS = (CHILD, PARTNER, PARENT,)
+
+
+# A function that takes a user ID and gives back their parent ID, their
+# partner IDs, and their child IDs, in the order they should be searched.
+RelationLinks = Callable[
+    [int],
+    Tuple[Optional[int], Iterable[int], Iterable[int]],
+]
+
+
+def _steps(node: int, get_links: RelationLinks) -> List[Tuple[int, int]]:
+    """
+    Gets the (token, user ID) pairs that can be reached in one step from the
+    given user.
+    """
+
+    parent, partners, children = get_links(node)
+    steps: List[Tuple[int, int]] = []
+    if parent is not None and parent != node:
+        steps.append((PARENT, parent,))
+    steps.extend((PARTNER, i,) for i in partners if i != node)
+    steps.extend((CHILD, i,) for i in children if i != node)
+    return steps
+
+
+def find_relation_path(
+        source: int,
+        target: int,
+        get_links: RelationLinks) -> Optional[Tuple[int, ...]]:
+    """
+    Find the shortest relation path between two users.
+
+    This runs a breadth-first search from both ends at once, always growing
+    whichever frontier is smaller by one full generation, and stops once
+    the two searches meet. Paths are stored as predecessor links rather
+    than copied lists, and are only built once the shortest path is known.
+
+    The search from the target follows the target's own links backwards,
+    so every link has to be stored on both sides (if a user lists someone,
+    that person lists them back). Where that isn't promised, use
+    :func:`find_relation_paths` instead.
+
+    Parameters
+    ----------
+    source : int
+        The ID of the user to start from.
+    target : int
+        The ID of the user to find the relation to.
+    get_links : RelationLinks
+        A function giving the direct relations of a user.
+
+    Returns
+    -------
+    Optional[Tuple[int, ...]]
+        The tokens describing how to get from the source to the target, an
+        empty tuple if they're the same user, or ``None`` if they aren't
+        related at all.
+    """
+
+    if source == target:
+        return ()
+
+    # Each search maps a user to the user they were reached from, and the
+    # token of the edge between them (always read source -> target)
+    forward: Dict[int, Optional[Tuple[int, int]]] = {source: None}
+    backward: Dict[int, Optional[Tuple[int, int]]] = {target: None}
+    forward_depth: Dict[int, int] = {source: 0}
+    backward_depth: Dict[int, int] = {target: 0}
+    forward_frontier: List[int] = [source]
+    backward_frontier: List[int] = [target]
+
+    # Grow the searches a generation at a time
+    meeting: Optional[int] = None
+    while forward_frontier and backward_frontier and meeting is None:
+        expand_forward = len(forward_frontier) <= len(backward_frontier)
+        if expand_forward:
+            frontier, seen, depths = forward_frontier, forward, forward_depth
+            other_depths = backward_depth
+        else:
+            frontier, seen, depths = backward_frontier, backward, backward_depth
+            other_depths = forward_depth
+        best_length: Optional[int] = None
+        next_frontier: List[int] = []
+        for node in frontier:
+            depth = depths[node] + 1
+            for token, neighbour in _steps(node, get_links):
+                if neighbour in seen:
+                    continue
+                if expand_forward:
+                    seen[neighbour] = (node, token,)
+                else:
+                    seen[neighbour] = (node, INVERSE_TOKENS[token],)
+                depths[neighbour] = depth
+                next_frontier.append(neighbour)
+                if neighbour in other_depths:
+                    length = depth + other_depths[neighbour]
+                    if best_length is None or length < best_length:
+                        best_length = length
+                        meeting = neighbour
+        if expand_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    # They never met
+    if meeting is None:
+        return None
+
+    # Walk back to the source and forward to the target
+    path: List[int] = []
+    node = meeting
+    while (step := forward[node]) is not None:
+        node, token = step
+        path.append(token)
+    path.reverse()
+    node = meeting
+    while (step := backward[node]) is not None:
+        node, token = step
+        path.append(token)
+    return tuple(path)
+
+
+def find_relation_paths(
+        source: int,
+        get_links: RelationLinks) -> Dict[int, Tuple[int, ...]]:
+    """
+    Find the shortest relation path from one user to everyone that they're
+    related to, with a single breadth-first search.
+
+    Where there are several shortest paths to someone this keeps the first
+    one found, so it can pick a different (but equally short) path to
+    :func:`find_relation_path`.
+
+    Parameters
+    ----------
+    source : int
+        The ID of the user to start from.
+    get_links : RelationLinks
+        A function giving the direct relations of a user.
+
+    Returns
+    -------
+    Dict[int, Tuple[int, ...]]
+        The tokens describing how to get from the source to each user that
+        they're related to, keyed by user ID, in the order that they were
+        found (so closest first). The source is included with an empty
+        path.
+    """
+
+    paths: Dict[int, Tuple[int, ...]] = {source: ()}
+    queue: List[int] = [source]
+    for node in queue:
+        path = paths[node]
+        for token, neighbour in _steps(node, get_links):
+            if neighbour in paths:
+                continue
+            paths[neighbour] = path + (token,)
+            queue.append(neighbour)
+    return paths
+
+
+def path_to_string(path: Iterable[int]) -> str:
+    """
+    Convert a path of tokens into the unshortened relation string
+    (eg "parent's partner's child").
+    """
+
+    return "'s ".join([TOKEN_NAMES[i] for i in path])
@@ -1,5 +1,14 @@
+from typing import Optional, Tuple
+import functools
 import re
 
+from cogs.utils.family_tree.relation_engine import (
+    PARENT,
+    PARTNER,
+    CHILD,
+    path_to_string,
+)
+
 
 __all__ = (
     'RelationshipStringSimplifier',
@@ -109,16 +118,24 @@ class RelationshipStringSimplifier(object):
         return (cousin_string + times_removed).strip()
 
     @classmethod
-    def simplify(cls, string:str) -> str:
+    def reduce(cls, string: str) -> str:
         """
-        Runs the given input through the shortening operations a
-        number of times so as to shorten the input to a nice
-        family relationship string.
+        Runs the given input through the operations that cut out
+        reduncencies ("parent's partner" to "parent", etc).
         """
 
         for _ in range(5):
             for o in cls.pre_operations:
                 string = o(string)
+        return string
+
+    @classmethod
+    def finish(cls, string: str) -> str:
+        """
+        Runs a reduced input through the operations that turn it into
+        a nice family relationship string.
+        """
+
         string = cls.cousin_matcher.sub(cls.get_cousin_string, string)
         for o in cls.operations:
             string = o(string)
@@ -129,3 +146,69 @@ class RelationshipStringSimplifier(object):
         for o in cls.short_operations:
             string = o(string)
         return string
+
+    @classmethod
+    def simplify(cls, string: str) -> str:
+        """
+        Runs the given input through the shortening operations a
+        number of times so as to shorten the input to a nice
+        family relationship string.
+        """
+
+        return cls.finish(cls.reduce(string))
+
+    @staticmethod
+    def reduce_path(path: Tuple[int, ...]) -> Optional[Tuple[int, ...]]:
+        """
+        Does the same as :meth:`reduce`, but on a path of relation tokens
+        (see ``relation_engine``) rather than on a string.
+
+        Without a "child's parent" in the path the only reductions are
+        dropping partners after a parent or before a child, so each of the
+        five rounds is a single pass over the tokens. "child's parent" can
+        leave stray text behind when it's cut out of a string, so those
+        paths give ``None`` and should be reduced as a string instead.
+        """
+
+        for a, b in zip(path, path[1:]):
+            if a == CHILD and b == PARENT:
+                return None
+        tokens = list(path)
+        for _ in range(5):
+            changed = False
+            for first, second, keep in ((PARENT, PARTNER, PARENT,), (PARTNER, CHILD, CHILD,)):
+                output = []
+                i, length = 0, len(tokens)
+                while i < length:
+                    if tokens[i] == first and i + 1 < length and tokens[i + 1] == second:
+                        output.append(keep)
+                        i += 2
+                        changed = True
+                    else:
+                        output.append(tokens[i])
+                        i += 1
+                tokens = output
+            if not changed:
+                break
+        return tuple(tokens)
+
+    @classmethod
+    @functools.lru_cache(maxsize=16_384)
+    def _finish_cached(cls, string: str) -> str:
+        return cls.finish(string)
+
+    @classmethod
+    @functools.lru_cache(maxsize=65_536)
+    def simplify_path(cls, path: Tuple[int, ...]) -> str:
+        """
+        Gets the simplified relationship string for a path of relation
+        tokens (see ``relation_engine``). This gives the same output as
+        running the path's string through :meth:`simplify`, but the
+        reduction is done on the tokens, and results are cached for
+        both the path and the reduced string.
+        """
+
+        reduced = cls.reduce_path(path)
+        if reduced is None:
+            return cls._finish_cached(cls.reduce(path_to_string(path)))
+        return cls._finish_cached(path_to_string(reduced))
@@ -8,6 +8,8 @@ __all__ = (
     'ParentageDB',
     'MarriagesDB',
     'FamilyTreeMemberPayload',
+    'FamilyTreeMembersPayload',
+    'FamilyGraphReloadPayload',
     'GuildPrefixPayload',
     'FamilyMaxMembersPayload',
     'IncestAllowedPayload',
@@ -42,6 +44,15 @@ class FamilyTreeMemberPayload(TypedDict):
     guild_id: int
 
 
+class FamilyTreeMembersPayload(TypedDict):
+    guild_id: int
+    members: List[FamilyTreeMemberPayload]
+
+
+class FamilyGraphReloadPayload(TypedDict):
+    guild_id: int
+
+
 class GuildPrefixPayload(TypedDict):
     guild_id: int
     prefix: str
@@ -0,0 +1,54 @@
+import unittest
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+
+
+class AncestorIndexTests(unittest.TestCase):
+
+    guild_id = 18
+
+    def setUp(self):
+        # 1005 is 1010's child, who is 1013's child
+        FamilyGraph.swap(FamilyGraph.from_edges(self.guild_id, [(1005, 1010), (1010, 1013)], []))
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+
+    def get(self, user_id):
+        return FamilyTreeMember.get(user_id, self.guild_id)
+
+    def assertMatchesWalk(self, user_ids):
+        store = FamilyGraph.get(self.guild_id).store
+        for user_id in user_ids:
+            line = []
+            parent = store.get_parent(user_id)
+            while parent is not None:
+                line.append(parent)
+                parent = store.get_parent(parent)
+            index = store.index_of(user_id)
+            if index is not None:
+                self.assertEqual(store.ancestors.depth(index), len(line))
+            for other_id in user_ids:
+                self.assertEqual(self.get(other_id).is_ancestor_of(self.get(user_id)), other_id in line)
+
+    def test_reparent_above_one_way_parent(self):
+        # 1036 has 1005 as a parent, but 1005 doesn't list them as a child
+        self.get(1036).parent = self.get(1005)
+        self.assertNotIn(1036, FamilyGraph.get(self.guild_id).store.get_children(1005))
+        self.assertMatchesWalk([1, 1005, 1010, 1013, 1036])
+
+        # Moving the top of the line has to reach 1036 too
+        self.get(1013).parent = self.get(1)
+        self.get(1).add_child(self.get(1013))
+        self.assertTrue(self.get(1).is_ancestor_of(self.get(1036)))
+        self.assertMatchesWalk([1, 1005, 1010, 1013, 1036])
+
+        self.get(1010).parent = None
+        self.get(1013).remove_child(self.get(1010))
+        self.assertFalse(self.get(1013).is_ancestor_of(self.get(1036)))
+        self.assertMatchesWalk([1, 1005, 1010, 1013, 1036])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+from array import array
+import random
+import unittest
+
+from cogs.utils.family_tree.compact_family_store import CompactFamilyStore
+from cogs.utils.family_tree.dict_family_store import DictFamilyStore
+
+
+class CompactFamilyStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.threshold = CompactFamilyStore.COMPACTION_THRESHOLD
+        self.random = random.Random(3)
+        self.user_ids = self.random.sample(range(10 ** 17, 10 ** 18), 40)
+
+    def tearDown(self):
+        CompactFamilyStore.COMPACTION_THRESHOLD = self.threshold
+
+    def change(self, stores, count):
+        # Make the same random changes to each store
+        for _ in range(count):
+            user_id, other_id = self.random.sample(self.user_ids, 2)
+            action = self.random.randrange(6)
+            for store in stores:
+                if action == 0:
+                    store.add_child(user_id, other_id)
+                elif action == 1:
+                    store.remove_child(user_id, other_id)
+                elif action == 2:
+                    store.add_partner(user_id, other_id)
+                elif action == 3:
+                    store.remove_partner(user_id, other_id)
+                elif action == 4:
+                    store.set_parent(user_id, other_id)
+                else:
+                    store.set_parent(user_id, None)
+
+    def assertSameRelations(self, store, expected):
+        for user_id in self.user_ids:
+            self.assertEqual(store.get_parent(user_id), expected.get_parent(user_id))
+            self.assertEqual(store.get_children(user_id), expected.get_children(user_id))
+            self.assertEqual(store.get_partners(user_id), expected.get_partners(user_id))
+        edges, expected_edges = store.to_edges(), expected.to_edges()
+        for pairs, expected_pairs in zip(edges, expected_edges):
+            self.assertEqual(
+                sorted(zip(pairs[::2], pairs[1::2])),
+                sorted(zip(expected_pairs[::2], expected_pairs[1::2])),
+            )
+
+    def test_overflow(self):
+        # Nothing is compacted, so every change stays in the overflow area
+        CompactFamilyStore.COMPACTION_THRESHOLD = 10 ** 6
+        store, expected = CompactFamilyStore(), DictFamilyStore()
+        self.change([store, expected], 500)
+        self.assertEqual(store._compacted_count, 0)
+        self.assertSameRelations(store, expected)
+
+    def test_compaction(self):
+        CompactFamilyStore.COMPACTION_THRESHOLD = 8
+        store, expected = CompactFamilyStore(), DictFamilyStore()
+        for _ in range(10):
+            self.change([store, expected], 50)
+            self.assertSameRelations(store, expected)
+        self.assertGreater(store._compacted_count, 0)
+
+        # Compacting doesn't change anything, and leaves nothing behind
+        store.compact()
+        self.assertEqual(store._recent, {})
+        self.assertEqual(store._child_overflow, {})
+        self.assertEqual(store._partner_overflow, {})
+        self.assertSameRelations(store, expected)
+        offsets, targets = store.to_rows(True)
+        self.assertEqual(offsets, store._child_offsets)
+        self.assertEqual(targets, store._child_targets)
+
+    def test_from_edges(self):
+        CompactFamilyStore.COMPACTION_THRESHOLD = 10 ** 6
+        original = DictFamilyStore()
+        self.change([original], 200)
+        parent_edges, partner_edges = original.to_edges()
+        parent_edges = list(zip(parent_edges[::2], parent_edges[1::2]))
+        partner_edges = list(zip(partner_edges[::2], partner_edges[1::2]))
+        store = CompactFamilyStore.from_edges(parent_edges, partner_edges)
+        expected = DictFamilyStore.from_edges(parent_edges, partner_edges)
+        self.assertSameRelations(store, expected)
+
+        # Then change it after it's been built
+        self.change([store, expected], 200)
+        self.assertSameRelations(store, expected)
+
+    def test_spare_slots(self):
+        CompactFamilyStore.COMPACTION_THRESHOLD = 10 ** 6
+        expected = DictFamilyStore()
+        for user_id, other_id in zip(self.user_ids[:10], self.user_ids[1:11]):
+            expected.add_child(other_id, user_id)
+            expected.set_parent(user_id, other_id)
+
+        # Build a store around read-only columns with room for two more
+        # users, like a mapped image gives
+        columns = {
+            name: array(typecode, values)
+            for (name, typecode), values in zip(
+                CompactFamilyStore.COLUMNS,
+                CompactFamilyStore.from_edges(
+                    [(self.user_ids[i], self.user_ids[i + 1]) for i in range(10)],
+                    [],
+                ).to_columns().values(),
+            )
+        }
+        node_count = len(columns['snowflakes'])
+        snowflakes = memoryview(array('q', [*columns['snowflakes'], 0, 0]))
+        parents = memoryview(array('i', [*columns['parents'], -1, -1]))
+        columns = {name: memoryview(values) for name, values in columns.items()}
+        columns['snowflakes'], columns['parents'] = snowflakes[:node_count], parents[:node_count]
+        store = CompactFamilyStore.from_columns(columns, spare=(snowflakes, parents))
+        self.assertTrue(store.is_mapped)
+        self.assertSameRelations(store, expected)
+
+        # The first new users go in the spare room
+        for user_id in self.user_ids[11:13]:
+            store.add_partner(self.user_ids[0], user_id)
+            expected.add_partner(self.user_ids[0], user_id)
+        self.assertIsNotNone(store._spare)
+        self.assertEqual(snowflakes[node_count:].tolist(), self.user_ids[11:13])
+        self.assertSameRelations(store, expected)
+
+        # And once it's full, the columns are copied out to grow
+        store.set_parent(self.user_ids[13], self.user_ids[0])
+        expected.set_parent(self.user_ids[13], self.user_ids[0])
+        self.assertIsNone(store._spare)
+        self.assertIsInstance(store._snowflakes, array)
+        self.assertSameRelations(store, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
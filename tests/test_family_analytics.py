@@ -0,0 +1,68 @@
+import unittest
+
+from cogs.utils.family_tree.family_analytics import FamilyAnalytics
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from tests.test_family_integrity_report import make_arrays
+
+
+class FamilyAnalyticsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.leaderboard_size = FamilyAnalytics.LEADERBOARD_SIZE
+
+        # 100 (married to 104) has 101 and 102, and 101 has 103; 105, 106,
+        # and 107 are married in a line; 109 has 108; 110 has nobody; and
+        # 111 and 112 are each other's parents
+        self.arrays = make_arrays(
+            list(range(100, 113)),
+            [-1, 0, 0, 1, -1, -1, -1, -1, 9, -1, -1, 12, 11],
+            [(0, 1), (0, 2), (1, 3), (9, 8), (11, 12), (12, 11)],
+            [(0, 4), (4, 0), (5, 6), (6, 5), (6, 7), (7, 6)],
+        )
+
+    def tearDown(self):
+        FamilyAnalytics.LEADERBOARD_SIZE = self.leaderboard_size
+
+    def test_compute_arrays(self):
+        analytics = FamilyAnalytics.compute_arrays(5, self.arrays, 5)
+        self.assertEqual(analytics.member_count, 13)
+        self.assertEqual(analytics.family_sizes, {2: 2, 3: 1, 5: 1})
+        self.assertEqual(analytics.generation_counts, {1: 2, 2: 1, 3: 1})
+        self.assertEqual(analytics.child_counts, {0: 7, 1: 4, 2: 1})
+        self.assertEqual(analytics.partner_counts, {0: 7, 1: 4, 2: 1})
+        self.assertEqual(analytics.largest_families, [(100, 5, 3), (105, 3, 1), (108, 2, 2), (111, 2, 1)])
+        self.assertEqual(analytics.largest_partner_groups, [(105, 3)])
+        self.assertEqual(analytics.family_count, 4)
+        self.assertEqual(analytics.related_count, 12)
+        self.assertEqual(analytics.near_limit_count, 1)
+        self.assertEqual(analytics.largest_family_size, 5)
+        self.assertEqual(analytics.most_generations, 3)
+
+    def test_leaderboard_size(self):
+        FamilyAnalytics.LEADERBOARD_SIZE = 2
+        analytics = FamilyAnalytics.compute_arrays(5, self.arrays, 5)
+        self.assertEqual(analytics.largest_families, [(100, 5, 3), (105, 3, 1)])
+        self.assertIn("2. 3 members, 1 generations (includes 105)", analytics.to_text())
+
+    def test_empty(self):
+        analytics = FamilyAnalytics.compute_arrays(5, make_arrays([], [], [], []), 5)
+        self.assertEqual(analytics.family_sizes, {})
+        self.assertEqual(analytics.largest_families, [])
+        self.assertEqual(analytics.largest_family_size, 0)
+        self.assertIn("**Family sizes:** none", analytics.to_text())
+
+    def test_compute(self):
+        graph = FamilyGraph.from_edges(5, [(2, 1), (3, 1), (4, 3)], [(1, 5), (6, 7)])
+        analytics = FamilyAnalytics.compute(graph, 100)
+        self.assertEqual(analytics.family_sizes, {2: 1, 5: 1})
+        self.assertEqual(analytics.largest_families, [(1, 5, 3), (6, 2, 1)])
+
+    def test_bucket(self):
+        self.assertEqual(
+            FamilyAnalytics.bucket({0: 1, 1: 2, 2: 3, 3: 4, 4: 5, 5: 6, 9: 1}),
+            {"0": 1, "1": 2, "2": 3, "3-4": 9, "5-8": 6, "9-16": 1},
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+
+
+class ComponentIndexTests(unittest.TestCase):
+
+    guild_id = 1
+
+    def setUp(self):
+        FamilyGraph.swap(FamilyGraph(self.guild_id))
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+
+    def get(self, user_id):
+        return FamilyTreeMember.get(user_id, self.guild_id)
+
+    def adopt(self, child_id, parent_id):
+        child, parent = self.get(child_id), self.get(parent_id)
+        old = child.parent
+        if old:
+            old.remove_child(child)
+        child.parent = parent
+        parent.add_child(child)
+
+    def marry(self, user_id, partner_id):
+        user, partner = self.get(user_id), self.get(partner_id)
+        user.add_partner(partner)
+        partner.add_partner(user)
+
+    def assertMatchesRebuild(self, user_ids):
+        sizes = {i: self.get(i).component_size for i in user_ids}
+        store = FamilyGraph.get(self.guild_id).store
+        store.components.rebuild_all(len(store))
+        self.assertEqual(sizes, {i: self.get(i).component_size for i in user_ids})
+
+    def test_reparent_out_of_married_family(self):
+        # Moving 12 away from 11 leaves 11 and 2 as their own family, so
+        # splitting them off mustn't walk into 12's new one
+        self.adopt(12, 11)
+        self.marry(11, 2)
+        self.adopt(12, 29)
+        self.assertEqual(self.get(11).component_size, 2)
+        self.assertEqual(self.get(12).component_size, 2)
+        self.assertMatchesRebuild([2, 11, 12, 29])
+
+    def test_replace_relations(self):
+        # Replacing all of a user's relations at once, as a TreeMemberUpdate
+        # from another cluster does, can remove several of them together
+        self.adopt(2, 1)
+        self.adopt(3, 1)
+        self.marry(1, 4)
+        self.get(1)._replace_relations(5, [], [])
+        for i in (2, 3):
+            self.get(i)._replace_relations(None, [], [])
+        self.get(4)._replace_relations(None, [], [])
+        self.get(5)._replace_relations(None, [1], [])
+        self.assertEqual(self.get(1).component_size, 2)
+        self.assertEqual(self.get(2).component_size, 1)
+        self.assertMatchesRebuild([1, 2, 3, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+
+
+class SweepTests(unittest.TestCase):
+
+    guild_id = 14
+
+    def setUp(self):
+        self.threshold = FamilyGraph.SWEEP_THRESHOLD
+        FamilyGraph.SWEEP_THRESHOLD = 1
+        FamilyGraph.swap(FamilyGraph.from_edges(self.guild_id, [(2, 1)], []))
+
+        # Leave a few people with no relations behind
+        for i in range(10, 20, 2):
+            user, partner = self.get(i), self.get(i + 1)
+            user.add_partner(partner)
+            partner.add_partner(user)
+            user.remove_partner(partner)
+            partner.remove_partner(user)
+
+    def tearDown(self):
+        FamilyGraph.SWEEP_THRESHOLD = self.threshold
+        FamilyGraph.drop(self.guild_id)
+
+    def get(self, user_id):
+        return FamilyTreeMember.get(user_id, self.guild_id)
+
+    def test_sweep_removes_empty_members(self):
+        self.assertEqual(FamilyGraph.sweep(), 10)
+        store = FamilyGraph.get(self.guild_id).store
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get_parent(2), 1)
+
+    def test_sweep_keeps_one_way_relations(self):
+        # 1 lists 3 as a child, but 3 doesn't have 1 as a parent
+        self.get(1).add_child(self.get(3))
+        graph = FamilyGraph.get(self.guild_id)
+        self.assertTrue(graph.store.has_one_way)
+        self.assertEqual(FamilyGraph.sweep(), 0)
+        self.assertIs(FamilyGraph.get(self.guild_id), graph)
+        self.assertIn(3, graph.store.get_children(1))
+        self.assertIsNone(graph.store.get_parent(3))
+
+        # Once both sides have it, it's swept as normal
+        self.get(3).parent = self.get(1)
+        self.assertFalse(graph.store.has_one_way)
+        self.assertEqual(FamilyGraph.sweep(), 10)
+        store = FamilyGraph.get(self.guild_id).store
+        self.assertEqual(sorted(store.get_children(1)), [2, 3])
+        self.assertEqual(store.get_parent(3), 1)
+
+
+class DirtyTests(unittest.TestCase):
+
+    guild_id = 17
+
+    def setUp(self):
+        FamilyGraph.swap(FamilyGraph(self.guild_id))
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+
+    def test_mark_clean(self):
+        user, partner, other = (FamilyTreeMember.get(i, self.guild_id) for i in (1, 2, 3))
+        user.add_partner(partner)
+        partner.add_partner(user)
+        other.add_partner(user)
+        graph = FamilyGraph.get(self.guild_id)
+        graph.mark_clean(1, 2)
+        self.assertEqual(graph.take_dirty(), [3])
+        self.assertEqual(graph.dirty, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+from datetime import datetime as dt
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_image import FamilyGraphImage
+from cogs.utils.family_tree.family_graph_snapshot import FamilyGraphSnapshot
+
+
+class FamilyGraphImageTests(unittest.TestCase):
+
+    created_at = dt(2021, 6, 1, 12, 30, 15, 123456)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "family.image")
+        self.graphs = [
+            FamilyGraph.from_edges(1, [(20, 10), (30, 10), (40, 30)], [(10, 50), (30, 60)]),
+            FamilyGraph.from_edges(2 ** 62, [(2 ** 62 + 1, 2 ** 60)], []),
+        ]
+        self.snapshot = FamilyGraphSnapshot.from_graphs(self.graphs, self.created_at)
+        FamilyGraphImage.write(self.snapshot, self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path, "rb") as a:
+            return a.read()
+
+    def assertSameGraphs(self, graphs):
+        graphs = {i.guild_id: i for i in graphs}
+        self.assertEqual(set(graphs), {1, 2 ** 62})
+        for expected in self.graphs:
+            store, expected_store = graphs[expected.guild_id].store, expected.store
+            self.assertEqual(sorted(store), sorted(expected_store))
+            for user_id in expected_store:
+                self.assertEqual(store.get_parent(user_id), expected_store.get_parent(user_id))
+                self.assertEqual(store.get_children(user_id), expected_store.get_children(user_id))
+                self.assertEqual(store.get_partners(user_id), expected_store.get_partners(user_id))
+
+    def test_round_trip(self):
+        image = FamilyGraphImage.open(self.path)
+        self.assertEqual(image.created_at, self.created_at)
+        self.assertEqual(os.listdir(self.directory.name), ["family.image"])
+        graphs = list(image.to_graphs())
+        self.assertTrue(all(i.store.is_mapped for i in graphs))
+        self.assertSameGraphs(graphs)
+
+    def test_changes_stay_private(self):
+        data = self.read()
+        store = next(FamilyGraphImage.open(self.path).to_graphs()).store
+        store.add_child(40, 70)
+        store.set_parent(70, 40)
+        store.set_parent(20, None)
+        self.assertEqual(store.get_children(40), [70])
+        self.assertEqual(store.get_parent(70), 40)
+        self.assertIsNone(store.get_parent(20))
+
+        # The file (and so every other cluster's map of it) is untouched
+        self.assertEqual(self.read(), data)
+        self.assertSameGraphs(FamilyGraphImage.open(self.path).to_graphs())
+
+    def test_truncated(self):
+        data = self.read()
+        for length in range(0, len(data), 7):
+            with open(self.path, "wb") as a:
+                a.write(data[:length])
+            with self.assertRaises(ValueError):
+                FamilyGraphImage.open(self.path)
+
+    def test_corrupt(self):
+        data = self.read()
+        header = struct.Struct("<4sHHqII")
+        damaged = []
+        for position in (0, 4, header.size, len(data) - 1):
+            flipped = bytearray(data)
+            flipped[position] ^= 0xff
+            damaged.append(bytes(flipped))
+
+        # Arrays that run off the end, even though the checksum is right
+        payload = data[header.size:-8]
+        fields = list(header.unpack_from(data))
+        fields[-1] = zlib.crc32(payload)
+        damaged.append(header.pack(*fields) + payload)
+
+        for data in damaged:
+            with open(self.path, "wb") as a:
+                a.write(data)
+            with self.assertRaises(ValueError):
+                FamilyGraphImage.open(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from datetime import datetime as dt
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_graph_snapshot import FamilyGraphSnapshot
+
+
+class FamilyGraphSnapshotTests(unittest.TestCase):
+
+    created_at = dt(2021, 6, 1, 12, 30, 15, 123456)
+
+    def setUp(self):
+        self.graphs = [
+            FamilyGraph.from_edges(1, [(2, 1), (3, 1), (4, 3)], [(1, 5), (3, 6)]),
+            FamilyGraph.from_edges(2 ** 62, [(2 ** 62 + 1, 2 ** 60)], []),
+            FamilyGraph(3),  # Empty, so left out
+        ]
+        self.snapshot = FamilyGraphSnapshot.from_graphs(self.graphs, self.created_at)
+
+    def assertSameGraphs(self, graphs):
+        graphs = {i.guild_id: i for i in graphs}
+        self.assertEqual(set(graphs), {1, 2 ** 62})
+        for expected in self.graphs[:2]:
+            store, expected_store = graphs[expected.guild_id].store, expected.store
+            self.assertEqual(sorted(store), sorted(expected_store))
+            for user_id in expected_store:
+                self.assertEqual(store.get_parent(user_id), expected_store.get_parent(user_id))
+                self.assertEqual(store.get_children(user_id), expected_store.get_children(user_id))
+                self.assertEqual(store.get_partners(user_id), expected_store.get_partners(user_id))
+
+    def test_round_trip(self):
+        self.assertEqual(self.snapshot.edge_count, 6)
+        snapshot = FamilyGraphSnapshot.from_bytes(self.snapshot.to_bytes())
+        self.assertEqual(snapshot.created_at, self.created_at)
+        self.assertEqual(snapshot.guilds, self.snapshot.guilds)
+        self.assertSameGraphs(snapshot.to_graphs())
+
+    def test_file_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "family.snapshot")
+            self.snapshot.write(path)
+            FamilyGraphSnapshot.from_graphs(self.graphs[:1]).write(path)
+            self.snapshot.write(path)
+            self.assertEqual(os.listdir(directory), ["family.snapshot"])
+            self.assertSameGraphs(FamilyGraphSnapshot.read(path).to_graphs())
+
+    def test_empty(self):
+        snapshot = FamilyGraphSnapshot.from_bytes(FamilyGraphSnapshot(self.created_at, {}).to_bytes())
+        self.assertEqual(snapshot.guilds, {})
+        self.assertEqual(list(snapshot.to_graphs()), [])
+
+    def reseal(self, data):
+        # Fix the checksum up, so that the rest of the checks are reached
+        header = struct.Struct("<4sHHqII")
+        fields = list(header.unpack_from(data))
+        fields[-1] = zlib.crc32(data[header.size:])
+        return header.pack(*fields) + data[header.size:]
+
+    def test_truncated(self):
+        data = self.snapshot.to_bytes()
+        for length in range(len(data)):
+            with self.assertRaises(ValueError):
+                FamilyGraphSnapshot.from_bytes(data[:length])
+
+    def test_corrupt(self):
+        data = self.snapshot.to_bytes()
+        header = struct.calcsize("<4sHHqII")
+        for position in (0, 4, header, len(data) - 1):
+            damaged = bytearray(data)
+            damaged[position] ^= 0xff
+            with self.assertRaises(ValueError):
+                FamilyGraphSnapshot.from_bytes(bytes(damaged))
+        with self.assertRaises(ValueError):
+            FamilyGraphSnapshot.from_bytes(data + bytes(16))
+
+    def test_damaged_with_valid_checksum(self):
+        data = self.snapshot.to_bytes()
+        header = struct.calcsize("<4sHHqII")
+        for damaged in (
+                data[:4] + struct.pack("<H", 2) + data[6:],  # A newer version
+                data[:header - 8] + struct.pack("<I", 3) + data[header - 4:],  # A guild too many
+                data[:-8],  # An edge short
+                data + bytes(8)):  # An edge too many
+            with self.assertRaises(ValueError):
+                FamilyGraphSnapshot.from_bytes(self.reseal(damaged))
+        self.assertEqual(FamilyGraphSnapshot.from_bytes(self.reseal(data)).guilds, self.snapshot.guilds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_integrity_report import FamilyIntegrityReport
+
+
+def make_arrays(snowflakes, parents, children, partners):
+    arrays = {
+        'snowflakes': np.array(snowflakes, dtype=np.int64),
+        'parents': np.array(parents, dtype=np.int64),
+    }
+    for name, rows in (('child', children,), ('partner', partners,)):
+        arrays[f'{name}_sources'] = np.array([a for a, _ in rows], dtype=np.int64)
+        arrays[f'{name}_targets'] = np.array([b for _, b in rows], dtype=np.int64)
+    return arrays
+
+
+class FamilyIntegrityReportTests(unittest.TestCase):
+
+    def test_scan_arrays(self):
+        # 101 is 100's child (listed twice), 102 is their own parent, 103
+        # has 100 as a parent without being listed, 104 -> 105 -> 106 is a
+        # loop of parents, and 100 lists 107 who doesn't have them as a
+        # parent. 101 is married to 100 (listed twice) and 102, and is
+        # married one way to 107, and 103 is married to themselves.
+        arrays = make_arrays(
+            [100, 101, 102, 103, 104, 105, 106, 107],
+            [-1, 0, 2, 0, 5, 6, 4, -1],
+            [(0, 1), (0, 1), (0, 7), (7, 7), (5, 4), (6, 5), (4, 6)],
+            [(0, 1), (0, 1), (1, 0), (1, 2), (2, 1), (1, 7), (3, 3)],
+        )
+        report = FamilyIntegrityReport.scan_arrays(5, arrays)
+        self.assertEqual(report.guild_id, 5)
+        self.assertEqual(report.member_count, 8)
+        self.assertEqual(report.issues, {
+            'self_parent': [(102,)],
+            'self_child': [(107,)],
+            'self_partner': [(103,)],
+            'duplicate_child': [(100, 101)],
+            'duplicate_partner': [(100, 101)],
+            'child_without_parent': [(100, 107)],
+            'parent_without_child': [(100, 103)],
+            'one_way_partner': [(101, 107)],
+            'parent_loop': [(104, 105, 106)],
+        })
+        self.assertEqual(report.issue_count, 9)
+        self.assertEqual(report.repair_plan(), [
+            ("parents", 102, 102),
+            ("marriages", 103, 103),
+            ("parents", 104, 105),
+        ])
+        self.assertIn("**parent_loop** (1): (104 -> 105 -> 106)", report.to_text())
+
+    def test_loops_start_from_lowest_id(self):
+        arrays = make_arrays([30, 10, 20, 40, 50], [1, 2, 0, 4, 3], [], [])
+        report = FamilyIntegrityReport.scan_arrays(5, arrays)
+        self.assertEqual(report.issues['parent_loop'], [(10, 20, 30), (40, 50)])
+        self.assertEqual(report.repair_plan(), [("parents", 10, 20), ("parents", 40, 50)])
+
+    def test_scan_clean_graph(self):
+        graph = FamilyGraph.from_edges(5, [(2, 1), (3, 1), (4, 3)], [(1, 5)])
+        report = FamilyIntegrityReport.scan(graph)
+        self.assertFalse(report)
+        self.assertEqual(report.repair_plan(), [])
+        self.assertEqual(report.to_text(), "Scanned 5 users in guild 5.\nNo issues found.")
+
+    def test_scan_one_way_graph(self):
+        graph = FamilyGraph.from_edges(5, [(2, 1)], [])
+        graph.store.add_child(1, 3)
+        graph.store.add_partner(2, 4)
+        report = FamilyIntegrityReport.scan(graph)
+        self.assertEqual(report.issues['child_without_parent'], [(1, 3)])
+        self.assertEqual(report.issues['one_way_partner'], [(2, 4)])
+        self.assertEqual(report.issue_count, 2)
+
+    def test_to_text_examples(self):
+        arrays = make_arrays(list(range(100, 108)), list(range(8)), [], [])
+        text = FamilyIntegrityReport.scan_arrays(5, arrays).to_text(examples=2)
+        self.assertIn("**self_parent** (8): (100), (101) and 6 more", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import collections
+import unittest
+
+from cogs.utils.discord_name_manager import DiscordNameManager
+from cogs.utils.family_tree.family_name_index import FamilyNameIndex
+
+
+class FamilyNameIndexTests(unittest.TestCase):
+
+    members = (1, 2, 3, 4, 5)
+
+    def setUp(self):
+        self.changes = DiscordNameManager.changes
+        DiscordNameManager.changes = collections.deque(self.changes, maxlen=self.changes.maxlen)
+        for user_id, name in zip(self.members, ("Bob", "alice", "Albert#0", "bob")):
+            DiscordNameManager(user_id, name)
+        self.index = FamilyNameIndex(self.members)
+
+    def tearDown(self):
+        DiscordNameManager.changes = self.changes
+        for user_id in (*self.members, 6):
+            DiscordNameManager.cached_names.pop(user_id, None)
+
+    def rename(self, user_id, name):
+        DiscordNameManager.get(user_id).name = name
+
+    def test_find(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.find("AL"), [3, 2])
+        self.assertEqual(self.index.find("bob"), [1, 4])
+        self.assertEqual(self.index.find("albert#"), [])
+        self.assertEqual(self.index.find("", limit=3), [3, 2, 1])
+        self.assertEqual(len(self.index.find("", limit=None)), 4)
+        self.assertEqual(self.index.find("c"), [])
+
+    def test_follows_changes(self):
+        self.rename(1, "Carol")
+        self.rename(5, "Alfie")
+        self.rename(6, "Alan")  # Not in the family
+        self.assertEqual(self.index.find("bob"), [4])
+        self.assertEqual(self.index.find("car"), [1])
+        self.assertEqual(self.index.find("al"), [3, 5, 2])
+        self.assertEqual(len(self.index), 5)
+
+    def test_rebuilds_when_behind(self):
+        DiscordNameManager.changes = collections.deque(maxlen=2)
+        for user_id, name in zip(self.members, ("Dan", "Dave", "Dora", "Eve", "Dee")):
+            self.rename(user_id, name)
+        self.assertEqual(self.index.find("d"), [1, 2, 5, 3])
+        self.assertEqual(self.index.find("e"), [4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+
+
+class RelationTests(unittest.TestCase):
+
+    guild_id = 9
+
+    def setUp(self):
+        # 1 (married to 7) has 2 and 3, 2 has 4, 4 (married to 8) has 5,
+        # and 3 has 6
+        FamilyGraph.swap(FamilyGraph.from_edges(
+            self.guild_id,
+            [(2, 1), (3, 1), (4, 2), (5, 4), (6, 3)],
+            [(1, 7), (4, 8)],
+        ))
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+
+    def get(self, user_id):
+        return FamilyTreeMember.get(user_id, self.guild_id)
+
+    def test_all_relations_match_get_relation(self):
+        user = self.get(4)
+        relations = user.get_all_relations()
+        self.assertNotIn(4, relations)
+        self.assertEqual(set(relations), {1, 2, 3, 5, 6, 7, 8})
+        for i in (1, 2, 3, 5, 6, 8):
+            self.assertEqual(relations[i], user.get_relation(self.get(i)))
+
+    def test_all_relations_closest_first(self):
+        distances = [len(self.get(4).get_relation_paths()[i]) for i in self.get(4).get_all_relations()]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_blood_relation(self):
+        self.assertEqual(self.get(4).get_blood_relation(self.get(6)), "cousin")
+        self.assertEqual(self.get(5).get_blood_relation(self.get(1)), "great grandparent")
+        self.assertIsNone(self.get(4).get_blood_relation(self.get(7)))
+
+        # Marrying doesn't change how they're related by blood
+        self.get(4).add_partner(self.get(6))
+        self.get(6).add_partner(self.get(4))
+        self.assertEqual(self.get(4).get_relation(self.get(6)), "partner")
+        self.assertEqual(self.get(4).get_blood_relation(self.get(6)), "cousin")
+
+    def test_no_relations(self):
+        self.assertEqual(self.get(100).get_all_relations(), {})
+
+
+
+class OneWayRelationTests(unittest.TestCase):
+
+    guild_id = 2
+
+    def setUp(self):
+        # 1 is married to 2 and 4, and 2 has 5
+        FamilyGraph.swap(FamilyGraph.from_edges(
+            self.guild_id,
+            [(5, 2)],
+            [(1, 2), (1, 4)],
+        ))
+
+        # 3 has 5 as a parent, but 5 doesn't list them as a child
+        self.get(3).parent = self.get(5)
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+
+    def get(self, user_id):
+        return FamilyTreeMember.get(user_id, self.guild_id)
+
+    def test_relation_path_matches_single_search(self):
+        for source in (1, 2, 3, 4, 5):
+            paths = self.get(source).get_relation_paths()
+            for target in (1, 2, 3, 4, 5):
+                self.assertEqual(self.get(source).get_relation_path(self.get(target)), paths.get(target))
+        self.assertIsNone(self.get(1).get_relation(self.get(3)))
+        self.assertEqual(self.get(3).get_relation(self.get(1)), "grandparent")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import threading
+import unittest
+
+from cogs.utils.family_tree.family_worker_pool import FamilyWorkerPool
+
+
+class FamilyWorkerPoolTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.threshold = FamilyWorkerPool.threshold
+
+    def tearDown(self):
+        FamilyWorkerPool.stop()
+        FamilyWorkerPool.threshold = self.threshold
+        FamilyWorkerPool.processes = 0
+
+    async def test_without_pool(self):
+        # Nothing is offloaded by size, but run still leaves the event loop
+        FamilyWorkerPool.start(0, threshold=10)
+        self.assertFalse(FamilyWorkerPool.should_offload(10 ** 6))
+        self.assertEqual(await FamilyWorkerPool.run_sized(10 ** 6, threading.get_ident), threading.get_ident())
+        self.assertNotEqual(await FamilyWorkerPool.run(threading.get_ident), threading.get_ident())
+
+    async def test_threshold(self):
+        FamilyWorkerPool.start(1, threshold=10)
+        self.assertFalse(FamilyWorkerPool.should_offload(9))
+        self.assertTrue(FamilyWorkerPool.should_offload(10))
+        self.assertEqual(await FamilyWorkerPool.run_sized(9, os.getpid), os.getpid())
+        self.assertNotEqual(await FamilyWorkerPool.run_sized(10, os.getpid), os.getpid())
+        self.assertEqual(await FamilyWorkerPool.run_sized(10, max, 1, 3, 2), 3)
+
+    async def test_restart_keeps_threshold(self):
+        FamilyWorkerPool.start(1, threshold=10)
+        FamilyWorkerPool.start(1)
+        self.assertEqual(FamilyWorkerPool.threshold, 10)
+        FamilyWorkerPool.stop()
+        self.assertFalse(FamilyWorkerPool.should_offload(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
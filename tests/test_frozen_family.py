@@ -0,0 +1,60 @@
+import asyncio
+import re
+import unittest
+
+from cogs.utils.customised_tree_user import CustomisedTreeUser
+from cogs.utils.discord_name_manager import DiscordNameManager
+from cogs.utils.family_tree.family_graph import FamilyGraph
+from cogs.utils.family_tree.family_tree_member import FamilyTreeMember
+
+
+class TreeDrawingTests(unittest.TestCase):
+
+    guild_id = 13
+
+    def setUp(self):
+        # 1 is the parent of 2 and 4, and 2 is married to 6, whose line goes
+        # down through 8 and 9 to 10. 10 is married to 4, so 4 is drawn as
+        # 10's partner at the bottom of the tree rather than as 1's child.
+        # 4 is also married to 7, who's married to 3, who's married to 5,
+        # and 7 is the parent of 11 - none of whom are in the span from the
+        # root (1)
+        FamilyGraph.swap(FamilyGraph.from_edges(
+            self.guild_id,
+            [(2, 1), (4, 1), (8, 6), (9, 8), (10, 9), (11, 7)],
+            [(6, 2), (5, 3), (7, 3), (10, 4), (7, 4)],
+        ))
+
+    def tearDown(self):
+        FamilyGraph.drop(self.guild_id)
+        for i in range(1, 12):
+            DiscordNameManager.cached_names.pop(i, None)
+
+    def draw(self, user_id):
+        for i in range(1, 12):
+            DiscordNameManager(i, f"user{i}")
+        user = FamilyTreeMember.get(user_id, self.guild_id)
+        return asyncio.run(user.to_dot_script(None, CustomisedTreeUser(user_id)))
+
+    def test_partners_outside_root_span(self):
+        dot = self.draw(7)
+        self.assertIn('7[label="user7",', dot)
+        self.assertIn('3[label="user3"];', dot)
+        self.assertIn('5[label="user5"];', dot)
+
+    def test_parent_outside_root_span(self):
+        dot = self.draw(11)
+        self.assertIn('7[label="user7"];', dot)
+        self.assertIn('5[label="user5"];', dot)
+
+    def test_drawn_members_cover_the_tree(self):
+        for user_id in range(1, 12):
+            family = FamilyTreeMember.get(user_id, self.guild_id).freeze()
+            gen_span = family.tree_span(user_id)
+            drawn = set(family.drawn_members(gen_span, user_id))
+            labelled = set(map(int, re.findall(r'(\d+)\[label=', self.draw(user_id))))
+            self.assertLessEqual(labelled, drawn)
+
+
+if __name__ == '__main__':
+    unittest.main()